@@ -0,0 +1,270 @@
+from array import array
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Set, Tuple, Optional
+from telegram import Message
+from telegram.ext import ContextTypes
+
+from database import Database
+from leaderboard import Leaderboard, WindowedLeaderboard
+from hyperloglog import HyperLogLog
+
+WEEKDAYS = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+HOURS_PER_DAY = 24
+GRID_SIZE = len(WEEKDAYS) * HOURS_PER_DAY
+
+class ActivityGrid:
+    """7×24 weekday/hour message counters for a single chat"""
+    __slots__ = ('hours', 'messages', 'media', 'replies')
+
+    def __init__(self, hours: bytes = None, messages: int = 0, media: int = 0, replies: int = 0):
+        self.hours = array('I')
+        if hours:
+            self.hours.frombytes(hours)
+        else:
+            self.hours.extend([0] * GRID_SIZE)
+        self.messages = messages
+        self.media = media
+        self.replies = replies
+
+    def record(self, weekday: int, hour: int, is_media: bool = False, is_reply: bool = False):
+        """Count one message in the given weekday/hour cell"""
+        self.hours[weekday * HOURS_PER_DAY + hour] += 1
+        self.messages += 1
+        if is_media:
+            self.media += 1
+        if is_reply:
+            self.replies += 1
+
+    def hour_totals(self) -> list:
+        """Messages per hour of day, summed over all weekdays"""
+        return [sum(self.hours[hour::HOURS_PER_DAY]) for hour in range(HOURS_PER_DAY)]
+
+    def day_totals(self) -> list:
+        """Messages per weekday, summed over all hours"""
+        return [
+            sum(self.hours[day * HOURS_PER_DAY:(day + 1) * HOURS_PER_DAY])
+            for day in range(len(WEEKDAYS))
+        ]
+
+    def peak_hour(self) -> Optional[int]:
+        totals = self.hour_totals()
+        if not any(totals):
+            return None
+        return max(range(HOURS_PER_DAY), key=totals.__getitem__)
+
+    def most_active_day(self) -> Optional[str]:
+        totals = self.day_totals()
+        if not any(totals):
+            return None
+        return WEEKDAYS[max(range(len(WEEKDAYS)), key=totals.__getitem__)]
+
+    def percentage(self, count: int) -> float:
+        if not self.messages:
+            return 0.0
+        return round(100 * count / self.messages, 1)
+
+class ActivityTracker:
+    """In-memory per-chat activity counters, persisted periodically"""
+
+    def __init__(self, db: Database, window_days: int = 7):
+        self.db = db
+        self.window_days = window_days
+        self.grids: Dict[int, ActivityGrid] = {}
+        self.dirty: Set[int] = set()
+        self.active: Dict[int, WindowedLeaderboard] = {}
+        self.warned: Dict[int, Leaderboard] = {}
+        self.pending_users: Dict[Tuple[int, int, str], int] = {}  # {(chat_id, user_id, date): messages}
+        self.pending_messages: Dict[Tuple[int, str], int] = {}  # {(chat_id, date): messages} for statistics
+        self.names: Dict[int, str] = {}
+        self.sketches: Dict[Tuple[int, str], HyperLogLog] = {}  # {(chat_id, date): distinct senders}
+        self.dirty_sketches: Set[Tuple[int, str]] = set()
+        self.pending_seen: Dict[Tuple[int, int], int] = {}  # {(chat_id, user_id): unix time}
+        self.departed: Set[Tuple[int, int]] = set()
+
+    def get_grid(self, chat_id: int) -> ActivityGrid:
+        """Return the grid for a chat, loading it from the database on first use"""
+        grid = self.grids.get(chat_id)
+        if grid is None:
+            row = self.db.get_activity(chat_id)
+            grid = ActivityGrid(**row) if row else ActivityGrid()
+            self.grids[chat_id] = grid
+        return grid
+
+    def get_active_board(self, chat_id: int) -> WindowedLeaderboard:
+        """Return the message leaderboard for a chat, rebuilt from the database on first use"""
+        board = self.active.get(chat_id)
+        if board is None:
+            board = WindowedLeaderboard(self.window_days)
+            today = datetime.now(timezone.utc).strftime('%Y-%m-%d')
+            for user_id, day, messages in self.db.get_user_activity(chat_id, board.cutoff(today)):
+                board.add(day, user_id, messages)
+            self.active[chat_id] = board
+        return board
+
+    def get_warned_board(self, chat_id: int) -> Leaderboard:
+        """Return the warning leaderboard for a chat, rebuilt from the database on first use"""
+        board = self.warned.get(chat_id)
+        if board is None:
+            board = Leaderboard()
+            for user_id, count in self.db.get_warning_counts(chat_id).items():
+                board.set(user_id, count)
+            self.warned[chat_id] = board
+        return board
+
+    def get_sketch(self, chat_id: int, day: str) -> HyperLogLog:
+        """Return the distinct-user sketch for a chat and day, loading it on first use"""
+        key = (chat_id, day)
+        sketch = self.sketches.get(key)
+        if sketch is None:
+            stored = self.db.get_user_sketches(chat_id, day, day)
+            sketch = HyperLogLog(stored.get(day))
+            self.sketches[key] = sketch
+        return sketch
+
+    def record_message(self, chat_id: int, message: Message):
+        """Count a message in its chat's daily statistics, activity grid and leaderboard"""
+        date = message.date
+        day = date.strftime('%Y-%m-%d')
+        key = (chat_id, day)
+        self.pending_messages[key] = self.pending_messages.get(key, 0) + 1
+        self.get_grid(chat_id).record(
+            date.weekday(),
+            date.hour,
+            is_media=message.effective_attachment is not None,
+            is_reply=message.reply_to_message is not None
+        )
+        self.dirty.add(chat_id)
+
+        user = message.from_user
+        if user:
+            self.get_active_board(chat_id).add(day, user.id)
+            key = (chat_id, user.id, day)
+            self.pending_users[key] = self.pending_users.get(key, 0) + 1
+            self.names[user.id] = f"@{user.username}" if user.username else user.first_name
+            if self.get_sketch(chat_id, day).add(user.id):
+                self.dirty_sketches.add((chat_id, day))
+            self.touch(chat_id, user.id, int(date.timestamp()))
+
+    def touch(self, chat_id: int, user_id: int, timestamp: int):
+        """Record that a user was seen in a chat; written on the next last-seen flush"""
+        key = (chat_id, user_id)
+        self.pending_seen[key] = timestamp
+        self.departed.discard(key)
+
+    def forget(self, chat_id: int, user_id: int):
+        """Drop a member who left the chat from last-seen tracking"""
+        key = (chat_id, user_id)
+        self.pending_seen.pop(key, None)
+        self.departed.add(key)
+
+    def record_warning(self, chat_id: int, user_id: int):
+        """Count a warning that has already been written to the database"""
+        board = self.warned.get(chat_id)
+        if board is None:
+            # Loading from the database already includes the new warning
+            self.get_warned_board(chat_id)
+            return
+        board.add(user_id)
+
+    def clear_warnings(self, chat_id: int, user_id: int):
+        self.get_warned_board(chat_id).set(user_id, 0)
+
+    def top_active(self, chat_id: int, limit: int = 10) -> List[Tuple[int, int]]:
+        today = datetime.now(timezone.utc).strftime('%Y-%m-%d')
+        return self.get_active_board(chat_id).top(today, limit)
+
+    def top_warned(self, chat_id: int, limit: int = 10) -> List[Tuple[int, int]]:
+        return self.get_warned_board(chat_id).top(limit)
+
+    def unique_users(self, chat_id: int, days: int = 1) -> int:
+        """Approximate distinct senders over the last N days, today included"""
+        today = datetime.now(timezone.utc)
+        start = (today - timedelta(days=days - 1)).strftime('%Y-%m-%d')
+        end = today.strftime('%Y-%m-%d')
+
+        sketches = {day: HyperLogLog(blob) for day, blob in self.db.get_user_sketches(chat_id, start, end).items()}
+        for (sketch_chat, day), sketch in self.sketches.items():
+            if sketch_chat == chat_id and start <= day <= end:
+                sketches[day] = sketch
+
+        return HyperLogLog.union(sketches.values()).count()
+
+    def display_name(self, user_id: int) -> str:
+        """Best known display name for a user, without touching Telegram"""
+        name = self.names.get(user_id)
+        if name is None:
+            user = self.db.get_user(user_id)
+            if user and user.get('username'):
+                name = f"@{user['username']}"
+            elif user and user.get('first_name'):
+                name = user['first_name']
+            else:
+                name = str(user_id)
+            self.names[user_id] = name
+        return name
+
+    def flush_last_seen(self) -> int:
+        """Write buffered last-seen times and departures in one batch each"""
+        written = 0
+
+        if self.pending_seen:
+            rows = [(chat_id, user_id, timestamp) for (chat_id, user_id), timestamp in self.pending_seen.items()]
+            self.db.save_last_seen(rows)
+            self.pending_seen.clear()
+            written += len(rows)
+
+        if self.departed:
+            self.db.delete_last_seen(list(self.departed))
+            written += len(self.departed)
+            self.departed.clear()
+
+        return written
+
+    def flush_message_counts(self) -> int:
+        """Add buffered message counts to statistics; called before anything reads that table"""
+        if not self.pending_messages:
+            return 0
+        rows = [(chat_id, day, count) for (chat_id, day), count in self.pending_messages.items()]
+        self.db.add_message_counts(rows)
+        self.pending_messages.clear()
+        return len(rows)
+
+    def flush(self) -> int:
+        """Write counters changed since the last flush to the database"""
+        written = self.flush_last_seen() + self.flush_message_counts()
+
+        if self.dirty:
+            rows = []
+            for chat_id in self.dirty:
+                grid = self.grids[chat_id]
+                rows.append((chat_id, grid.hours.tobytes(), grid.messages, grid.media, grid.replies))
+            self.db.save_activity(rows)
+            self.dirty.clear()
+            written += len(rows)
+
+        if self.pending_users:
+            rows = [(chat_id, user_id, day, count) for (chat_id, user_id, day), count in self.pending_users.items()]
+            self.db.add_user_activity(rows)
+            self.pending_users.clear()
+            written += len(rows)
+
+        if self.dirty_sketches:
+            rows = [(chat_id, day, self.sketches[(chat_id, day)].to_bytes()) for chat_id, day in self.dirty_sketches]
+            self.db.save_user_sketches(rows)
+            self.dirty_sketches.clear()
+            written += len(rows)
+
+        # Only today's sketches stay in memory; older days are read back from the database
+        today = datetime.now(timezone.utc).strftime('%Y-%m-%d')
+        for key in [key for key in self.sketches if key[1] != today]:
+            del self.sketches[key]
+
+        return written
+
+    async def flush_job(self, context: ContextTypes.DEFAULT_TYPE):
+        """Job queue callback for periodic persistence"""
+        self.flush()
+
+    async def last_seen_job(self, context: ContextTypes.DEFAULT_TYPE):
+        """Job queue callback for the more frequent last-seen flush"""
+        self.flush_last_seen()
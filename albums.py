@@ -0,0 +1,120 @@
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+from telegram import InputMediaAudio, InputMediaDocument, InputMediaPhoto, InputMediaVideo, Message
+
+from metrics import CACHE_HITS, CACHE_MISSES
+
+MEDIA_TYPES = {
+    'photo': InputMediaPhoto,
+    'video': InputMediaVideo,
+    'document': InputMediaDocument,
+    'audio': InputMediaAudio,
+}
+
+def get_media(message: Message) -> Optional[Tuple[str, object]]:
+    """Return (kind, file) for the album-capable media in a message, or None"""
+    if message.photo:
+        return 'photo', message.photo[-1]  # largest size
+    for kind in ('video', 'document', 'audio'):
+        media = getattr(message, kind)
+        if media:
+            return kind, media
+    return None
+
+class FileIdCache:
+    """LRU map of file_unique_id → file_id.
+
+    file_unique_id is stable for the same file while file_id can differ between
+    messages; the first usable file_id seen for an asset is reused for every
+    later send of it.
+    """
+
+    def __init__(self, max_size: int = 10000):
+        self.max_size = max_size
+        self.entries: 'OrderedDict[str, str]' = OrderedDict()
+
+    def get(self, file_unique_id: str) -> Optional[str]:
+        file_id = self.entries.get(file_unique_id)
+        if file_id is not None:
+            self.entries.move_to_end(file_unique_id)
+            CACHE_HITS.inc(cache='file_id')
+        else:
+            CACHE_MISSES.inc(cache='file_id')
+        return file_id
+
+    def put(self, file_unique_id: str, file_id: str):
+        self.entries[file_unique_id] = file_id
+        self.entries.move_to_end(file_unique_id)
+        if len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+
+    def resolve(self, media) -> str:
+        """file_id to send for a PhotoSize/Video/Document/Audio, remembering it if new"""
+        file_id = self.get(media.file_unique_id)
+        if file_id is None:
+            file_id = media.file_id
+            self.put(media.file_unique_id, file_id)
+        return file_id
+
+    def remember(self, messages):
+        """Record the file_ids of messages the bot just sent"""
+        for message in messages:
+            found = get_media(message)
+            if found:
+                self.resolve(found[1])
+
+    def to_input_media(self, message: Message):
+        """Build the InputMedia item for one album message, keeping its caption"""
+        kind, media = get_media(message)
+        return MEDIA_TYPES[kind](
+            media=self.resolve(media),
+            caption=message.caption,
+            caption_entities=message.caption_entities
+        )
+
+class MediaGroupCollector:
+    """Collects the separate updates Telegram sends for one album.
+
+    Items of a media group arrive as individual messages sharing a
+    media_group_id. A group is considered complete once no new item has
+    arrived for `window` seconds. Only the most recent `max_groups` albums are
+    kept.
+    """
+
+    def __init__(self, window: float = 1.0, max_groups: int = 1000):
+        self.window = window
+        self.max_groups = max_groups
+        self.groups: 'OrderedDict[Tuple[int, str], Dict]' = OrderedDict()
+
+    def add(self, message: Message) -> bool:
+        """Remember an album item; returns False for messages outside a media group"""
+        if not message.media_group_id or not get_media(message):
+            return False
+
+        key = (message.chat_id, message.media_group_id)
+        group = self.groups.get(key)
+        if group is None:
+            group = self.groups[key] = {'items': {}, 'updated': 0.0}
+            if len(self.groups) > self.max_groups:
+                self.groups.popitem(last=False)
+        if message.message_id not in group['items']:
+            group['items'][message.message_id] = message
+            group['updated'] = time.monotonic()
+        return True
+
+    async def collect(self, message: Message) -> List[Message]:
+        """All known items of the message's album in order, once the album has settled"""
+        self.add(message)
+        group = self.groups.get((message.chat_id, message.media_group_id))
+        if group is None:
+            return [message]
+
+        while True:
+            remaining = group['updated'] + self.window - time.monotonic()
+            if remaining <= 0:
+                break
+            await asyncio.sleep(remaining)
+
+        return [group['items'][message_id] for message_id in sorted(group['items'])]
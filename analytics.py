@@ -1,34 +1,59 @@
+import html
+import random
 import sqlite3
-import matplotlib.pyplot as plt
-import matplotlib.dates as mdates
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 from io import BytesIO
 from typing import Dict, List, Tuple, Optional
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import ContextTypes
+from config import config
 from database import Database
 from utilities import is_admin, build_menu
+from activity import ActivityTracker
+from metrics import stage
+
+INACTIVE_PAGE_SIZE = 20
+
+def charting():
+    """(pyplot, matplotlib.dates), imported on first use: matplotlib is the slowest
+    import in the bot and only charts need it"""
+    import matplotlib.dates as mdates
+    import matplotlib.pyplot as plt
+    return plt, mdates
+
+def render_chart(fig) -> BytesIO:
+    """Lay out and save a figure to a PNG buffer, then free it"""
+    plt, _ = charting()
+    with stage('render'):
+        fig.tight_layout()
+        buf = BytesIO()
+        fig.savefig(buf, format='png')
+        buf.seek(0)
+        plt.close(fig)
+    return buf
 
 class Analytics:
     def __init__(self, db: Database):
         self.db = db
+        self.activity = ActivityTracker(db, config.leaderboard_days)
     
     async def show_stats(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Show group statistics"""
         chat_id = update.effective_chat.id
         
         # Get statistics for last 7 days
+        self.activity.flush_message_counts()
         dates = [(datetime.now() - timedelta(days=i)).strftime('%Y-%m-%d') for i in range(7)]
+        stored = {s['date']: s for s in self.db.get_statistics(chat_id, dates[-1], dates[0])}
         stats = []
         
         for date in dates:
-            # This would normally come from the database
-            # For now, we'll use mock data
+            row = stored.get(date, {})
             stats.append({
                 'date': date,
-                'messages': 100 + int(20 * (i/7)),
-                'joins': 5 + int(3 * (i/7)),
-                'leaves': 2 + int(1 * (i/7))
+                'messages': row.get('messages', 0),
+                'joins': row.get('joins', 0),
+                'leaves': row.get('leaves', 0)
             })
         
         # Generate stats message
@@ -49,12 +74,15 @@ class Analytics:
         message += f"   💬 Messages: {total_messages}\n"
         message += f"   👥 Joins: {total_joins}\n"
         message += f"   🚪 Leaves: {total_leaves}\n"
-        message += f"   👤 Net Growth: {total_joins - total_leaves}\n\n"
+        message += f"   👤 Net Growth: {total_joins - total_leaves}\n"
+        message += f"   🙋 Active Today: ~{self.activity.unique_users(chat_id, 1)}\n"
+        message += f"   🙋 Active This Week: ~{self.activity.unique_users(chat_id, 7)}\n\n"
         
         # Add activity graph
         message += "📈 <b>Activity Graph:</b>"
         
         # Create activity graph
+        plt, mdates = charting()
         fig, ax = plt.subplots(figsize=(10, 6))
         dates = [datetime.strptime(stat['date'], '%Y-%m-%d') for stat in stats]
         messages = [stat['messages'] for stat in stats]
@@ -70,13 +98,8 @@ class Analytics:
         ax.xaxis.set_major_formatter(mdates.DateFormatter('%Y-%m-%d'))
         ax.xaxis.set_major_locator(mdates.DayLocator())
         plt.xticks(rotation=45)
-        plt.tight_layout()
         
-        # Save plot to bytes buffer
-        buf = BytesIO()
-        plt.savefig(buf, format='png')
-        buf.seek(0)
-        plt.close()
+        buf = render_chart(fig)
         
         # Send message with graph
         await update.message.reply_photo(
@@ -138,40 +161,30 @@ class Analytics:
     async def top_warned(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Show top warned users"""
         chat_id = update.effective_chat.id
-        
-        # This would normally come from the database
-        # For now, we'll use mock data
-        top_warned = [
-            {"user_id": 123456789, "warnings": 5, "username": "user1"},
-            {"user_id": 987654321, "warnings": 3, "username": "user2"},
-            {"user_id": 456789123, "warnings": 2, "username": "user3"},
-        ]
+        top_warned = self.activity.top_warned(chat_id, 10)
         
         message = "⚠️ <b>Top Warned Users</b>\n\n"
         
-        for i, user in enumerate(top_warned, 1):
-            message += f"{i}. @{user['username']} - {user['warnings']} warnings\n"
+        for i, (user_id, warnings) in enumerate(top_warned, 1):
+            message += f"{i}. {html.escape(self.activity.display_name(user_id))} - {warnings} warnings\n"
+        
+        if not top_warned:
+            message += "🎉 No warnings in this group."
         
         await update.message.reply_text(message, parse_mode='HTML')
     
     async def top_active(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Show most active users"""
         chat_id = update.effective_chat.id
+        top_active = self.activity.top_active(chat_id, 10)
         
-        # This would normally come from the database
-        # For now, we'll use mock data
-        top_active = [
-            {"user_id": 123456789, "messages": 150, "username": "active_user1"},
-            {"user_id": 987654321, "messages": 120, "username": "active_user2"},
-            {"user_id": 456789123, "messages": 95, "username": "active_user3"},
-            {"user_id": 789123456, "messages": 80, "username": "active_user4"},
-            {"user_id": 321654987, "messages": 65, "username": "active_user5"},
-        ]
+        message = f"🏆 <b>Most Active Users (Last {self.activity.window_days} Days)</b>\n\n"
         
-        message = "🏆 <b>Most Active Users</b>\n\n"
+        for i, (user_id, messages) in enumerate(top_active, 1):
+            message += f"{i}. {html.escape(self.activity.display_name(user_id))} - {messages} messages\n"
         
-        for i, user in enumerate(top_active, 1):
-            message += f"{i}. @{user['username']} - {user['messages']} messages\n"
+        if not top_active:
+            message += "No messages recorded yet."
         
         await update.message.reply_text(message, parse_mode='HTML')
     
@@ -198,6 +211,7 @@ class Analytics:
         leaves = [1 + int(2 * (i/days)) + random.randint(0, 1) for i in range(days)]
         
         # Create the graph
+        plt, mdates = charting()
         fig, (ax1, ax2) = plt.subplots(2, 1, figsize=(10, 8))
         
         # Plot message activity
@@ -222,13 +236,7 @@ class Analytics:
             ax.xaxis.set_major_locator(mdates.DayLocator(interval=max(1, days//7)))
             plt.setp(ax.xaxis.get_majorticklabels(), rotation=45)
         
-        plt.tight_layout()
-        
-        # Save plot to bytes buffer
-        buf = BytesIO()
-        plt.savefig(buf, format='png')
-        buf.seek(0)
-        plt.close()
+        buf = render_chart(fig)
         
         # Calculate totals
         total_messages = sum(messages)
@@ -252,7 +260,7 @@ class Analytics:
     
     async def export_stats(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Export statistics as CSV file"""
-        if not is_admin(update, context):
+        if not await is_admin(update, context):
             await update.message.reply_text("❌ This command is only available for admins.")
             return
         
@@ -290,50 +298,78 @@ class Analytics:
                 await update.message.reply_text("❌ Please specify a valid number of days.")
                 return
         
-        # This would normally come from the database
-        # For now, we'll use mock data
-        inactive_members = [
-            {"user_id": 123456789, "username": "inactive1", "last_seen": "2023-10-15"},
-            {"user_id": 987654321, "username": "inactive2", "last_seen": "2023-10-10"},
-            {"user_id": 456789123, "username": "inactive3", "last_seen": "2023-10-05"},
-            {"user_id": 789123456, "username": "inactive4", "last_seen": "2023-10-01"},
-            {"user_id": 321654987, "username": "inactive5", "last_seen": "2023-09-28"},
-        ]
+        text, keyboard = self.inactive_page(chat_id, days_threshold)
+        await update.message.reply_text(text, reply_markup=keyboard, parse_mode='HTML')
+    
+    def inactive_page(self, chat_id: int, days: int, after: Tuple[int, int] = None, shown: int = 0):
+        """Build one page of inactive members, continuing after the (last_seen, user_id) key"""
+        # Make sure recent activity is visible to the query
+        self.activity.flush_last_seen()
         
-        message = f"😴 <b>Inactive Members (>{days_threshold} days)</b>\n\n"
+        before = int((datetime.now(timezone.utc) - timedelta(days=days)).timestamp())
+        members = self.db.get_inactive_members(chat_id, before, after, INACTIVE_PAGE_SIZE + 1)
+        has_more = len(members) > INACTIVE_PAGE_SIZE
+        members = members[:INACTIVE_PAGE_SIZE]
         
-        for i, member in enumerate(inactive_members, 1):
-            message += f"{i}. @{member['username']} - Last seen: {member['last_seen']}\n"
+        message = f"😴 <b>Inactive Members (>{days} days)</b>\n\n"
         
-        if not inactive_members:
+        for i, (user_id, last_seen) in enumerate(members, shown + 1):
+            last_seen_date = datetime.fromtimestamp(last_seen, timezone.utc).strftime('%Y-%m-%d')
+            message += f"{i}. {html.escape(self.activity.display_name(user_id))} - Last seen: {last_seen_date}\n"
+        
+        if not members and not shown:
             message += "🎉 No inactive members found! Everyone is active."
         
-        await update.message.reply_text(message, parse_mode='HTML')
+        keyboard = None
+        if has_more:
+            last_seen, user_id = members[-1][1], members[-1][0]
+            keyboard = InlineKeyboardMarkup([[InlineKeyboardButton(
+                "Next ▶️",
+                callback_data=f"inactive:{days}:{last_seen}:{user_id}:{shown + len(members)}"
+            )]])
+        
+        return message, keyboard
+    
+    async def inactive_callback(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Show the next page of /inactive"""
+        query = update.callback_query
+        _, days, last_seen, user_id, shown = query.data.split(':')
+        
+        text, keyboard = self.inactive_page(
+            query.message.chat_id, int(days), (int(last_seen), int(user_id)), int(shown)
+        )
+        await query.edit_message_text(text, reply_markup=keyboard, parse_mode='HTML')
     
     async def message_metrics(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Show detailed message metrics"""
         chat_id = update.effective_chat.id
+        grid = self.activity.get_grid(chat_id)
+        
+        # Average over the last 7 days of the statistics table
+        self.activity.flush_message_counts()
+        end_date = datetime.now()
+        start_date = end_date - timedelta(days=6)
+        daily = self.db.get_statistics(
+            chat_id, start_date.strftime('%Y-%m-%d'), end_date.strftime('%Y-%m-%d')
+        )
+        weekly_messages = sum(s['messages'] for s in daily)
+        avg_daily = round(weekly_messages / 7)
+        active_today = self.activity.unique_users(chat_id, 1)
+        active_week = self.activity.unique_users(chat_id, 7)
         
-        # This would normally come from the database
-        # For now, we'll use mock data
-        metrics = {
-            "total_messages": 1250,
-            "avg_daily_messages": 178,
-            "peak_hour": "18:00-19:00",
-            "most_active_day": "Monday",
-            "messages_per_user": 12.5,
-            "media_percentage": 35,
-            "reply_percentage": 20,
-        }
+        peak_hour = grid.peak_hour()
         
         message = "📈 <b>Message Metrics</b>\n\n"
-        message += f"💬 <b>Total Messages:</b> {metrics['total_messages']}\n"
-        message += f"📅 <b>Avg Daily Messages:</b> {metrics['avg_daily_messages']}\n"
-        message += f"⏰ <b>Peak Hour:</b> {metrics['peak_hour']}\n"
-        message += f"📆 <b>Most Active Day:</b> {metrics['most_active_day']}\n"
-        message += f"👤 <b>Messages per User:</b> {metrics['messages_per_user']}\n"
-        message += f"🖼️ <b>Media Messages:</b> {metrics['media_percentage']}%\n"
-        message += f"↩️ <b>Reply Messages:</b> {metrics['reply_percentage']}%\n"
+        message += f"💬 <b>Total Messages:</b> {grid.messages}\n"
+        message += f"📅 <b>Avg Daily Messages:</b> {avg_daily}\n"
+        message += f"🙋 <b>Active Users:</b> ~{active_today} today, ~{active_week} this week\n"
+        if active_week:
+            message += f"👤 <b>Messages per User:</b> {round(weekly_messages / active_week, 1)}\n"
+        if peak_hour is not None:
+            message += f"⏰ <b>Peak Hour:</b> {peak_hour:02d}:00-{(peak_hour + 1) % 24:02d}:00 UTC\n"
+            message += f"📆 <b>Most Active Day:</b> {grid.most_active_day()}\n"
+        message += f"🖼️ <b>Media Messages:</b> {grid.percentage(grid.media)}%\n"
+        message += f"↩️ <b>Reply Messages:</b> {grid.percentage(grid.replies)}%\n"
         
         await update.message.reply_text(message, parse_mode='HTML')
 
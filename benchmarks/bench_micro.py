@@ -0,0 +1,271 @@
+"""Microbenchmarks for Database queries and the moderation checks, with regression gates.
+
+Database paths run against an on-disk SQLite file pre-filled to each size
+(rows in the warnings and statistics tables). Moderation paths run over
+short, medium and long messages.
+
+Usage:
+    python benchmarks/bench_micro.py run [--sizes 10k,1m,10m] [--only db.] [-o results.json]
+    python benchmarks/bench_micro.py run --baseline baseline.json [--threshold 0.15]
+    python benchmarks/bench_micro.py compare baseline.json results.json [--threshold 0.15]
+
+compare (and run --baseline) exits with status 1 when any path is slower
+than the baseline by more than the threshold.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+from types import SimpleNamespace
+from typing import Callable, Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('BOT_TOKEN', '123456:offline')
+
+from telegram import Update
+
+from harness import CHAT_BASE, make_fake_bot, preserve_settings
+
+GROUPS = 1000
+SIZES = {'10k': 10_000, '100k': 100_000, '1m': 1_000_000, '10m': 10_000_000}
+BATCH = 100_000
+
+WORDS = ['the', 'meeting', 'is', 'moved', 'to', 'tomorrow', 'please', 'check', 'release', 'notes',
+         'অনেক', 'ধন্যবাদ', 'group', 'photo', 'lol', 'ok', 'thanks', 'everyone', 'link', 'below']
+EMOJIS = ['😂', '🎉', '🔥', '👍', '❤', '🙏', '😊', '🚀']
+LINKS = ['https://example.com/a', 'http://t.me/somechannel', 'https://docs.python.org/3/library/re.html']
+MESSAGE_SIZES = {'short': (5, 40), 'medium': (100, 400), 'long': (2000, 4096)}
+
+def measure(run: Callable[[int], None], repeat: int = 5, min_time: float = 0.2) -> Dict[str, float]:
+    """Time run(ops) like timeit: grow ops until one pass takes min_time, then repeat
+
+    Returns nanoseconds per operation; `ns_per_op` is the fastest pass, which
+    is the least noisy figure to gate on.
+    """
+    ops = 1
+    while True:
+        started = time.perf_counter()
+        run(ops)
+        if time.perf_counter() - started >= min_time or ops >= 1_000_000:
+            break
+        ops *= 2 if ops < 8 else 10
+
+    passes = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        run(ops)
+        passes.append((time.perf_counter() - started) / ops * 1e9)
+    passes.sort()
+    return {'ns_per_op': round(passes[0], 1), 'median_ns': round(passes[len(passes) // 2], 1), 'ops': ops}
+
+def populate(db, rows: int, rng: random.Random):
+    """rows warnings and rows statistics entries spread over GROUPS groups"""
+    users = max(100, rows // 20)
+    start = date(2000, 1, 1)
+    days = max(1, rows // GROUPS)
+
+    for first in range(0, users, BATCH):
+        db.conn.executemany(
+            'INSERT INTO users (user_id, username, first_name) VALUES (?, ?, ?)',
+            ((user_id, f"user{user_id}", f"User{user_id}") for user_id in range(first, min(users, first + BATCH)))
+        )
+    for first in range(0, rows, BATCH):
+        db.conn.executemany(
+            'INSERT INTO warnings (user_id, group_id, reason, date, admin_id) VALUES (?, ?, ?, ?, ?)',
+            ((rng.randrange(users), CHAT_BASE - rng.randrange(GROUPS), 'bench', '2024-01-01 12:00:00', 1)
+             for _ in range(first, min(rows, first + BATCH)))
+        )
+    for first in range(0, rows, BATCH):
+        db.conn.executemany(
+            'INSERT OR IGNORE INTO statistics (group_id, date, messages, joins, leaves) VALUES (?, ?, ?, ?, ?)',
+            ((CHAT_BASE - index % GROUPS, (start + timedelta(days=index // GROUPS)).isoformat(), 10, 1, 1)
+             for index in range(first, min(rows, first + BATCH)))
+        )
+    db.conn.commit()
+    return users, [(start + timedelta(days=day)).isoformat() for day in range(days)]
+
+def database_cases(label: str, rows: int, directory: str) -> Dict[str, Callable[[int], None]]:
+    from database import Database
+
+    rng = random.Random(rows)
+    db = Database(os.path.join(directory, f"bench_{label}.db"))
+    started = time.perf_counter()
+    users, dates = populate(db, rows, rng)
+    print(f"  populated {rows:,} rows in {time.perf_counter() - started:.1f}s", file=sys.stderr)
+
+    def group():
+        return CHAT_BASE - rng.randrange(GROUPS)
+
+    def update_statistics(ops):
+        for _ in range(ops):
+            db.update_statistics(group(), rng.choice(dates), messages=1)
+
+    def add_warning(ops):
+        for _ in range(ops):
+            db.add_warning(rng.randrange(users), group(), 'bench', 1)
+
+    def get_warnings(ops):
+        for _ in range(ops):
+            db.get_warnings(rng.randrange(users), group())
+
+    def get_top_warned_users(ops):
+        for _ in range(ops):
+            db.get_top_warned_users(group())
+
+    return {
+        f"db.update_statistics[{label}]": update_statistics,
+        f"db.add_warning[{label}]": add_warning,
+        f"db.get_warnings[{label}]": get_warnings,
+        f"db.get_top_warned_users[{label}]": get_top_warned_users,
+    }
+
+def make_text(rng: random.Random, low: int, high: int) -> str:
+    """Chat-like text of low..high characters with occasional emoji and links"""
+    target = rng.randint(low, high)
+    parts, length = [], 0
+    while length < target:
+        roll = rng.random()
+        part = rng.choice(EMOJIS) if roll < 0.08 else rng.choice(LINKS) if roll < 0.1 else rng.choice(WORDS)
+        parts.append(part)
+        length += len(part) + 1
+    return ' '.join(parts)[:high]
+
+def moderation_cases(bot, loop: asyncio.AbstractEventLoop) -> Dict[str, Callable[[int], None]]:
+    from database import Database
+    from moderation import EMOJI_PATTERN, LINK_PATTERN, Moderation
+
+    moderation = Moderation(Database(':memory:'))
+    context = SimpleNamespace(bot=bot)
+    rng = random.Random(3)
+    cases = {}
+
+    for size, (low, high) in MESSAGE_SIZES.items():
+        texts = [make_text(rng, low, high) for _ in range(500)]
+        updates = [
+            Update.de_json({'update_id': index, 'message': {
+                'message_id': index, 'date': 0, 'text': text,
+                'chat': {'id': CHAT_BASE - index % 10, 'type': 'supergroup'},
+                'from': {'id': 1000 + index, 'is_bot': False, 'first_name': 'User'},
+            }}, bot)
+            for index, text in enumerate(texts)
+        ]
+
+        def checker(check, updates=updates):
+            async def run(ops):
+                for index in range(ops):
+                    if index % len(updates) == 0:
+                        # Every sender posts once per cycle, so no one trips the flood limit
+                        moderation.flood_data.clear()
+                    await check(updates[index % len(updates)], context)
+            return lambda ops: loop.run_until_complete(run(ops))
+
+        def scanner(scan, texts=texts):
+            def run(ops):
+                for index in range(ops):
+                    scan(texts[index % len(texts)])
+            return run
+
+        cases[f"moderation.check_flood[{size}]"] = checker(moderation.check_flood)
+        cases[f"moderation.check_spam[{size}]"] = checker(moderation.check_spam)
+        cases[f"moderation.emoji_scan[{size}]"] = scanner(lambda text: len(EMOJI_PATTERN.findall(text)))
+        cases[f"moderation.link_scan[{size}]"] = scanner(LINK_PATTERN.search)
+    return cases
+
+def run_benchmarks(sizes: List[str], only: str, repeat: int, min_time: float) -> Dict:
+    results = {}
+
+    def run_cases(cases):
+        for name, case in cases.items():
+            if only and not name.startswith(only):
+                continue
+            results[name] = measure(case, repeat, min_time)
+            print(f"{name:45} {results[name]['ns_per_op'] / 1000:>12,.2f} µs/op", file=sys.stderr)
+
+    loop = asyncio.new_event_loop()
+    bot = make_fake_bot()
+    loop.run_until_complete(bot.initialize())
+    with preserve_settings():
+        run_cases(moderation_cases(bot, loop))
+    loop.run_until_complete(bot.shutdown())
+    loop.close()
+
+    if not only or only.startswith('db') or 'db'.startswith(only):
+        with tempfile.TemporaryDirectory() as directory:
+            for label in sizes:
+                print(f"database at {label} rows", file=sys.stderr)
+                run_cases(database_cases(label, SIZES[label], directory))
+
+    return {
+        'meta': {
+            'python': platform.python_version(),
+            'machine': platform.machine(),
+            'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        },
+        'results': results,
+    }
+
+def compare(baseline: Dict, current: Dict, threshold: float) -> bool:
+    """Print every shared path's change; False if any regressed beyond threshold"""
+    ok = True
+    before, after = baseline['results'], current['results']
+    for name in sorted(set(before) | set(after)):
+        if name not in before or name not in after:
+            print(f"  {name:45} only in {'current' if name in after else 'baseline'}")
+            continue
+        change = after[name]['ns_per_op'] / before[name]['ns_per_op'] - 1
+        regressed = change > threshold
+        ok = ok and not regressed
+        marker = '❌' if regressed else '  '
+        print(f"{marker}{name:45} {before[name]['ns_per_op'] / 1000:>10,.2f} -> "
+              f"{after[name]['ns_per_op'] / 1000:>10,.2f} µs/op ({change:+.1%})")
+    print(f"\n{'OK' if ok else 'REGRESSION'}: threshold {threshold:.0%}")
+    return ok
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    run = commands.add_parser('run', help='run the benchmarks')
+    run.add_argument('--sizes', default='10k,1m', help=f"comma separated, from {', '.join(SIZES)}")
+    run.add_argument('--only', default='', help='only run paths starting with this prefix, e.g. db. or moderation.check')
+    run.add_argument('--repeat', type=int, default=5)
+    run.add_argument('--min-time', type=float, default=0.2, help='seconds per timed pass')
+    run.add_argument('-o', '--output', help='write results as JSON (use as a baseline later)')
+    run.add_argument('--baseline', help='compare against this JSON and fail on regression')
+    run.add_argument('--threshold', type=float, default=0.15, help='allowed slowdown, 0.15 = 15%%')
+
+    check = commands.add_parser('compare', help='compare two result files')
+    check.add_argument('baseline')
+    check.add_argument('current')
+    check.add_argument('--threshold', type=float, default=0.15, help='allowed slowdown, 0.15 = 15%%')
+
+    args = parser.parse_args()
+
+    if args.command == 'compare':
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        with open(args.current) as f:
+            current = json.load(f)
+        sys.exit(0 if compare(baseline, current, args.threshold) else 1)
+
+    sizes = [size.strip() for size in args.sizes.split(',') if size.strip()]
+    unknown = [size for size in sizes if size not in SIZES]
+    if unknown:
+        parser.error(f"unknown sizes: {', '.join(unknown)}")
+
+    current = run_benchmarks(sizes, args.only, args.repeat, args.min_time)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(current, f, indent=2)
+    if args.baseline:
+        with open(args.baseline) as f:
+            sys.exit(0 if compare(json.load(f), current, args.threshold) else 1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,136 @@
+"""Replay recorded or synthetic updates through the real handlers against a fake Bot.
+
+Updates go through the same ChatOrderedProcessor and Application.process_update
+path as in production. The fake Bot answers API calls in-process after a
+configurable delay and counts them.
+
+Record real traffic by running the bot with RECORD_UPDATES=/path/updates.jsonl.
+
+Usage:
+    python benchmarks/bench_replay.py [--updates 5000] [--chats 50] [--api-latency 30] [--jitter 20]
+    python benchmarks/bench_replay.py --recording updates.jsonl
+    python benchmarks/bench_replay.py --json results.json [--baseline baseline.json]
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('BOT_TOKEN', '123456:offline')
+os.environ['DATABASE_URL'] = ':memory:'
+os.environ.setdefault('ADMIN_ID', '42')
+
+from telegram import Update
+
+from harness import load_recording, make_fake_bot, percentile, preserve_settings, synthetic_updates
+
+ADMIN_ID = int(os.environ['ADMIN_ID'])
+
+async def replay(raw_updates, api_latency: float, jitter: float):
+    from main import GroupMegBot
+    from metrics import ERRORS
+
+    bot = make_fake_bot(api_latency, jitter, admins=[ADMIN_ID])
+    gm_bot = GroupMegBot()
+    application = gm_bot.build_application(bot=bot)
+    processor = application.update_processor
+    durations, latencies = [], []
+
+    async def handle(update, queued):
+        started = time.perf_counter()
+        await application.process_update(update)
+        finished = time.perf_counter()
+        durations.append(finished - started)
+        latencies.append(finished - queued)
+
+    async with application:
+        await application.start()
+        updates = [Update.de_json(raw, application.bot) for raw in raw_updates]
+        bot.calls.clear()
+        errors_before = dict(ERRORS.values)
+
+        started = time.perf_counter()
+        # Same path as Application's update fetcher, without the update_queue hop
+        await asyncio.gather(*(
+            processor.process_update(update, handle(update, time.perf_counter()))
+            for update in updates
+        ))
+        elapsed = time.perf_counter() - started
+
+        await application.stop()
+
+    calls = sum(bot.calls.values())
+    errors = {
+        labels[0]: int(count - errors_before.get(labels, 0))
+        for labels, count in ERRORS.values.items() if count > errors_before.get(labels, 0)
+    }
+    return {
+        'updates': len(updates),
+        'seconds': round(elapsed, 3),
+        'updates_per_sec': round(len(updates) / elapsed, 1),
+        'handler_p50_ms': round(percentile(durations, 0.50) * 1000, 2),
+        'handler_p99_ms': round(percentile(durations, 0.99) * 1000, 2),
+        'end_to_end_p50_ms': round(percentile(latencies, 0.50) * 1000, 2),
+        'end_to_end_p99_ms': round(percentile(latencies, 0.99) * 1000, 2),
+        'api_calls_per_update': round(calls / len(updates), 3),
+        'errors': sum(errors.values()),
+        'error_types': errors,
+        'api_calls': dict(bot.calls.most_common()),
+    }
+
+def compare(results, baseline):
+    """Print the relative change of every numeric result against a baseline run"""
+    print("\nvs baseline:")
+    for key, value in results.items():
+        before = baseline.get(key)
+        if not isinstance(value, (int, float)) or not isinstance(before, (int, float)):
+            continue
+        change = (value - before) / before * 100 if before else 0.0
+        print(f"  {key:22} {before:>10} -> {value:>10}  ({change:+.1f}%)")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--recording', help='JSONL file written with RECORD_UPDATES')
+    parser.add_argument('--updates', type=int, default=5000)
+    parser.add_argument('--chats', type=int, default=50)
+    parser.add_argument('--api-latency', type=float, default=30, help='milliseconds per API call')
+    parser.add_argument('--jitter', type=float, default=20, help='extra random milliseconds per API call')
+    parser.add_argument('--json', help='write results to this file')
+    parser.add_argument('--baseline', help='compare against results written earlier with --json')
+    parser.add_argument('--verbose', action='store_true', help='keep the bot logging')
+    args = parser.parse_args()
+
+    if not args.verbose:
+        logging.disable(logging.WARNING)
+
+    if args.recording:
+        raw_updates = load_recording(args.recording)
+    else:
+        raw_updates = list(synthetic_updates(args.updates, args.chats, admin_id=ADMIN_ID))
+
+    with preserve_settings():
+        results = asyncio.run(replay(raw_updates, args.api_latency / 1000, args.jitter / 1000))
+
+    for key, value in results.items():
+        if key not in ('api_calls', 'error_types'):
+            print(f"{key:22} {value}")
+    print("api calls:", ', '.join(f"{endpoint} {count}" for endpoint, count in results['api_calls'].items()))
+
+    if results['errors']:
+        # Timings of handlers that raised measure the exception path, not the handler
+        errors = ', '.join(f"{name} {count}" for name, count in results['error_types'].items())
+        sys.exit(f"❌ Handlers raised {results['errors']} errors ({errors}); rerun with --verbose for tracebacks")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+    if args.baseline:
+        with open(args.baseline) as f:
+            compare(results, json.load(f))
+
+if __name__ == '__main__':
+    main()
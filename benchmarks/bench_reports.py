@@ -0,0 +1,70 @@
+"""Benchmark the vectorized owner report across many groups.
+
+Usage: python benchmarks/bench_reports.py [--groups 5000] [--days 365]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import Database
+from reports import GroupReports
+
+def populate(db: Database, groups: int, days: int):
+    """Fill the statistics and moderation tables with synthetic data"""
+    today = datetime.now()
+    dates = [(today - timedelta(days=i)).strftime('%Y-%m-%d') for i in range(days)]
+    rng = random.Random(42)
+
+    stats = (
+        (group_id, date, rng.randint(0, 500), rng.randint(0, 10), rng.randint(0, 8))
+        for group_id in range(-1000000000000 - groups, -1000000000000)
+        for date in dates
+    )
+    db.conn.executemany(
+        'INSERT INTO statistics (group_id, date, messages, joins, leaves) VALUES (?, ?, ?, ?, ?)',
+        stats
+    )
+
+    actions = (
+        (rng.randint(1, 10 ** 9), group_id, 'mute', 300, 'bench', f"{date} 12:00:00", 0)
+        for group_id in range(-1000000000000 - groups, -1000000000000)
+        for date in dates
+        if rng.random() < 0.2
+    )
+    db.conn.executemany(
+        'INSERT INTO moderation (user_id, group_id, action, duration, reason, date, admin_id) VALUES (?, ?, ?, ?, ?, ?, ?)',
+        actions
+    )
+    db.conn.commit()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--groups', type=int, default=5000)
+    parser.add_argument('--days', type=int, default=365)
+    args = parser.parse_args()
+
+    db = Database(':memory:')
+    started = time.perf_counter()
+    populate(db, args.groups, args.days)
+    print(f"populate: {args.groups} groups × {args.days} days in {time.perf_counter() - started:.2f}s")
+
+    reports = GroupReports(db)
+    start_date = (datetime.now() - timedelta(days=args.days - 1)).strftime('%Y-%m-%d')
+
+    started = time.perf_counter()
+    frames = reports.load_frames(start_date)
+    loaded = time.perf_counter()
+    report = reports.compute(frames)
+    computed = time.perf_counter()
+
+    print(f"load:     {loaded - started:.2f}s ({args.groups * args.days} statistics rows)")
+    print(f"compute:  {computed - loaded:.2f}s ({len(report)} groups)")
+    print(f"total:    {computed - started:.2f}s")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+"""Measure update throughput of the sharded worker mode with a fake update source.
+
+Workers run the full handler stack with a fake bot that answers every API
+call locally, so only the bot's own CPU work is measured.
+
+Usage: python benchmarks/bench_sharding.py [--updates 20000] [--chats 500] [--workers 1 2 4]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('BOT_TOKEN', '123456:offline')
+os.environ['DATABASE_URL'] = ':memory:'
+
+from harness import make_fake_bot, preserve_settings
+from sharding import ShardRouter, start_workers, stop_workers
+
+def fake_updates(count: int, chats: int):
+    """Plain group text messages spread over `chats` chats and many senders"""
+    now = int(time.time())
+    for update_id in range(1, count + 1):
+        chat_id = -1000000000000 - update_id % chats
+        user_id = 1000 + update_id
+        yield json.dumps({
+            'update_id': update_id,
+            'message': {
+                'message_id': update_id,
+                'date': now,
+                'chat': {'id': chat_id, 'type': 'supergroup', 'title': f"Group {chat_id}"},
+                'from': {'id': user_id, 'is_bot': False, 'first_name': f"User{user_id}"},
+                'text': f"hello from {user_id}",
+            },
+        }).encode()
+
+def run(workers: int, bodies) -> float:
+    """Seconds from starting the workers until all of them drained their queues"""
+    started = time.perf_counter()
+    processes, queues = start_workers(workers, make_fake_bot)
+    router = ShardRouter(queues)
+    for body in bodies:
+        while not router.dispatch(body):
+            time.sleep(0.001)
+    stop_workers(processes, queues, timeout=600)
+    return time.perf_counter() - started
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--updates', type=int, default=20000)
+    parser.add_argument('--chats', type=int, default=500)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4])
+    args = parser.parse_args()
+
+    with preserve_settings():
+        bodies = list(fake_updates(args.updates, args.chats))
+        baseline = None
+        for workers in args.workers:
+            startup = run(workers, [])
+            elapsed = run(workers, bodies) - startup
+            rate = args.updates / elapsed
+            baseline = baseline or rate / workers
+            print(f"{workers} workers: {rate:8.0f} updates/s  (startup {startup:.1f}s, {rate / baseline / workers:.0%} of linear)")
+
+if __name__ == '__main__':
+    main()
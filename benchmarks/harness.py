@@ -0,0 +1,172 @@
+"""Shared pieces for benchmarks that drive the real handlers without Telegram."""
+import asyncio
+import json
+import os
+import random
+import time
+from collections import Counter
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional
+
+from telegram import ChatMemberMember, ChatMemberOwner, User
+from telegram.ext import ExtBot
+
+BOT_USER = {'id': 123456, 'is_bot': True, 'first_name': 'Bench', 'username': 'bench_bot'}
+CHAT_BASE = -1000000000000
+
+MESSAGE_ENDPOINTS = {'sendMessage', 'copyMessage', 'sendPhoto', 'sendDocument', 'sendVideo', 'sendAnimation', 'editMessageText'}
+
+class FakeBot(ExtBot):
+    """Bot that answers every API call in-process and records it.
+
+    Each call sleeps latency + uniform(0, jitter) seconds to stand in for the
+    network round trip. Users in `admins` are reported as chat owners by
+    getChatMember.
+    """
+
+    def __init__(self, token: str, latency: float = 0.0, jitter: float = 0.0, admins=(), **kwargs):
+        super().__init__(token, **kwargs)
+        self._fake = {
+            'latency': latency,
+            'jitter': jitter,
+            'admins': set(admins),
+            'calls': Counter(),
+            'next_message_id': 1,
+            'rng': random.Random(7),
+        }
+
+    @property
+    def calls(self) -> Counter:
+        return self._fake['calls']
+
+    def message(self, chat_id, text: Optional[str] = None) -> Dict:
+        fake = self._fake
+        fake['next_message_id'] += 1
+        chat_id = int(chat_id) if str(chat_id).lstrip('-').isdigit() else CHAT_BASE
+        return {
+            'message_id': fake['next_message_id'],
+            'date': int(time.time()),
+            'chat': {'id': chat_id, 'type': 'supergroup' if chat_id < 0 else 'private'},
+            'from': BOT_USER,
+            'text': text or '',
+        }
+
+    async def _do_post(self, endpoint, data, **kwargs):
+        fake = self._fake
+        fake['calls'][endpoint] += 1
+        delay = fake['latency'] + (fake['rng'].uniform(0, fake['jitter']) if fake['jitter'] else 0)
+        if delay:
+            await asyncio.sleep(delay)
+
+        if endpoint == 'getMe':
+            return BOT_USER
+        if endpoint in MESSAGE_ENDPOINTS:
+            return self.message(data.get('chat_id'), data.get('text'))
+        if endpoint == 'sendMediaGroup':
+            return [self.message(data.get('chat_id')) for _ in data.get('media', [])]
+        if endpoint == 'getChatMember':
+            user = User(int(data['user_id']), f"User{data['user_id']}", False)
+            if int(data['user_id']) in fake['admins']:
+                return ChatMemberOwner(user, is_anonymous=False).to_dict()
+            return ChatMemberMember(user).to_dict()
+        if endpoint == 'getChatAdministrators':
+            return [ChatMemberOwner(User(admin, f"User{admin}", False), is_anonymous=False).to_dict() for admin in fake['admins']]
+        if endpoint == 'getChatMemberCount':
+            return 100
+        return True
+
+def make_fake_bot(latency: float = 0.0, jitter: float = 0.0, admins=()) -> FakeBot:
+    return FakeBot(os.environ['BOT_TOKEN'], latency=latency, jitter=jitter, admins=admins)
+
+@contextmanager
+def preserve_settings():
+    """Handlers write settings for synthetic chats; put the real snapshot and change log back afterwards"""
+    from config import config
+
+    store = config.settings_store
+    store.flush()
+    saved = {}
+    for path in (store.path, store.log_path):
+        if os.path.exists(path):
+            with open(path, 'rb') as f:
+                saved[path] = f.read()
+    try:
+        yield
+    finally:
+        store.flush()
+        for path in (store.path, store.log_path):
+            if path in saved:
+                with open(path, 'wb') as f:
+                    f.write(saved[path])
+            elif os.path.exists(path):
+                os.remove(path)
+
+TEXTS = [
+    "good morning everyone",
+    "has anyone tried the new release?",
+    "lol that's great 😂😂",
+    "I'll be late to the meeting today, sorry",
+    "check this out https://example.com/article",
+    "🎉🎉🎉🔥🔥 congrats!!! 🎉🎉",
+    "আসসালামু আলাইকুম সবাইকে",
+    "ok",
+]
+COMMANDS = ['/rules', '/help', '/about', '/stats', '/topactive', '/metrics', '/welcome', '/settings']
+CALLBACKS = ['main_menu', 'commands', 'about']
+
+def synthetic_updates(count: int, chats: int = 50, users: int = 2000, admin_id: int = 42, seed: int = 1) -> Iterator[Dict]:
+    """Raw update dicts mixing plain messages, links, emoji, joins, leaves, commands and callbacks.
+
+    Chat popularity is skewed so a few chats get most of the traffic, as in a
+    real deployment.
+    """
+    rng = random.Random(seed)
+    weights = [1 / (rank + 1) for rank in range(chats)]
+    now = int(time.time())
+
+    for update_id in range(1, count + 1):
+        chat_id = CHAT_BASE - rng.choices(range(chats), weights)[0]
+        chat = {'id': chat_id, 'type': 'supergroup', 'title': f"Group {chat_id}"}
+        user_id = 1000 + rng.randrange(users)
+        user = {'id': user_id, 'is_bot': False, 'first_name': f"User{user_id}"}
+        message = {'message_id': update_id, 'date': now, 'chat': chat, 'from': user}
+
+        kind = rng.random()
+        if kind < 0.75:
+            message['text'] = rng.choice(TEXTS)
+        elif kind < 0.82:
+            joined = {'id': 500000 + update_id, 'is_bot': False, 'first_name': f"New{update_id}"}
+            message['new_chat_members'] = [joined]
+            message['from'] = joined
+        elif kind < 0.84:
+            message['left_chat_member'] = user
+        elif kind < 0.94:
+            command = rng.choice(COMMANDS)
+            message['from'] = {'id': admin_id, 'is_bot': False, 'first_name': 'Admin'}
+            message['text'] = command
+            message['entities'] = [{'type': 'bot_command', 'offset': 0, 'length': len(command)}]
+        else:
+            yield {
+                'update_id': update_id,
+                'callback_query': {
+                    'id': str(update_id),
+                    'from': user,
+                    'chat_instance': str(chat_id),
+                    'data': rng.choice(CALLBACKS),
+                    'message': {**message, 'from': BOT_USER, 'text': 'menu'},
+                },
+            }
+            continue
+
+        yield {'update_id': update_id, 'message': message}
+
+def load_recording(path: str) -> List[Dict]:
+    """Raw updates written by RECORD_UPDATES, one JSON object per line"""
+    with open(path, encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+def percentile(values: List[float], quantile: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(quantile * len(ordered)))]
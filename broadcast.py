@@ -0,0 +1,191 @@
+import asyncio
+import logging
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, Optional
+from telegram import Bot, Update
+from telegram.error import TelegramError
+from telegram.ext import Application, ContextTypes, JobQueue
+
+from database import Database
+from fanout import FanOutExecutor, TokenBucket
+from utilities import is_owner, format_time
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 100
+PROGRESS_INTERVAL = 5  # seconds between live progress edits
+
+class BroadcastManager:
+    """Resumable announcements to every group in the groups table.
+
+    Targets are walked in group_id order. Each successful send is recorded in
+    broadcast_deliveries as soon as it happens and the group_id cursor is saved
+    after every batch, so a restarted broadcast skips everything already sent.
+    """
+
+    def __init__(self, db: Database, rate: float, concurrency: int, per_chat_interval: float):
+        self.db = db
+        self.fanout = FanOutExecutor(
+            concurrency=concurrency,
+            per_chat_interval=per_chat_interval,
+            rate_limiter=TokenBucket(rate)
+        )
+        self.tasks: Dict[int, asyncio.Task] = {}
+        self.owns: Optional[Callable[[int], bool]] = None
+
+    def start(self, job_queue: JobQueue, owns: Optional[Callable[[int], bool]] = None):
+        """Resume broadcasts interrupted by a restart once the bot is running"""
+        self.owns = owns
+        job_queue.run_once(self._resume, 1, name='broadcast_resume')
+
+    async def _resume(self, context: ContextTypes.DEFAULT_TYPE):
+        for broadcast_id in self.db.get_running_broadcasts():
+            if self.owns and not self.owns(self.db.get_broadcast(broadcast_id)['from_chat_id']):
+                continue
+            logger.info(f"📣 Resuming broadcast #{broadcast_id}")
+            self.launch(context.application, broadcast_id)
+
+    def launch(self, application: Application, broadcast_id: int):
+        if broadcast_id in self.tasks and not self.tasks[broadcast_id].done():
+            return
+        self.tasks[broadcast_id] = application.create_task(self.run(application.bot, broadcast_id))
+
+    async def broadcast_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Broadcast the replied-to message to every group"""
+        if not is_owner(update.effective_user.id):
+            await update.message.reply_text("❌ This command is only available for the bot owner.")
+            return
+
+        if not update.message.reply_to_message:
+            await update.message.reply_text("❌ Please reply to the message you want to broadcast.")
+            return
+
+        source = update.message.reply_to_message
+        total = self.db.count_broadcast_targets()
+        broadcast_id = self.db.create_broadcast(source.chat_id, source.message_id, update.effective_user.id, total)
+
+        progress = await update.message.reply_text(f"📣 Broadcast #{broadcast_id} starting to {total} groups...")
+        self.db.update_broadcast(
+            broadcast_id,
+            progress_chat_id=progress.chat_id,
+            progress_message_id=progress.message_id
+        )
+
+        self.launch(context.application, broadcast_id)
+
+    async def cancel_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Stop a running broadcast after its current batch"""
+        if not is_owner(update.effective_user.id):
+            await update.message.reply_text("❌ This command is only available for the bot owner.")
+            return
+
+        if not context.args or not context.args[0].lstrip('#').isdigit():
+            await update.message.reply_text("❌ Usage: /cancelbroadcast <id>")
+            return
+
+        broadcast_id = int(context.args[0].lstrip('#'))
+        record = self.db.get_broadcast(broadcast_id)
+        if not record or record['status'] != 'running':
+            await update.message.reply_text(f"❌ No running broadcast #{broadcast_id}.")
+            return
+
+        self.db.update_broadcast(broadcast_id, status='cancelled', finished_at=datetime.now())
+        await update.message.reply_text(f"🛑 Broadcast #{broadcast_id} cancelled.")
+
+    async def run(self, bot: Bot, broadcast_id: int):
+        record = self.db.get_broadcast(broadcast_id)
+        cursor = record['cursor']
+        sent, failed = record['sent'], record['failed']
+
+        started = time.monotonic()
+        processed = 0
+        last_progress = started
+
+        async def send(chat_id):
+            message = await bot.copy_message(
+                chat_id=chat_id,
+                from_chat_id=record['from_chat_id'],
+                message_id=record['message_id']
+            )
+            self.db.add_broadcast_delivery(broadcast_id, chat_id, True)
+            return message
+
+        while True:
+            if self.db.get_broadcast(broadcast_id)['status'] != 'running':
+                return
+
+            targets = self.db.get_broadcast_targets(cursor, BATCH_SIZE)
+            if not targets:
+                break
+
+            # Deliveries past the saved cursor happened just before a restart and were not counted yet
+            delivered = self.db.get_broadcast_deliveries(broadcast_id, targets)
+            sent += sum(delivered.values())
+            failed += len(delivered) - sum(delivered.values())
+            pending = [chat_id for chat_id in targets if chat_id not in delivered]
+
+            removed = []
+            for result in await self.fanout.run(pending, send):
+                if result['ok']:
+                    sent += 1
+                    continue
+                failed += 1
+                self.db.add_broadcast_delivery(broadcast_id, result['chat_id'], False, result['error'])
+                if self.bot_removed(result):
+                    removed.append(result['chat_id'])
+
+            if removed:
+                self.db.mark_groups_removed(removed)
+
+            cursor = targets[-1]
+            processed += len(pending)
+            self.db.update_broadcast(broadcast_id, cursor=cursor, sent=sent, failed=failed)
+
+            now = time.monotonic()
+            if now - last_progress >= PROGRESS_INTERVAL:
+                last_progress = now
+                record.update(sent=sent, failed=failed)
+                await self.report_progress(bot, record, processed / (now - started))
+
+        self.db.update_broadcast(broadcast_id, status='done', finished_at=datetime.now())
+        record.update(sent=sent, failed=failed, status='done')
+        elapsed = time.monotonic() - started
+        await self.report_progress(bot, record, processed / elapsed if elapsed else 0.0)
+        logger.info(f"📣 Broadcast #{broadcast_id} finished: {sent} sent, {failed} failed")
+
+    @staticmethod
+    def bot_removed(result: Dict[str, Any]) -> bool:
+        """Whether a failed send means the bot is no longer in that chat"""
+        if result['error_type'] == 'Forbidden':
+            return True
+        return result['error_type'] == 'BadRequest' and 'chat not found' in (result['error'] or '').lower()
+
+    async def report_progress(self, bot: Bot, record: Dict[str, Any], rate: float):
+        """Edit the live progress message with counts, throughput and ETA"""
+        if not record.get('progress_chat_id'):
+            return
+
+        done = record['sent'] + record['failed']
+        remaining = max(0, record['total'] - done)
+
+        if record.get('status') == 'done':
+            text = f"🏁 <b>Broadcast #{record['id']} finished</b>\n\n"
+        else:
+            text = f"📣 <b>Broadcast #{record['id']} in progress</b>\n\n"
+        text += f"✅ Sent: {record['sent']}\n"
+        text += f"❌ Failed: {record['failed']}\n"
+        text += f"📊 Progress: {done}/{record['total']}\n"
+        text += f"⚡ Throughput: {rate:.1f} msg/s\n"
+        if record.get('status') != 'done' and rate > 0:
+            text += f"⏳ ETA: {format_time(int(remaining / rate))}\n"
+
+        try:
+            await bot.edit_message_text(
+                chat_id=record['progress_chat_id'],
+                message_id=record['progress_message_id'],
+                text=text,
+                parse_mode='HTML'
+            )
+        except TelegramError as e:
+            logger.warning(f"⚠️ Could not update broadcast progress: {e}")
@@ -1,65 +1,162 @@
+import html
+import time
+import pytz
 from datetime import datetime, timedelta
 from typing import List, Dict, Any
-from telegram import Update, InputMediaPhoto, InputMediaVideo, InputMediaDocument
+from telegram import Message, Update
 from telegram.ext import ContextTypes
 
+from albums import FileIdCache, MediaGroupCollector, get_media
+from broadcast import BroadcastManager
+from config import config
 from database import Database
-from utilities import is_admin
+from fanout import FanOutExecutor, TokenBucket
+from scheduler import PostScheduler, parse_recurrence
+from utilities import is_admin, parse_time
 
 class ChannelManager:
     def __init__(self, db: Database):
         self.db = db
-        self.scheduled_posts = {}
+        self.scheduler = PostScheduler(db)
+        self.rate_limiter = TokenBucket(config.global_send_rate)
+        self.fanout = FanOutExecutor(
+            concurrency=config.fanout_concurrency,
+            per_chat_interval=config.per_chat_interval,
+            rate_limiter=self.rate_limiter
+        )
+        self.albums = MediaGroupCollector(config.album_window)
+        self.file_ids = FileIdCache(config.file_id_cache_size)
+        self.broadcasts = BroadcastManager(
+            db,
+            rate=config.broadcast_rate,
+            concurrency=config.fanout_concurrency,
+            per_chat_interval=config.per_chat_interval
+        )
     
     async def schedule_post(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Schedule a post for a channel"""
-        if not is_admin(update, context):
+        if not await is_admin(update, context):
             await update.message.reply_text("❌ This command is only available for admins.")
             return
         
-        if not context.args or len(context.args) < 2:
+        if not context.args or len(context.args) < 3:
             await update.message.reply_text("❌ Usage: /schedule <channel_id> <time> <message>\nTime format: 1h, 30m, 2d")
             return
         
         try:
             channel_id = context.args[0]
-            time_str = context.args[1]
             message = ' '.join(context.args[2:])
             
             # Parse time
-            time_units = {
-                's': 1,
-                'm': 60,
-                'h': 3600,
-                'd': 86400,
-            }
-            
-            match = re.match(r'^(\d+)([smhd])$', time_str.lower())
-            if not match:
+            delay = parse_time(context.args[1])
+            if delay is None:
                 await update.message.reply_text("❌ Invalid time format. Use: 1h, 30m, 2d")
                 return
             
-            amount, unit = match.groups()
-            delay = int(amount) * time_units[unit]
-            
-            # Schedule the post
-            post_time = datetime.now() + timedelta(seconds=delay)
-            self.scheduled_posts[len(self.scheduled_posts)] = {
-                'channel_id': channel_id,
-                'message': message,
-                'time': post_time
-            }
+            # Schedule the post; the command message identifies it if the update is redelivered
+            due_at = int(time.time()) + delay
+            chat_id = update.effective_chat.id
+            post_id, _ = self.scheduler.schedule(
+                channel_id, message, due_at, chat_id, update.effective_user.id,
+                key=f"{chat_id}:{update.message.message_id}"
+            )
             
+            post_time = datetime.fromtimestamp(due_at)
             await update.message.reply_text(
-                f"✅ Post scheduled for {post_time.strftime('%Y-%m-%d %H:%M:%S')}"
+                f"✅ Post #{post_id} scheduled for {post_time.strftime('%Y-%m-%d %H:%M:%S')}"
             )
         
         except Exception as e:
             await update.message.reply_text(f"❌ Error scheduling post: {str(e)}")
     
+    async def schedule_recurring(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Schedule a recurring post for a channel"""
+        if not await is_admin(update, context):
+            await update.message.reply_text("❌ This command is only available for admins.")
+            return
+        
+        usage = (
+            "❌ Usage: /recurring <channel_id> <schedule> | <message>\n"
+            "Schedule: every day at 09:00 [Asia/Dhaka], every monday at 18:30,\n"
+            "or a cron expression like 0 9 * * mon-fri [timezone]"
+        )
+        text = ' '.join(context.args[1:]) if context.args else ''
+        if '|' not in text:
+            await update.message.reply_text(usage)
+            return
+        
+        schedule_text, message = (part.strip() for part in text.split('|', 1))
+        if not message:
+            await update.message.reply_text(usage)
+            return
+        
+        chat_id = update.effective_chat.id
+        settings = config.get_chat_settings(chat_id)
+        try:
+            recurrence, timezone = parse_recurrence(schedule_text, settings.get('timezone', 'UTC'))
+        except ValueError as e:
+            await update.message.reply_text(f"❌ Invalid schedule: {e}\n\n{usage}")
+            return
+        
+        post_id, _, due_at = self.scheduler.schedule_recurring(
+            context.args[0], message, recurrence, timezone, chat_id, update.effective_user.id,
+            key=f"{chat_id}:{update.message.message_id}"
+        )
+        
+        first = datetime.fromtimestamp(due_at, pytz.timezone(timezone))
+        await update.message.reply_text(
+            f"✅ Recurring post #{post_id} scheduled ({recurrence}, {timezone}).\n"
+            f"Next: {first.strftime('%Y-%m-%d %H:%M %Z')}"
+        )
+    
+    async def list_scheduled(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """List pending scheduled posts created in this chat"""
+        if not await is_admin(update, context):
+            await update.message.reply_text("❌ This command is only available for admins.")
+            return
+        
+        posts = self.db.get_scheduled_posts(update.effective_chat.id)
+        if not posts:
+            await update.message.reply_text("📭 No scheduled posts.")
+            return
+        
+        message = "📅 <b>Scheduled Posts</b>\n\n"
+        for post in posts:
+            if post['recurrence']:
+                post_time = datetime.fromtimestamp(post['due_at'], pytz.timezone(post['timezone'])).strftime('%Y-%m-%d %H:%M %Z')
+                post_time += f" 🔁 {post['recurrence']}"
+            else:
+                post_time = datetime.fromtimestamp(post['due_at']).strftime('%Y-%m-%d %H:%M')
+            preview = post['message'] if len(post['message']) <= 40 else post['message'][:40] + '…'
+            message += f"#{post['id']} → {html.escape(post['channel_id'])} at {post_time}\n   {html.escape(preview)}\n"
+        message += "\nCancel with /unschedule <id>"
+        
+        await update.message.reply_text(message, parse_mode='HTML')
+    
+    async def cancel_scheduled(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Cancel a scheduled post"""
+        if not await is_admin(update, context):
+            await update.message.reply_text("❌ This command is only available for admins.")
+            return
+        
+        if not context.args or not context.args[0].lstrip('#').isdigit():
+            await update.message.reply_text("❌ Usage: /unschedule <id>")
+            return
+        
+        post_id = int(context.args[0].lstrip('#'))
+        if self.scheduler.cancel(post_id, update.effective_chat.id):
+            await update.message.reply_text(f"✅ Scheduled post #{post_id} cancelled.")
+        else:
+            await update.message.reply_text(f"❌ No pending post #{post_id} in this chat.")
+    
+    def track_media(self, message: Message):
+        """Remember album items and file_ids so a later /crosspost can resend them"""
+        if self.albums.add(message):
+            self.file_ids.resolve(get_media(message)[1])
+    
     async def cross_post(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Cross-post a message to multiple channels"""
-        if not is_admin(update, context):
+        if not await is_admin(update, context):
             await update.message.reply_text("❌ This command is only available for admins.")
             return
         
@@ -71,40 +168,46 @@ class ChannelManager:
             await update.message.reply_text("❌ Please provide channel IDs.\nUsage: /crosspost <channel_id1> <channel_id2> ...")
             return
         
-        try:
-            message = update.message.reply_to_message
-            channel_ids = context.args
-            
-            for channel_id in channel_ids:
-                if message.text:
-                    await context.bot.send_message(chat_id=channel_id, text=message.text)
-                elif message.photo:
-                    await context.bot.send_photo(
-                        chat_id=channel_id,
-                        photo=message.photo[-1].file_id,
-                        caption=message.caption
-                    )
-                elif message.video:
-                    await context.bot.send_video(
-                        chat_id=channel_id,
-                        video=message.video.file_id,
-                        caption=message.caption
-                    )
-                elif message.document:
-                    await context.bot.send_document(
-                        chat_id=channel_id,
-                        document=message.document.file_id,
-                        caption=message.caption
-                    )
+        message = update.message.reply_to_message
+        channel_ids = context.args
+        
+        album = await self.albums.collect(message) if message.media_group_id else [message]
+        
+        if len(album) > 1:
+            # One send_media_group per destination keeps the album together
+            media = [self.file_ids.to_input_media(item) for item in album[:10]]
             
-            await update.message.reply_text(f"✅ Message cross-posted to {len(channel_ids)} channels.")
+            async def send(channel_id):
+                sent = await context.bot.send_media_group(chat_id=channel_id, media=media)
+                self.file_ids.remember(sent)
+                return sent
+        else:
+            # copy_message reuses the original media server-side, so nothing is re-uploaded
+            async def send(channel_id):
+                return await context.bot.copy_message(
+                    chat_id=channel_id,
+                    from_chat_id=message.chat_id,
+                    message_id=message.message_id
+                )
         
-        except Exception as e:
-            await update.message.reply_text(f"❌ Error cross-posting: {str(e)}")
+        started = time.monotonic()
+        results = await self.fanout.run(channel_ids, send, cost=len(album[:10]))
+        elapsed = time.monotonic() - started
+        
+        failed = [r for r in results if not r['ok']]
+        kind = f"Album ({len(album[:10])} items)" if len(album) > 1 else "Message"
+        report = f"✅ {kind} cross-posted to {len(results) - len(failed)}/{len(results)} channels in {elapsed:.1f}s."
+        if failed:
+            report += "\n\n❌ Failed:\n"
+            report += "\n".join(f"• {r['chat_id']}: {r['error']}" for r in failed[:20])
+            if len(failed) > 20:
+                report += f"\n... and {len(failed) - 20} more"
+        
+        await update.message.reply_text(report)
     
     async def export_subscribers(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Export channel subscribers list"""
-        if not is_admin(update, context):
+        if not await is_admin(update, context):
             await update.message.reply_text("❌ This command is only available for admins.")
             return
         
@@ -132,22 +235,21 @@ class ChannelManager:
         except Exception as e:
             await update.message.reply_text(f"❌ Error exporting subscribers: {str(e)}")
     
-    async def check_scheduled_posts(self, context: ContextTypes.DEFAULT_TYPE):
-        """Check and send scheduled posts"""
-        current_time = datetime.now()
-        posts_to_remove = []
-        
-        for post_id, post in self.scheduled_posts.items():
-            if current_time >= post['time']:
-                try:
-                    await context.bot.send_message(
-                        chat_id=post['channel_id'],
-                        text=post['message']
-                    )
-                    posts_to_remove.append(post_id)
-                except Exception as e:
-                    print(f"Error sending scheduled post: {e}")
-        
-        # Remove sent posts
-        for post_id in posts_to_remove:
-            del self.scheduled_posts[post_id]
+# Helper function to register channel commands
+def register_channel_commands(application, channel):
+    """Register all channel management commands with the application"""
+    from telegram.ext import CommandHandler
+    
+    handlers = [
+        CommandHandler('schedule', channel.schedule_post),
+        CommandHandler('recurring', channel.schedule_recurring),
+        CommandHandler('scheduled', channel.list_scheduled),
+        CommandHandler('unschedule', channel.cancel_scheduled),
+        CommandHandler('crosspost', channel.cross_post),
+        CommandHandler('exportsubs', channel.export_subscribers),
+        CommandHandler('broadcast', channel.broadcasts.broadcast_command),
+        CommandHandler('cancelbroadcast', channel.broadcasts.cancel_command),
+    ]
+    
+    for handler in handlers:
+        application.add_handler(handler)
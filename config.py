@@ -1,8 +1,10 @@
 import os
-import json
 import secrets
 import string
-from typing import Dict, Any
+from typing import Any, Callable, Dict, List, Set
+
+from i18n import message
+from settings_store import SettingsStore
 
 class Config:
     def __init__(self):
@@ -17,7 +19,7 @@ class Config:
             print("⚠️  WARNING: ADMIN_ID not set. Some features may not work properly.")
         
         # Get secret token from environment or generate one
-        self.secret_token = os.environ.get('SECRET_TOKEN', self.generate_secret_token())
+        self.secret_token = os.environ.get('SECRET_TOKEN') or self.generate_secret_token()
         
         # Webhook configuration
         self.webhook_url = os.environ.get('WEBHOOK_URL', '')
@@ -26,12 +28,85 @@ class Config:
         
         # Database configuration
         self.database_url = os.environ.get('DATABASE_URL', 'sqlite:///:memory:')
+        # Seconds a write waits for another process's lock on the SQLite file before failing
+        self.db_busy_timeout = float(os.environ.get('DB_BUSY_TIMEOUT', 30))
+        
+        # Worker processes behind the webhook receiver (webhook mode only)
+        self.workers = int(os.environ.get('WORKERS', 1))
+        
+        # Updates processed in parallel (different chats only) and the total allowed in flight
+        self.max_concurrent_updates = int(os.environ.get('MAX_CONCURRENT_UPDATES', 32))
+        self.max_pending_updates = int(os.environ.get('MAX_PENDING_UPDATES', 10000))
+        
+        # Separate Telegram API connection pools: long polling, ordinary calls and uploads.
+        # Each reads HTTP_<POOL>_SIZE, _READ_TIMEOUT, _WRITE_TIMEOUT, _CONNECT_TIMEOUT,
+        # _POOL_TIMEOUT (seconds) and _VERSION (1.1 or 2; 2 needs the h2 package)
+        self.http_pools = {
+            'polling': self.http_pool('POLLING', size=1, read=10.0, write=5.0, connect=5.0, pool=1.0),
+            'api': self.http_pool('API', size=64, read=5.0, write=5.0, connect=5.0, pool=1.0),
+            'media': self.http_pool('MEDIA', size=8, read=20.0, write=60.0, connect=5.0, pool=10.0),
+        }
+        
+        # Logging: level, rotated log file (empty = stdout only) and text or json lines
+        self.log_level = os.environ.get('LOG_LEVEL', 'INFO')
+        self.log_file = os.environ.get('LOG_FILE', '/tmp/bot.log')
+        self.log_max_bytes = int(os.environ.get('LOG_MAX_BYTES', 10 * 1024 * 1024))
+        self.log_backups = int(os.environ.get('LOG_BACKUPS', 5))
+        self.log_json = os.environ.get('LOG_FORMAT', 'text').lower() == 'json'
+        
+        # Seconds after start to import chart/report libraries in the background (negative = never)
+        self.preload_delay = float(os.environ.get('PRELOAD_DELAY', 30))
+        # Where --profile-startup writes its cProfile stats
+        self.startup_profile = os.environ.get('STARTUP_PROFILE', '/tmp/startup.prof')
+        
+        # Seconds to let running handlers finish on shutdown before cancelling them
+        self.shutdown_timeout = float(os.environ.get('SHUTDOWN_TIMEOUT', 20))
+        # State saved at shutdown (flood windows, captcha answers) older than this is not restored (seconds)
+        self.state_max_age = int(os.environ.get('STATE_MAX_AGE', 3600))
+        
+        # Handler calls slower than this are logged with a db/pool/api/render breakdown (milliseconds)
+        self.slow_handler_ms = int(os.environ.get('SLOW_HANDLER_MS', 500))
+        
+        # Append every incoming update to this JSONL file for replay benchmarks (empty = off)
+        self.record_updates = os.environ.get('RECORD_UPDATES', '')
+        # Route updates before handler matching: drop channel traffic, only count messages in chats with no protections on
+        self.prefilter = os.environ.get('PREFILTER', 'true').lower() == 'true'
+        
+        # Error alerts to the owner: a burst of ERROR_ALERT_BURST, refilled at ERROR_ALERTS_PER_HOUR;
+        # everything else goes into a digest every ERROR_DIGEST_INTERVAL seconds
+        self.error_alert_burst = int(os.environ.get('ERROR_ALERT_BURST', 3))
+        self.error_alerts_per_hour = float(os.environ.get('ERROR_ALERTS_PER_HOUR', 10))
+        self.error_digest_interval = int(os.environ.get('ERROR_DIGEST_INTERVAL', 300))
+        # Minimum seconds between "an error occurred" replies in the same chat
+        self.error_reply_interval = int(os.environ.get('ERROR_REPLY_INTERVAL', 60))
+        
+        # How often in-memory analytics counters are written to the database (seconds)
+        self.stats_flush_interval = int(os.environ.get('STATS_FLUSH_INTERVAL', 60))
+        
+        # How often buffered last-seen times are written (seconds)
+        self.last_seen_flush_interval = int(os.environ.get('LAST_SEEN_FLUSH_INTERVAL', 5))
+        
+        # Number of days covered by the /topactive leaderboard
+        self.leaderboard_days = int(os.environ.get('LEADERBOARD_DAYS', 7))
+        
+        # Outgoing fan-out limits (cross-posting)
+        self.fanout_concurrency = int(os.environ.get('FANOUT_CONCURRENCY', 20))
+        self.global_send_rate = float(os.environ.get('GLOBAL_SEND_RATE', 25))
+        self.per_chat_interval = float(os.environ.get('PER_CHAT_INTERVAL', 1.0))
+        
+        # Albums are complete once no new item arrived for this many seconds
+        self.album_window = float(os.environ.get('ALBUM_WINDOW', 1.0))
+        self.file_id_cache_size = int(os.environ.get('FILE_ID_CACHE_SIZE', 10000))
+        
+        # Messages per second for /broadcast, kept below the global limit so normal traffic still flows
+        self.broadcast_rate = float(os.environ.get('BROADCAST_RATE', 15))
         
         # Default settings for groups
         self.default_settings = {
-            "welcome_message": "👋 Welcome {user_name} to {chat_title}! 🇵🇸\n\nPlease read the rules with /rules",
-            "goodbye_message": "👋 Goodbye {user_name}! We'll miss you! ❤️",
-            "rules": "📝 Please be respectful to all members. No spam, no NSFW content.",
+            # Chats that keep these get the catalog text in their language (see templates.chat_text)
+            "welcome_message": message('welcome'),
+            "goodbye_message": message('goodbye'),
+            "rules": message('rules'),
             "warn_limit": 3,
             "mute_duration": 300,
             "language": "en",
@@ -43,12 +118,40 @@ class Config:
             "timezone": "UTC"
         }
         
+        # Group settings snapshot; changes go to an append-only log next to it (group_settings.log)
+        # Use /tmp directory for Render compatibility
+        self.settings_path = os.environ.get('SETTINGS_PATH', '/tmp/group_settings.json')
+        # Seconds to collect settings changes before appending them in one write
+        self.settings_flush_delay = float(os.environ.get('SETTINGS_FLUSH_DELAY', 1.0))
+        # Fold the change log into the snapshot once it is larger than this (bytes)
+        self.settings_compact_bytes = int(os.environ.get('SETTINGS_COMPACT_BYTES', 256 * 1024))
+        self.settings_store = SettingsStore(self.settings_path, self.settings_flush_delay, self.settings_compact_bytes)
+        # Reload settings changed on disk (by another worker or an edit) as soon as the files change;
+        # without inotify the files are checked every SETTINGS_POLL_INTERVAL seconds
+        self.settings_watch = os.environ.get('SETTINGS_WATCH', 'true').lower() == 'true'
+        self.settings_poll_interval = float(os.environ.get('SETTINGS_POLL_INTERVAL', 2.0))
+        
+        # Called as listener(chat_id, changed keys) so caches derived from one chat's settings can be dropped
+        self.settings_listeners: List[Callable[[int, Set[str]], None]] = []
+        
         # Load custom settings if available
         self.load_settings()
         
         # Print configuration for debugging
         self.print_config()
     
+    @staticmethod
+    def http_pool(name: str, size: int, read: float, write: float, connect: float, pool: float) -> Dict[str, Any]:
+        prefix = f"HTTP_{name}_"
+        return {
+            'size': int(os.environ.get(prefix + 'SIZE', size)),
+            'read_timeout': float(os.environ.get(prefix + 'READ_TIMEOUT', read)),
+            'write_timeout': float(os.environ.get(prefix + 'WRITE_TIMEOUT', write)),
+            'connect_timeout': float(os.environ.get(prefix + 'CONNECT_TIMEOUT', connect)),
+            'pool_timeout': float(os.environ.get(prefix + 'POOL_TIMEOUT', pool)),
+            'http_version': os.environ.get(prefix + 'VERSION', '1.1'),
+        }
+    
     def generate_secret_token(self):
         """Generate a proper secret token that meets Telegram requirements"""
         alphabet = string.ascii_letters + string.digits + "_-"
@@ -67,34 +170,65 @@ class Config:
     
     def load_settings(self):
         try:
-            # Use /tmp directory for Render compatibility
-            settings_path = '/tmp/group_settings.json'
-            if os.path.exists(settings_path):
-                with open(settings_path, 'r') as f:
-                    self.group_settings = json.load(f)
-            else:
-                self.group_settings = {}
-        except (FileNotFoundError, json.JSONDecodeError):
+            self.group_settings = self.settings_store.load()
+        except OSError as e:
+            print(f"⚠️  Warning: Could not load settings: {e}")
             self.group_settings = {}
     
-    def save_settings(self):
-        try:
-            # Use /tmp directory for Render compatibility
-            settings_path = '/tmp/group_settings.json'
-            with open(settings_path, 'w') as f:
-                json.dump(self.group_settings, f, indent=4)
-        except Exception as e:
-            print(f"⚠️  Warning: Could not save settings: {e}")
+    def reload_settings(self) -> Dict[str, Set[str]]:
+        """Apply settings changed on disk since the last load; returns {chat_id: changed keys}
+        
+        Usually only the change log lines written since then are read. Chats
+        missing from disk count as having the default settings, and listeners
+        are told about every chat whose settings actually differ.
+        """
+        stored, complete = self.settings_store.changes()
+        if complete:
+            for key in set(self.group_settings) - set(stored):
+                stored[key] = None
+        
+        changed = {}
+        for key, settings in stored.items():
+            old = self.group_settings.get(key, self.default_settings)
+            new = settings if settings is not None else self.default_settings
+            keys = {name for name in old.keys() | new.keys() if old.get(name) != new.get(name)}
+            if not keys:
+                continue
+            if settings is None:
+                del self.group_settings[key]
+            else:
+                self.group_settings[key] = settings
+            changed[key] = keys
+            self.notify_settings(int(key), keys)
+        return changed
+    
+    def on_settings_change(self, listener: Callable[[int, Set[str]], None]):
+        self.settings_listeners.append(listener)
+    
+    def notify_settings(self, chat_id: int, keys: Set[str]):
+        for listener in self.settings_listeners:
+            listener(chat_id, keys)
+    
+    def save_settings(self, chat_id: int = None):
+        """Queue a chat's settings (or every chat's) for the next background write"""
+        chat_ids = [str(chat_id)] if chat_id is not None else list(self.group_settings)
+        for key in chat_ids:
+            self.settings_store.save(key, self.group_settings[key])
+    
+    def flush_settings(self) -> int:
+        return self.settings_store.flush()
     
     def get_chat_settings(self, chat_id: int) -> Dict[str, Any]:
+        # Defaults are not written anywhere until something in them changes
         if str(chat_id) not in self.group_settings:
             self.group_settings[str(chat_id)] = self.default_settings.copy()
-            self.save_settings()
         return self.group_settings[str(chat_id)]
     
     def update_chat_settings(self, chat_id: int, settings: Dict[str, Any]):
         self.group_settings[str(chat_id)] = settings
-        self.save_settings()
+        self.save_settings(chat_id)
+        # Callers usually edit the stored dict in place, so there is nothing to diff against
+        self.notify_settings(chat_id, set(settings))
 
 # Global config instance
 config = Config()
@@ -1,11 +1,50 @@
 import sqlite3
 import json
+from contextlib import contextmanager
 from datetime import datetime
-from typing import List, Dict, Any, Optional
+from typing import Callable, Iterator, List, Dict, Any, Optional
+
+from metrics import DB_COMMIT, stage
+
+class TimedCursor(sqlite3.Cursor):
+    """Cursor whose statements count towards the running handler's db stage"""
+    
+    def execute(self, *args):
+        with stage('db'):
+            return super().execute(*args)
+    
+    def executemany(self, *args):
+        with stage('db'):
+            return super().executemany(*args)
+    
+    def fetchall(self):
+        with stage('db'):
+            return super().fetchall()
+
+class TimedConnection(sqlite3.Connection):
+    """sqlite3 connection that records how long each commit takes"""
+    
+    def cursor(self, factory=TimedCursor):
+        return super().cursor(factory)
+    
+    def execute(self, *args):
+        return self.cursor().execute(*args)
+    
+    def executemany(self, *args):
+        return self.cursor().executemany(*args)
+    
+    def commit(self):
+        with stage('db'), DB_COMMIT.time():
+            super().commit()
 
 class Database:
-    def __init__(self, db_url: str):
-        self.conn = sqlite3.connect(db_url, check_same_thread=False)
+    def __init__(self, db_url: str, busy_timeout: float = 30.0):
+        # Worker processes share the file: wait for each other's write lock instead of
+        # failing with "database is locked", and let readers proceed during writes (WAL)
+        self.conn = sqlite3.connect(db_url, timeout=busy_timeout, check_same_thread=False, factory=TimedConnection)
+        if db_url != ':memory:':
+            self.conn.execute('PRAGMA journal_mode=WAL')
+            self.conn.execute('PRAGMA synchronous=NORMAL')
         self.create_tables()
     
     def create_tables(self):
@@ -71,9 +110,115 @@ class Database:
                 PRIMARY KEY (group_id, date)
             )
         ''')
-        
+
+        # Activity table (weekday × hour message grid per group)
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS activity (
+                group_id INTEGER PRIMARY KEY,
+                hours BLOB,
+                messages INTEGER DEFAULT 0,
+                media INTEGER DEFAULT 0,
+                replies INTEGER DEFAULT 0
+            )
+        ''')
+
+        # Per-user daily message counts (feeds the activity leaderboard)
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS user_activity (
+                group_id INTEGER,
+                user_id INTEGER,
+                date DATE,
+                messages INTEGER DEFAULT 0,
+                PRIMARY KEY (group_id, user_id, date)
+            )
+        ''')
+        # Daily distinct-sender HyperLogLog sketches, keyed like statistics
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS statistics_users (
+                group_id INTEGER,
+                date DATE,
+                sketch BLOB,
+                PRIMARY KEY (group_id, date)
+            )
+        ''')
+        # Last time each member was seen in each group
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS last_seen (
+                group_id INTEGER,
+                user_id INTEGER,
+                last_seen INTEGER,
+                PRIMARY KEY (group_id, user_id)
+            )
+        ''')
+        # Scheduled channel posts
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS scheduled_posts (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                channel_id TEXT,
+                message TEXT,
+                due_at INTEGER,
+                chat_id INTEGER,
+                created_by INTEGER,
+                idempotency_key TEXT UNIQUE,
+                status TEXT DEFAULT 'pending',
+                attempts INTEGER DEFAULT 0,
+                error TEXT,
+                recurrence TEXT,
+                timezone TEXT
+            )
+        ''')
+        # Broadcasts to every known group, with per-chat delivery records for resuming
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS broadcasts (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                from_chat_id INTEGER,
+                message_id INTEGER,
+                created_by INTEGER,
+                status TEXT DEFAULT 'running',
+                cursor INTEGER,
+                total INTEGER DEFAULT 0,
+                sent INTEGER DEFAULT 0,
+                failed INTEGER DEFAULT 0,
+                progress_chat_id INTEGER,
+                progress_message_id INTEGER,
+                created_at TIMESTAMP,
+                finished_at TIMESTAMP
+            )
+        ''')
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS broadcast_deliveries (
+                broadcast_id INTEGER,
+                chat_id INTEGER,
+                ok BOOLEAN,
+                error TEXT,
+                PRIMARY KEY (broadcast_id, chat_id)
+            )
+        ''')
+        # In-memory state saved on shutdown and restored on the next start
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS runtime_state (
+                name TEXT PRIMARY KEY,
+                data TEXT,
+                saved_at INTEGER
+            )
+        ''')
+        self._ensure_column(cursor, 'groups', 'removed_at', 'TIMESTAMP')
+        self._ensure_column(cursor, 'scheduled_posts', 'recurrence', 'TEXT')
+        self._ensure_column(cursor, 'scheduled_posts', 'timezone', 'TEXT')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_scheduled_posts_status ON scheduled_posts (status, due_at)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_scheduled_posts_chat ON scheduled_posts (chat_id, status, due_at)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_last_seen_group_time ON last_seen (group_id, last_seen, user_id)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_user_activity_group_date ON user_activity (group_id, date)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_warnings_group_user ON warnings (group_id, user_id)')
+
         self.conn.commit()
     
+    def _ensure_column(self, cursor, table: str, column: str, definition: str):
+        """Add a column to a table created by an older version of the bot"""
+        cursor.execute(f'PRAGMA table_info({table})')
+        if column not in [row[1] for row in cursor.fetchall()]:
+            cursor.execute(f'ALTER TABLE {table} ADD COLUMN {column} {definition}')
+    
     def add_user(self, user_id: int, username: str, first_name: str, last_name: str = None):
         cursor = self.conn.cursor()
         cursor.execute(
@@ -197,6 +342,27 @@ class Database:
         columns = [description[0] for description in cursor.description]
         return [dict(zip(columns, row)) for row in rows]
     
+    def get_all_statistics(self, start_date: str) -> List[tuple]:
+        """Return (group_id, date, messages, joins, leaves) rows for every group in one read"""
+        cursor = self.conn.cursor()
+        cursor.execute(
+            'SELECT group_id, date, messages, joins, leaves FROM statistics WHERE date >= ?',
+            (start_date,)
+        )
+        return cursor.fetchall()
+    
+    def get_all_moderation_counts(self, start_date: str) -> List[tuple]:
+        """Return (group_id, date, actions) daily moderation counts for every group in one read"""
+        cursor = self.conn.cursor()
+        cursor.execute(
+            '''SELECT group_id, date(date) AS day, COUNT(*)
+               FROM moderation
+               WHERE date >= ?
+               GROUP BY group_id, day''',
+            (start_date,)
+        )
+        return cursor.fetchall()
+    
     def get_top_warned_users(self, group_id: int, limit: int = 10) -> List[Dict[str, Any]]:
         cursor = self.conn.cursor()
         cursor.execute(
@@ -219,14 +385,13 @@ class Database:
         } for row in rows]
     
     def get_top_active_users(self, group_id: int, days: int = 7, limit: int = 10) -> List[Dict[str, Any]]:
-        # This is a simplified version - in a real implementation, you'd track individual user messages
         cursor = self.conn.cursor()
         cursor.execute(
-            '''SELECT u.user_id, u.username, u.first_name, u.last_name, COUNT(m.id) as message_count
-               FROM messages m
-               JOIN users u ON m.user_id = u.user_id
-               WHERE m.group_id = ? AND m.date >= date('now', ?)
-               GROUP BY m.user_id
+            '''SELECT u.user_id, u.username, u.first_name, u.last_name, SUM(a.messages) as message_count
+               FROM user_activity a
+               JOIN users u ON a.user_id = u.user_id
+               WHERE a.group_id = ? AND a.date >= date('now', ?)
+               GROUP BY a.user_id
                ORDER BY message_count DESC
                LIMIT ?''',
             (group_id, f'-{days} days', limit)
@@ -240,14 +405,313 @@ class Database:
             'message_count': row[4]
         } for row in rows]
     
+    def get_warning_counts(self, group_id: int) -> Dict[int, int]:
+        cursor = self.conn.cursor()
+        cursor.execute(
+            'SELECT user_id, COUNT(*) FROM warnings WHERE group_id = ? GROUP BY user_id',
+            (group_id,)
+        )
+        return dict(cursor.fetchall())
+    
+    def get_user_activity(self, group_id: int, since: str) -> List[tuple]:
+        """Return (user_id, date, messages) rows for a group from the given date on"""
+        cursor = self.conn.cursor()
+        cursor.execute(
+            'SELECT user_id, date, messages FROM user_activity WHERE group_id = ? AND date >= ?',
+            (group_id, since)
+        )
+        return cursor.fetchall()
+    
+    def add_message_counts(self, rows: List[tuple]):
+        """Add (group_id, date, messages) increments to statistics in one transaction"""
+        cursor = self.conn.cursor()
+        cursor.executemany(
+            '''INSERT INTO statistics (group_id, date, messages) VALUES (?, ?, ?)
+               ON CONFLICT (group_id, date) DO UPDATE SET messages = messages + excluded.messages''',
+            rows
+        )
+        self.conn.commit()
+    
+    def add_user_activity(self, rows: List[tuple]):
+        """Add (group_id, user_id, date, messages) increments in one transaction"""
+        cursor = self.conn.cursor()
+        cursor.executemany(
+            '''INSERT INTO user_activity (group_id, user_id, date, messages) VALUES (?, ?, ?, ?)
+               ON CONFLICT (group_id, user_id, date) DO UPDATE SET messages = messages + excluded.messages''',
+            rows
+        )
+        self.conn.commit()
+    
+    def get_activity(self, group_id: int) -> Optional[Dict[str, Any]]:
+        cursor = self.conn.cursor()
+        cursor.execute(
+            'SELECT hours, messages, media, replies FROM activity WHERE group_id = ?',
+            (group_id,)
+        )
+        row = cursor.fetchone()
+        if row:
+            return {'hours': row[0], 'messages': row[1], 'media': row[2], 'replies': row[3]}
+        return None
+
+    def save_activity(self, rows: List[tuple]):
+        """Save (group_id, hours, messages, media, replies) rows in one transaction"""
+        cursor = self.conn.cursor()
+        cursor.executemany(
+            'INSERT OR REPLACE INTO activity (group_id, hours, messages, media, replies) VALUES (?, ?, ?, ?, ?)',
+            rows
+        )
+        self.conn.commit()
+
+    def get_user_sketches(self, group_id: int, start_date: str, end_date: str) -> Dict[str, bytes]:
+        cursor = self.conn.cursor()
+        cursor.execute(
+            'SELECT date, sketch FROM statistics_users WHERE group_id = ? AND date BETWEEN ? AND ?',
+            (group_id, start_date, end_date)
+        )
+        return dict(cursor.fetchall())
+
+    def save_user_sketches(self, rows: List[tuple]):
+        """Save (group_id, date, sketch) rows in one transaction"""
+        cursor = self.conn.cursor()
+        cursor.executemany(
+            'INSERT OR REPLACE INTO statistics_users (group_id, date, sketch) VALUES (?, ?, ?)',
+            rows
+        )
+        self.conn.commit()
+
+    def save_last_seen(self, rows: List[tuple]):
+        """Upsert (group_id, user_id, last_seen) rows in one transaction"""
+        cursor = self.conn.cursor()
+        cursor.executemany(
+            '''INSERT INTO last_seen (group_id, user_id, last_seen) VALUES (?, ?, ?)
+               ON CONFLICT (group_id, user_id) DO UPDATE SET last_seen = MAX(last_seen, excluded.last_seen)''',
+            rows
+        )
+        self.conn.commit()
+
+    def delete_last_seen(self, rows: List[tuple]):
+        """Delete (group_id, user_id) rows in one transaction"""
+        cursor = self.conn.cursor()
+        cursor.executemany('DELETE FROM last_seen WHERE group_id = ? AND user_id = ?', rows)
+        self.conn.commit()
+
+    def get_inactive_members(self, group_id: int, before: int, after: tuple = None, limit: int = 20) -> List[tuple]:
+        """Return (user_id, last_seen) for members not seen since before, oldest first.
+
+        Pages with a keyset: pass the (last_seen, user_id) of the previous page's last row as after.
+        """
+        cursor = self.conn.cursor()
+        if after:
+            cursor.execute(
+                '''SELECT user_id, last_seen FROM last_seen
+                   WHERE group_id = ? AND last_seen < ? AND (last_seen, user_id) > (?, ?)
+                   ORDER BY last_seen, user_id
+                   LIMIT ?''',
+                (group_id, before, after[0], after[1], limit)
+            )
+        else:
+            cursor.execute(
+                '''SELECT user_id, last_seen FROM last_seen
+                   WHERE group_id = ? AND last_seen < ?
+                   ORDER BY last_seen, user_id
+                   LIMIT ?''',
+                (group_id, before, limit)
+            )
+        return cursor.fetchall()
+
+    def add_scheduled_post(self, channel_id: str, message: str, due_at: int, chat_id: int, created_by: int, key: str,
+                           recurrence: str = None, timezone: str = None) -> tuple:
+        """Insert a scheduled post unless its idempotency key exists; returns (post_id, created)"""
+        cursor = self.conn.cursor()
+        cursor.execute('SELECT id FROM scheduled_posts WHERE idempotency_key = ?', (key,))
+        row = cursor.fetchone()
+        if row:
+            return row[0], False
+        
+        cursor.execute(
+            '''INSERT INTO scheduled_posts (channel_id, message, due_at, chat_id, created_by, idempotency_key, recurrence, timezone)
+               VALUES (?, ?, ?, ?, ?, ?, ?, ?)''',
+            (channel_id, message, due_at, chat_id, created_by, key, recurrence, timezone)
+        )
+        self.conn.commit()
+        return cursor.lastrowid, True
+
+    def get_pending_posts(self) -> List[tuple]:
+        """Return (due_at, post_id, chat_id) for every post not yet delivered"""
+        cursor = self.conn.cursor()
+        cursor.execute("SELECT due_at, id, chat_id FROM scheduled_posts WHERE status IN ('pending', 'sending')")
+        return cursor.fetchall()
+
+    def get_recurring_posts(self) -> List[tuple]:
+        """Return (post_id, recurrence, timezone) for every recurring post not yet cancelled"""
+        cursor = self.conn.cursor()
+        cursor.execute(
+            "SELECT id, recurrence, timezone FROM scheduled_posts WHERE recurrence IS NOT NULL AND status IN ('pending', 'sending')"
+        )
+        return cursor.fetchall()
+
+    def update_post_recurrence(self, post_id: int, recurrence: str, due_at: int):
+        cursor = self.conn.cursor()
+        cursor.execute(
+            'UPDATE scheduled_posts SET recurrence = ?, due_at = ? WHERE id = ?',
+            (recurrence, due_at, post_id)
+        )
+        self.conn.commit()
+
+    def get_scheduled_post(self, post_id: int) -> Optional[Dict[str, Any]]:
+        cursor = self.conn.cursor()
+        cursor.execute('SELECT * FROM scheduled_posts WHERE id = ?', (post_id,))
+        row = cursor.fetchone()
+        if row:
+            columns = [description[0] for description in cursor.description]
+            return dict(zip(columns, row))
+        return None
+
+    def get_scheduled_posts(self, chat_id: int, limit: int = 20) -> List[Dict[str, Any]]:
+        cursor = self.conn.cursor()
+        cursor.execute(
+            '''SELECT * FROM scheduled_posts
+               WHERE chat_id = ? AND status IN ('pending', 'sending')
+               ORDER BY due_at
+               LIMIT ?''',
+            (chat_id, limit)
+        )
+        rows = cursor.fetchall()
+        columns = [description[0] for description in cursor.description]
+        return [dict(zip(columns, row)) for row in rows]
+
+    def mark_scheduled_post(self, post_id: int, status: str, error: str = None, due_at: int = None) -> int:
+        """Set a post's status (and optionally its due time); moving to 'sending' counts an attempt.
+
+        Returns the attempt count.
+        """
+        cursor = self.conn.cursor()
+        cursor.execute(
+            '''UPDATE scheduled_posts
+               SET status = ?, error = ?, attempts = attempts + (? = 'sending'), due_at = COALESCE(?, due_at)
+               WHERE id = ?''',
+            (status, error, status, due_at, post_id)
+        )
+        self.conn.commit()
+        cursor.execute('SELECT attempts FROM scheduled_posts WHERE id = ?', (post_id,))
+        row = cursor.fetchone()
+        return row[0] if row else 0
+
+    def reschedule_post(self, post_id: int, due_at: int):
+        """Move a recurring post to its next occurrence with a fresh attempt count"""
+        cursor = self.conn.cursor()
+        cursor.execute(
+            "UPDATE scheduled_posts SET status = 'pending', attempts = 0, error = NULL, due_at = ? WHERE id = ?",
+            (due_at, post_id)
+        )
+        self.conn.commit()
+
+    def cancel_scheduled_post(self, post_id: int, chat_id: int) -> bool:
+        cursor = self.conn.cursor()
+        cursor.execute(
+            '''UPDATE scheduled_posts SET status = 'cancelled'
+               WHERE id = ? AND chat_id = ? AND status IN ('pending', 'sending')''',
+            (post_id, chat_id)
+        )
+        self.conn.commit()
+        return cursor.rowcount > 0
+
     def add_group(self, group_id: int, title: str):
         cursor = self.conn.cursor()
         cursor.execute(
-            'INSERT OR IGNORE INTO groups (group_id, title) VALUES (?, ?)',
+            '''INSERT INTO groups (group_id, title) VALUES (?, ?)
+               ON CONFLICT (group_id) DO UPDATE SET title = excluded.title, removed_at = NULL''',
             (group_id, title)
         )
         self.conn.commit()
     
+    def mark_groups_removed(self, group_ids: List[int]):
+        """Flag groups the bot can no longer post to, for later cleanup"""
+        cursor = self.conn.cursor()
+        now = datetime.now()
+        cursor.executemany(
+            'UPDATE groups SET removed_at = ? WHERE group_id = ?',
+            [(now, group_id) for group_id in group_ids]
+        )
+        self.conn.commit()
+    
+    def get_broadcast_targets(self, after: Optional[int], limit: int) -> List[int]:
+        """Return the next page of active group ids after the given id"""
+        cursor = self.conn.cursor()
+        if after is None:
+            cursor.execute(
+                'SELECT group_id FROM groups WHERE removed_at IS NULL ORDER BY group_id LIMIT ?',
+                (limit,)
+            )
+        else:
+            cursor.execute(
+                'SELECT group_id FROM groups WHERE removed_at IS NULL AND group_id > ? ORDER BY group_id LIMIT ?',
+                (after, limit)
+            )
+        return [row[0] for row in cursor.fetchall()]
+    
+    def count_broadcast_targets(self) -> int:
+        cursor = self.conn.cursor()
+        cursor.execute('SELECT COUNT(*) FROM groups WHERE removed_at IS NULL')
+        return cursor.fetchone()[0]
+    
+    def create_broadcast(self, from_chat_id: int, message_id: int, created_by: int, total: int) -> int:
+        cursor = self.conn.cursor()
+        cursor.execute(
+            '''INSERT INTO broadcasts (from_chat_id, message_id, created_by, total, created_at)
+               VALUES (?, ?, ?, ?, ?)''',
+            (from_chat_id, message_id, created_by, total, datetime.now())
+        )
+        self.conn.commit()
+        return cursor.lastrowid
+    
+    def get_broadcast(self, broadcast_id: int) -> Optional[Dict[str, Any]]:
+        cursor = self.conn.cursor()
+        cursor.execute('SELECT * FROM broadcasts WHERE id = ?', (broadcast_id,))
+        row = cursor.fetchone()
+        if row:
+            columns = [description[0] for description in cursor.description]
+            return dict(zip(columns, row))
+        return None
+    
+    def get_running_broadcasts(self) -> List[int]:
+        cursor = self.conn.cursor()
+        cursor.execute("SELECT id FROM broadcasts WHERE status = 'running' ORDER BY id")
+        return [row[0] for row in cursor.fetchall()]
+    
+    def update_broadcast(self, broadcast_id: int, **kwargs):
+        cursor = self.conn.cursor()
+        set_clause = ', '.join([f"{key} = ?" for key in kwargs.keys()])
+        values = list(kwargs.values())
+        values.append(broadcast_id)
+        cursor.execute(f'UPDATE broadcasts SET {set_clause} WHERE id = ?', values)
+        self.conn.commit()
+    
+    def add_broadcast_delivery(self, broadcast_id: int, chat_id: int, ok: bool, error: str = None):
+        cursor = self.conn.cursor()
+        cursor.execute(
+            'INSERT OR REPLACE INTO broadcast_deliveries (broadcast_id, chat_id, ok, error) VALUES (?, ?, ?, ?)',
+            (broadcast_id, chat_id, ok, error)
+        )
+        self.conn.commit()
+    
+    def get_broadcast_deliveries(self, broadcast_id: int, chat_ids: List[int]) -> Dict[int, bool]:
+        """Return {chat_id: ok} for the given chats that already have a delivery record"""
+        if not chat_ids:
+            return {}
+        cursor = self.conn.cursor()
+        placeholders = ', '.join(['?'] * len(chat_ids))
+        cursor.execute(
+            f'SELECT chat_id, ok FROM broadcast_deliveries WHERE broadcast_id = ? AND chat_id IN ({placeholders})',
+            [broadcast_id] + list(chat_ids)
+        )
+        return {row[0]: bool(row[1]) for row in cursor.fetchall()}
+    
+    def get_group_titles(self) -> Dict[int, str]:
+        cursor = self.conn.cursor()
+        cursor.execute('SELECT group_id, title FROM groups')
+        return dict(cursor.fetchall())
+    
     def update_group_settings(self, group_id: int, settings: Dict[str, Any]):
         cursor = self.conn.cursor()
         cursor.execute(
@@ -352,4 +816,47 @@ class Database:
                         (user_id, group_id)
                     )
         
-        self.conn.commit()
\ No newline at end of file
+        self.conn.commit()
+    
+    def save_state(self, name: str, data: Any, saved_at: int):
+        cursor = self.conn.cursor()
+        cursor.execute(
+            'INSERT OR REPLACE INTO runtime_state (name, data, saved_at) VALUES (?, ?, ?)',
+            (name, json.dumps(data), saved_at)
+        )
+        self.conn.commit()
+    
+    @contextmanager
+    def take_states(self, prefix: str, since: int, owns: Callable[[int], bool] = None) -> Iterator[List[Dict[str, Any]]]:
+        """Claim state saved under names starting with prefix no earlier than since.
+        
+        Each saved state maps chat ids to data; yields the parts for chats owns()
+        accepts (all of them without owns). When the block completes they are
+        removed from the table, rows left empty or older than since are deleted,
+        and other workers only find the chats they own. The write lock is held
+        for the block, so workers starting together claim one after another.
+        """
+        cursor = self.conn.cursor()
+        cursor.execute('BEGIN IMMEDIATE')
+        try:
+            cursor.execute("DELETE FROM runtime_state WHERE name LIKE ? || '%' AND saved_at < ?", (prefix, since))
+            cursor.execute("SELECT name, data FROM runtime_state WHERE name LIKE ? || '%'", (prefix,))
+            taken, remaining = [], {}
+            for name, data in cursor.fetchall():
+                data = json.loads(data)
+                mine = {chat_id: value for chat_id, value in data.items() if owns is None or owns(int(chat_id))}
+                taken.append(mine)
+                remaining[name] = {chat_id: value for chat_id, value in data.items() if chat_id not in mine}
+            yield taken
+            for name, data in remaining.items():
+                if data:
+                    cursor.execute('UPDATE runtime_state SET data = ? WHERE name = ?', (json.dumps(data), name))
+                else:
+                    cursor.execute('DELETE FROM runtime_state WHERE name = ?', (name,))
+        except BaseException:
+            self.conn.rollback()
+            raise
+        self.conn.commit()
+    
+    def close(self):
+        self.conn.close()
@@ -0,0 +1,155 @@
+import html
+import logging
+import os
+import time
+import traceback
+from datetime import datetime
+from typing import Any, Dict, Optional, Tuple
+
+from telegram import Update
+from telegram.ext import ContextTypes
+
+from fanout import TokenBucket
+from metrics import ERRORS, registry
+
+logger = logging.getLogger(__name__)
+
+PROJECT_DIR = os.path.dirname(os.path.abspath(__file__))
+MAX_SIGNATURES = 500
+FORGET_AFTER = 24 * 3600
+
+ERROR_NOTICES = registry.counter('bot_error_notices_total', 'Error messages sent or held back', ['kind'])
+
+def error_location(error: BaseException) -> str:
+    """file:line in function of the innermost frame in the bot's own code"""
+    frames = traceback.extract_tb(error.__traceback__)
+    own = [frame for frame in frames
+           if frame.filename.startswith(PROJECT_DIR) and 'site-packages' not in frame.filename]
+    frame = (own or frames)[-1] if frames else None
+    if frame is None:
+        return 'unknown'
+    return f"{os.path.relpath(frame.filename, PROJECT_DIR)}:{frame.lineno} in {frame.name}"
+
+def format_seen(timestamp: float) -> str:
+    return datetime.fromtimestamp(timestamp).strftime('%m-%d %H:%M:%S')
+
+class ErrorReporter:
+    """Groups handler exceptions by type and location instead of messaging on each one.
+
+    The owner gets an immediate alert for an error signature seen for the first
+    time, as long as the alert bucket has a token; everything else is counted
+    and sent as one digest per interval. Chats get at most one "an error
+    occurred" reply per reply_interval.
+    """
+
+    def __init__(self, admin_id: Optional[int], alert_burst: int = 3, alerts_per_hour: float = 10,
+                 reply_interval: float = 60):
+        self.admin_id = admin_id
+        self.alerts = TokenBucket(alerts_per_hour / 3600, alert_burst)
+        self.reply_interval = reply_interval
+        self.signatures: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        self.last_reply: Dict[int, float] = {}  # {chat_id: monotonic time of the last error reply}
+        self.last_digest = time.time()
+
+    def record(self, error: BaseException) -> Tuple[Dict[str, Any], bool]:
+        """Count the error under its signature; returns (entry, first time seen)"""
+        key = (type(error).__name__, error_location(error))
+        now = time.time()
+        entry = self.signatures.get(key)
+        new = entry is None
+        if new:
+            if len(self.signatures) >= MAX_SIGNATURES:
+                oldest = min(self.signatures, key=lambda k: self.signatures[k]['last_seen'])
+                del self.signatures[oldest]
+            entry = self.signatures[key] = {
+                'type': key[0], 'location': key[1], 'count': 0, 'pending': 0,
+                'first_seen': now, 'last_seen': now, 'message': '',
+            }
+        entry['count'] += 1
+        entry['pending'] += 1
+        entry['last_seen'] = now
+        entry['message'] = str(error)[:200]
+        return entry, new
+
+    def should_reply(self, chat_id: int) -> bool:
+        now = time.monotonic()
+        if now - self.last_reply.get(chat_id, float('-inf')) < self.reply_interval:
+            return False
+        self.last_reply[chat_id] = now
+        return True
+
+    async def report(self, update: object, context: ContextTypes.DEFAULT_TYPE):
+        """Error handler: log, count, and tell the chat and owner within their limits"""
+        error = context.error
+        chat = update.effective_chat if isinstance(update, Update) else None
+        logger.error(f"❌ Exception: {error}", exc_info=error, extra={
+            'chat_id': chat.id if chat else None,
+            'update_id': update.update_id if isinstance(update, Update) else None,
+        })
+        ERRORS.inc(error=type(error).__name__)
+        entry, new = self.record(error)
+
+        try:
+            message = update.effective_message if isinstance(update, Update) else None
+            if message:
+                if self.should_reply(message.chat_id):
+                    ERROR_NOTICES.inc(kind='reply')
+                    await message.reply_text("❌ An error occurred. The developer has been notified.")
+                else:
+                    ERROR_NOTICES.inc(kind='reply_suppressed')
+
+            if self.admin_id and new and self.alerts.try_acquire():
+                ERROR_NOTICES.inc(kind='alert')
+                entry['pending'] = 0
+                await context.bot.send_message(
+                    chat_id=self.admin_id,
+                    text=f"⚠️ <b>New error:</b> {html.escape(entry['type'])}\n"
+                         f"📍 <code>{html.escape(entry['location'])}</code>\n"
+                         f"{html.escape(entry['message'], quote=False)}\n\n"
+                         f"Repeats are batched into the next digest.",
+                    parse_mode='HTML'
+                )
+            else:
+                ERROR_NOTICES.inc(kind='held')
+        except Exception as e:
+            logger.error(f"❌ Error in error handler: {e}")
+
+    def digest(self) -> Optional[str]:
+        """Digest of errors counted since the last one, or None if there were none"""
+        pending = sorted(
+            (entry for entry in self.signatures.values() if entry['pending']),
+            key=lambda entry: entry['pending'], reverse=True
+        )
+        if not pending:
+            return None
+
+        minutes = max(1, round((time.time() - self.last_digest) / 60))
+        message = f"🧯 <b>Error digest</b> (last {minutes} min)\n\n"
+        for entry in pending[:15]:
+            message += f"<b>{html.escape(entry['type'])}</b> ×{entry['pending']} (total {entry['count']})\n"
+            message += f"   📍 <code>{html.escape(entry['location'])}</code>\n"
+            message += f"   🕐 first {format_seen(entry['first_seen'])}, last {format_seen(entry['last_seen'])}\n"
+            message += f"   {html.escape(entry['message'], quote=False)}\n"
+        if len(pending) > 15:
+            message += f"\n… and {len(pending) - 15} more error types"
+        return message
+
+    async def digest_job(self, context: ContextTypes.DEFAULT_TYPE):
+        message = self.digest()
+        now = time.time()
+        if message and self.admin_id:
+            try:
+                await context.bot.send_message(chat_id=self.admin_id, text=message, parse_mode='HTML')
+                ERROR_NOTICES.inc(kind='digest')
+            except Exception as e:
+                logger.error(f"❌ Error sending error digest: {e}")
+                return
+        for entry in self.signatures.values():
+            entry['pending'] = 0
+        self.last_digest = now
+
+        # Forget signatures and chats that have been quiet for a while
+        for key in [key for key, entry in self.signatures.items() if now - entry['last_seen'] > FORGET_AFTER]:
+            del self.signatures[key]
+        cutoff = time.monotonic() - self.reply_interval
+        self.last_reply = {chat_id: at for chat_id, at in self.last_reply.items() if at > cutoff}
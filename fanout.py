@@ -0,0 +1,117 @@
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional
+from telegram.error import BadRequest, ChatMigrated, Forbidden, NetworkError, RetryAfter, TelegramError
+
+from utilities import retry_after_seconds
+
+class TokenBucket:
+    """Async token bucket; callers that find it empty sleep until their token is due"""
+
+    def __init__(self, rate: float, capacity: float = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self, tokens: float = 1):
+        self._refill()
+        # Take the tokens now (possibly going into debt) so concurrent callers queue up in order
+        self.tokens -= tokens
+        if self.tokens < 0:
+            await asyncio.sleep(-self.tokens / self.rate)
+
+    def try_acquire(self, tokens: float = 1) -> bool:
+        """Take the tokens only if they are available right now; never waits"""
+        self._refill()
+        if self.tokens < tokens:
+            return False
+        self.tokens -= tokens
+        return True
+
+class FanOutExecutor:
+    """Send one thing to many chats with bounded concurrency and per-chat spacing.
+
+    Each destination is retried on RetryAfter (after the requested wait) and on
+    network errors (with backoff); permanent errors such as a missing chat or a
+    kicked bot fail only that destination.
+    """
+
+    def __init__(self, concurrency: int = 20, per_chat_interval: float = 1.0,
+                 max_attempts: int = 3, rate_limiter: Optional[TokenBucket] = None):
+        self.concurrency = concurrency
+        self.per_chat_interval = per_chat_interval
+        self.max_attempts = max_attempts
+        self.rate_limiter = rate_limiter
+        self.next_slot: Dict[Any, float] = {}  # {chat_id: earliest monotonic time for the next send}
+
+    async def run(self, destinations: Iterable, send: Callable[[Any], Awaitable], cost: int = 1) -> List[Dict[str, Any]]:
+        """Call send(chat_id) for every destination; returns one result dict per destination.
+
+        cost is the number of messages one send produces (e.g. album size) and
+        is charged against the global rate limiter.
+        """
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def worker(chat_id):
+            async with semaphore:
+                return await self.send_one(chat_id, send, cost)
+
+        return await asyncio.gather(*(worker(chat_id) for chat_id in dict.fromkeys(destinations)))
+
+    async def wait_turn(self, chat_id):
+        """Space consecutive sends to the same chat by per_chat_interval"""
+        now = time.monotonic()
+        if len(self.next_slot) > 10000:
+            self.next_slot = {key: value for key, value in self.next_slot.items() if value > now}
+        slot = max(now, self.next_slot.get(chat_id, 0.0))
+        self.next_slot[chat_id] = slot + self.per_chat_interval
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+    async def send_one(self, chat_id, send: Callable[[Any], Awaitable], cost: int = 1) -> Dict[str, Any]:
+        result = {'chat_id': chat_id, 'ok': False, 'message_id': None, 'error': None, 'error_type': None, 'attempts': 0}
+        target = chat_id
+
+        while result['attempts'] < self.max_attempts:
+            result['attempts'] += 1
+            await self.wait_turn(target)
+            if self.rate_limiter:
+                await self.rate_limiter.acquire(cost)
+
+            try:
+                sent = await send(target)
+            except RetryAfter as e:
+                result.update(error=str(e), error_type=type(e).__name__)
+                if result['attempts'] < self.max_attempts:
+                    await asyncio.sleep(retry_after_seconds(e))
+                continue
+            except ChatMigrated as e:
+                # Group was upgraded to a supergroup; follow it
+                result.update(error=str(e), error_type=type(e).__name__)
+                target = e.new_chat_id
+                continue
+            except (BadRequest, Forbidden) as e:
+                result.update(error=str(e), error_type=type(e).__name__)
+                break
+            except NetworkError as e:
+                result.update(error=str(e), error_type=type(e).__name__)
+                if result['attempts'] < self.max_attempts:
+                    await asyncio.sleep(2 ** result['attempts'])
+                continue
+            except TelegramError as e:
+                result.update(error=str(e), error_type=type(e).__name__)
+                break
+
+            if isinstance(sent, (list, tuple)):
+                # send_media_group returns every message of the album
+                sent = sent[0] if sent else None
+            result.update(ok=True, error=None, error_type=None, message_id=getattr(sent, 'message_id', None))
+            break
+
+        return result
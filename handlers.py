@@ -1,3 +1,4 @@
+import pytz
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import ContextTypes, CommandHandler, MessageHandler, filters, CallbackQueryHandler
 
@@ -8,14 +9,25 @@ from moderation import Moderation
 from welcome import WelcomeHandler
 from analytics import Analytics
 from channel import ChannelManager
+from i18n import languages, resolve
+from templates import SLOTS, TemplateError, chat_text, compile_template
 
 class CommandHandlers:
     def __init__(self, db: Database):
         self.db = db
-        self.moderation = Moderation(db)
-        self.welcome = WelcomeHandler(db)
         self.analytics = Analytics(db)
+        self.moderation = Moderation(db, self.analytics.activity)
+        self.welcome = WelcomeHandler(db, self.analytics.activity)
         self.channel = ChannelManager(db)
+        self.reports = None  # GroupReports, built on first /ownerreport because it loads pandas
+        self.known_groups = set()  # groups already written to the groups table this run
+    
+    async def owner_report(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        if self.reports is None:
+            from reports import GroupReports
+            self.reports = GroupReports(self.db)
+        self.analytics.activity.flush_message_counts()
+        await self.reports.owner_report(update, context)
     
     async def start(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Send welcome message with main menu"""
@@ -75,7 +87,7 @@ class CommandHandlers:
     
     async def settings(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Show settings menu"""
-        if not is_admin(update, context):
+        if not await is_admin(update, context):
             await update.message.reply_text("❌ This command is only available for admins.")
             return
         
@@ -95,13 +107,13 @@ class CommandHandlers:
         settings = config.get_chat_settings(chat_id)
         
         await update.message.reply_text(
-            f"📝 <b>Group Rules</b>\n\n{settings.get('rules', 'No rules set yet.')}",
+            f"📝 <b>Group Rules</b>\n\n{chat_text(settings, 'rules')}",
             parse_mode='HTML'
         )
     
     async def set_welcome(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Set custom welcome message"""
-        if not is_admin(update, context):
+        if not await is_admin(update, context):
             await update.message.reply_text("❌ This command is only available for admins.")
             return
         
@@ -111,6 +123,11 @@ class CommandHandlers:
         
         chat_id = update.effective_chat.id
         welcome_message = ' '.join(context.args)
+        try:
+            compile_template(welcome_message, SLOTS['welcome'])
+        except TemplateError as e:
+            await update.message.reply_text(f"❌ Invalid welcome message: {e}")
+            return
         settings = config.get_chat_settings(chat_id)
         settings['welcome_message'] = welcome_message
         config.update_chat_settings(chat_id, settings)
@@ -119,7 +136,7 @@ class CommandHandlers:
     
     async def set_goodbye(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Set custom goodbye message"""
-        if not is_admin(update, context):
+        if not await is_admin(update, context):
             await update.message.reply_text("❌ This command is only available for admins.")
             return
         
@@ -129,6 +146,11 @@ class CommandHandlers:
         
         chat_id = update.effective_chat.id
         goodbye_message = ' '.join(context.args)
+        try:
+            compile_template(goodbye_message, SLOTS['goodbye'])
+        except TemplateError as e:
+            await update.message.reply_text(f"❌ Invalid goodbye message: {e}")
+            return
         settings = config.get_chat_settings(chat_id)
         settings['goodbye_message'] = goodbye_message
         config.update_chat_settings(chat_id, settings)
@@ -141,7 +163,7 @@ class CommandHandlers:
         settings = config.get_chat_settings(chat_id)
         
         await update.message.reply_text(
-            f"👋 <b>Current Welcome Message</b>\n\n{settings.get('welcome_message', 'No welcome message set yet.')}",
+            f"👋 <b>Current Welcome Message</b>\n\n{chat_text(settings, 'welcome')}",
             parse_mode='HTML'
         )
     
@@ -151,13 +173,13 @@ class CommandHandlers:
         settings = config.get_chat_settings(chat_id)
         
         await update.message.reply_text(
-            f"👋 <b>Current Goodbye Message</b>\n\n{settings.get('goodbye_message', 'No goodbye message set yet.')}",
+            f"👋 <b>Current Goodbye Message</b>\n\n{chat_text(settings, 'goodbye')}",
             parse_mode='HTML'
         )
     
     async def set_rules(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Set group rules"""
-        if not is_admin(update, context):
+        if not await is_admin(update, context):
             await update.message.reply_text("❌ This command is only available for admins.")
             return
         
@@ -175,7 +197,7 @@ class CommandHandlers:
     
     async def set_language(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Set bot language"""
-        if not is_admin(update, context):
+        if not await is_admin(update, context):
             await update.message.reply_text("❌ This command is only available for admins.")
             return
         
@@ -189,16 +211,70 @@ class CommandHandlers:
         settings['language'] = language
         config.update_chat_settings(chat_id, settings)
         
+        used = resolve('welcome', language)[1]
+        if used != language:
+            await update.message.reply_text(
+                f"✅ Language set to {language}! There are no {language} texts yet, so {used} is used "
+                f"(available: {', '.join(languages())})."
+            )
+            return
         await update.message.reply_text(f"✅ Language set to {language}!")
     
+    async def set_timezone(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Set group timezone"""
+        if not await is_admin(update, context):
+            await update.message.reply_text("❌ This command is only available for admins.")
+            return
+        
+        if not context.args:
+            await update.message.reply_text("❌ Please provide a timezone.\nUsage: /timezone Asia/Dhaka")
+            return
+        
+        try:
+            timezone = pytz.timezone(context.args[0]).zone
+        except pytz.UnknownTimeZoneError:
+            await update.message.reply_text("❌ Unknown timezone. Use a name like Asia/Dhaka or UTC.")
+            return
+        
+        chat_id = update.effective_chat.id
+        settings = config.get_chat_settings(chat_id)
+        settings['timezone'] = timezone
+        config.update_chat_settings(chat_id, settings)
+        
+        await update.message.reply_text(f"✅ Timezone set to {timezone}!")
+    
     async def reload_config(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Reload configuration"""
-        if not is_admin(update, context):
+        if not await is_admin(update, context):
             await update.message.reply_text("❌ This command is only available for admins.")
             return
         
-        config.load_settings()
-        await update.message.reply_text("✅ Configuration reloaded successfully!")
+        changed = config.reload_settings()
+        await update.message.reply_text(f"✅ Configuration reloaded successfully! ({len(changed)} chats changed)")
+    
+    async def queue_stats(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Show update queue depths"""
+        if not is_owner(update.effective_user.id):
+            await update.message.reply_text("❌ This command is only available for the bot owner.")
+            return
+        
+        processor = context.application.update_processor
+        if not hasattr(processor, 'stats'):
+            await update.message.reply_text("📭 Updates are processed sequentially.")
+            return
+        
+        stats = processor.stats()
+        message = "⚙️ <b>Update Queues</b>\n\n"
+        message += f"🔄 In flight: {stats['in_flight']}\n"
+        message += f"💬 Active chats: {stats['active_chats']}\n"
+        message += f"📥 Pending: {stats['pending']}\n"
+        message += f"📈 Peak chat depth: {stats['peak_depth']}\n"
+        message += f"✅ Processed: {stats['processed']}\n"
+        if stats['busiest']:
+            message += "\n<b>Busiest chats:</b>\n"
+            message += "\n".join(f"• {chat_id}: {depth}" for chat_id, depth in stats['busiest'])
+        
+        await update.message.reply_text(message, parse_mode='HTML')
     
     async def callback_handler(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Handle inline keyboard callbacks"""
@@ -263,6 +339,9 @@ class CommandHandlers:
                 parse_mode='HTML'
             )
         
+        elif data.startswith("inactive:"):
+            await self.analytics.inactive_callback(update, context)
+        
         # Add more command categories here...
         
         elif data == "settings":
@@ -293,6 +372,13 @@ class CommandHandlers:
         if update.effective_chat.type == 'channel':
             return
         
+        # Remember the group so it receives broadcasts
+        self.remember_group(update.effective_chat)
+        
+        # Album items arrive as separate updates; keep them for /crosspost
+        if update.message.media_group_id:
+            self.channel.track_media(update.message)
+        
         # Check for flood
         if await self.moderation.check_flood(update, context):
             return
@@ -305,9 +391,19 @@ class CommandHandlers:
         if await self.moderation.check_links(update, context):
             return
         
-        # Update statistics
-        chat_id = update.effective_chat.id
-        self.db.update_statistics(chat_id, update.message.date.strftime('%Y-%m-%d'), messages=1)
+        self.count_message(update)
+    
+    def remember_group(self, chat):
+        if chat.id not in self.known_groups and chat.type in ('group', 'supergroup'):
+            self.db.add_group(chat.id, chat.title)
+            self.known_groups.add(chat.id)
+    
+    def count_message(self, update: Update):
+        """Count a message that passed moderation; the whole of the prefilter's stats path"""
+        chat = update.effective_chat
+        self.remember_group(chat)
+        # Update statistics (buffered, written by the analytics flush job)
+        self.analytics.activity.record_message(chat.id, update.message)
     
     def get_handlers(self):
         """Return all command handlers"""
@@ -323,7 +419,12 @@ class CommandHandlers:
             CommandHandler('goodbye', self.show_goodbye),
             CommandHandler('setrules', self.set_rules),
             CommandHandler('language', self.set_language),
+            CommandHandler('timezone', self.set_timezone),
             CommandHandler('reloadconfig', self.reload_config),
+            CommandHandler('ownerreport', self.owner_report),
+            CommandHandler('queues', self.queue_stats),
             CallbackQueryHandler(self.callback_handler),
-            MessageHandler(filters.TEXT & ~filters.COMMAND, self.handle_message),
+            MessageHandler(filters.StatusUpdate.NEW_CHAT_MEMBERS, self.welcome.send_welcome),
+            MessageHandler(filters.StatusUpdate.LEFT_CHAT_MEMBER, self.welcome.send_goodbye),
+            MessageHandler((filters.TEXT | filters.ATTACHMENT) & ~filters.COMMAND, self.handle_message),
         ]
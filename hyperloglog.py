@@ -0,0 +1,62 @@
+import math
+from typing import Iterable
+
+MASK_64 = (1 << 64) - 1
+
+def hash64(value: int) -> int:
+    """SplitMix64 finalizer; spreads integer IDs over 64 bits"""
+    z = (value + 0x9E3779B97F4A7C15) & MASK_64
+    z = ((z ^ (z >> 30)) * 0xBF58476D1CE4E5B9) & MASK_64
+    z = ((z ^ (z >> 27)) * 0x94D049BB133111EB) & MASK_64
+    return z ^ (z >> 31)
+
+class HyperLogLog:
+    """Fixed-size distinct counter; 2^13 one-byte registers give ~1.15% standard error"""
+    __slots__ = ('precision', 'registers')
+
+    def __init__(self, registers: bytes = None, precision: int = 13):
+        self.precision = precision
+        if registers:
+            self.registers = bytearray(registers)
+            self.precision = len(self.registers).bit_length() - 1
+        else:
+            self.registers = bytearray(1 << precision)
+
+    def add(self, value: int) -> bool:
+        """Add an integer; returns True if the sketch changed"""
+        h = hash64(value)
+        bits = 64 - self.precision
+        index = h >> bits
+        rank = bits - (h & ((1 << bits) - 1)).bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+            return True
+        return False
+
+    def merge(self, other: 'HyperLogLog'):
+        """Fold another sketch of the same precision into this one"""
+        if other.precision != self.precision:
+            raise ValueError("Cannot merge sketches with different precision")
+        self.registers = bytearray(map(max, self.registers, other.registers))
+
+    def count(self) -> int:
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / sum(2.0 ** -r for r in self.registers)
+
+        # Small-range correction (linear counting)
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * m and zeros:
+            estimate = m * math.log(m / zeros)
+
+        return round(estimate)
+
+    def to_bytes(self) -> bytes:
+        return bytes(self.registers)
+
+    @classmethod
+    def union(cls, sketches: Iterable['HyperLogLog']) -> 'HyperLogLog':
+        result = cls()
+        for sketch in sketches:
+            result.merge(sketch)
+        return result
@@ -0,0 +1,64 @@
+from functools import lru_cache
+from typing import Dict, List, Tuple
+
+DEFAULT_LANGUAGE = 'en'
+
+# Message catalog by language code. Keys missing from a language fall back to
+# its base language (pt-br -> pt) and then to English.
+CATALOG: Dict[str, Dict[str, str]] = {
+    'en': {
+        "welcome": "👋 Welcome {user_name} to {chat_title}! 🇵🇸\n\nPlease read the rules with /rules",
+        "goodbye": "👋 Goodbye {user_name}! We'll miss you! ❤️",
+        "rules": "📝 Please be respectful to all members. No spam, no NSFW content.",
+        "bot_added": "🙏 Thanks for adding me to this group! Use /help to see what I can do. 🇵🇸",
+        "warned": "⚠️ Warning: {reason}\nTotal warnings: {count}/3",
+        "kicked": "🚫 You have been removed from the group. Reason: {reason}",
+        "banned": "🔒 You have been permanently banned from the group. Reason: {reason}",
+        "muted": "🔇 You have been muted for {duration} seconds. Reason: {reason}",
+        "unmuted": "🔊 You have been unmuted.",
+        "admin_only": "❌ This command is only available for admins.",
+        "reply_needed": "❌ Please reply to a user's message to use this command.",
+    },
+    'bn': {
+        "welcome": "👋 স্বাগতম {user_name} {chat_title} এ! 🇵🇸\n\nদয়া করে /rules দিয়ে নিয়মগুলি পড়ুন",
+        "goodbye": "👋 বিদায় {user_name}! আমরা আপনাকে মিস করব! ❤️",
+        "rules": "📝 দয়া করে সকল সদস্যের প্রতি শ্রদ্ধাশীল হন। স্প্যাম না, NSFW কন্টেন্ট না।",
+        "bot_added": "🙏 আমাকে এই গ্রুপে যোগ করার জন্য ধন্যবাদ! আমি কী করতে পারি দেখতে /help ব্যবহার করুন। 🇵🇸",
+        "warned": "⚠️ সতর্কতা: {reason}\nসর্বমোট সতর্কতা: {count}/3",
+        "kicked": "🚫 আপনি গ্রুপ থেকে বের করে দেওয়া হয়েছে। কারণ: {reason}",
+        "banned": "🔒 আপনি গ্রুপ থেকে স্থায়ীভাবে নিষিদ্ধ করা হয়েছে। কারণ: {reason}",
+        "muted": "🔇 আপনি {duration} সেকেন্ডের জন্য মিউট করা হয়েছে। কারণ: {reason}",
+        "unmuted": "🔊 আপনার মিউট সরানো হয়েছে।",
+        "admin_only": "❌ এই কমান্ডটি শুধুমাত্র অ্যাডমিনদের জন্য।",
+        "reply_needed": "❌ দয়া করে এই কমান্ডটি ব্যবহার করার জন্য একটি ব্যবহারকারীর রিপ্লাই করুন।",
+    },
+}
+
+def languages() -> List[str]:
+    return sorted(CATALOG)
+
+@lru_cache(maxsize=256)
+def fallbacks(language: str) -> Tuple[str, ...]:
+    """Catalogs to try for a language, most specific first"""
+    language = (language or DEFAULT_LANGUAGE).lower().replace('_', '-')
+    chain = [language]
+    if '-' in language:
+        chain.append(language.split('-', 1)[0])
+    if DEFAULT_LANGUAGE not in chain:
+        chain.append(DEFAULT_LANGUAGE)
+    return tuple(chain)
+
+def resolve(key: str, language: str = DEFAULT_LANGUAGE) -> Tuple[str, str]:
+    """(text, language it came from) for a catalog key; the key itself if no catalog has it"""
+    for candidate in fallbacks(language):
+        table = CATALOG.get(candidate)
+        if table and key in table:
+            return table[key], candidate
+    return key, DEFAULT_LANGUAGE
+
+def message(key: str, language: str = DEFAULT_LANGUAGE) -> str:
+    return resolve(key, language)[0]
+
+def translate(key: str, language: str = DEFAULT_LANGUAGE, **kwargs) -> str:
+    """Catalog text for key in language, formatted with kwargs"""
+    return message(key, language).format(**kwargs)
@@ -0,0 +1,168 @@
+import functools
+import html
+import logging
+import time
+from typing import Any, Dict, List, Optional
+
+from telegram import Update
+from telegram.ext import Application, CommandHandler, ContextTypes
+from telegram.request import HTTPXRequest
+
+from logs import log_context
+from metrics import current_call, registry, stage
+from utilities import is_owner
+
+logger = logging.getLogger(__name__)
+
+STAGES = ('db', 'pool', 'api', 'render')
+
+HANDLER_CALLS = registry.counter('bot_handler_calls_total', 'Handler invocations', ['handler', 'command', 'chat_type'])
+HANDLER_ERRORS = registry.counter('bot_handler_errors_total', 'Handler invocations that raised', ['handler', 'command', 'chat_type'])
+HANDLER_DURATION = registry.histogram('bot_handler_duration_seconds', 'Handler latency', ['handler', 'command', 'chat_type'])
+HANDLER_STAGE = registry.counter('bot_handler_stage_seconds_total', 'Handler time spent per stage', ['handler', 'stage'])
+
+class TimedRequest(HTTPXRequest):
+    """HTTPXRequest that counts Bot API round trips as the handler's api stage"""
+
+    async def do_request(self, *args, **kwargs):
+        with stage('api'):
+            return await super().do_request(*args, **kwargs)
+
+def handler_labels(handler) -> Dict[str, str]:
+    callback = handler.callback
+    name = getattr(callback, '__qualname__', type(callback).__name__)
+    if isinstance(handler, CommandHandler):
+        command = '/' + sorted(handler.commands)[0]
+    else:
+        command = type(handler).__name__
+    return {'handler': name, 'command': command}
+
+class HandlerInstrumentation:
+    """Wraps every registered handler callback to record calls, errors, latency
+    and a db/pool/api/render breakdown, and logs calls slower than the threshold"""
+
+    def __init__(self, slow_threshold: float = 0.5):
+        self.slow_threshold = slow_threshold
+
+    def instrument(self, application: Application):
+        """Wrap the callbacks of all handlers currently registered with the application"""
+        count = 0
+        for handlers in application.handlers.values():
+            for handler in handlers:
+                if not getattr(handler.callback, 'instrumented', False):
+                    handler.callback = self.wrap(handler.callback, handler_labels(handler))
+                    count += 1
+        logger.info(f"📈 Instrumented {count} handlers")
+
+    def wrap(self, callback, labels: Dict[str, str]):
+        @functools.wraps(callback)
+        async def instrumented(update: object, context: ContextTypes.DEFAULT_TYPE):
+            is_update = isinstance(update, Update)
+            chat = update.effective_chat if is_update else None
+            user = update.effective_user if is_update else None
+            chat_type = chat.type if chat else 'none'
+
+            call: Dict[str, float] = {}
+            token = current_call.set(call)
+            log_token = log_context.set({
+                'chat_id': chat.id if chat else None,
+                'user_id': user.id if user else None,
+                'update_id': update.update_id if is_update else None,
+                'handler': labels['handler'],
+                'command': labels['command'],
+            })
+            started = time.perf_counter()
+            try:
+                return await callback(update, context)
+            except Exception:
+                HANDLER_ERRORS.inc(chat_type=chat_type, **labels)
+                raise
+            finally:
+                elapsed = time.perf_counter() - started
+                try:
+                    HANDLER_CALLS.inc(chat_type=chat_type, **labels)
+                    HANDLER_DURATION.observe(elapsed, chat_type=chat_type, **labels)
+                    for name, seconds in call.items():
+                        HANDLER_STAGE.inc(seconds, handler=labels['handler'], stage=name)
+                    if elapsed >= self.slow_threshold:
+                        self.log_slow(labels, chat_type, chat, elapsed, call)
+                    elif logger.isEnabledFor(logging.DEBUG):
+                        logger.debug("%s in %s %s: %.1fms", labels['handler'], chat_type, chat.id if chat else '-',
+                                     elapsed * 1000, extra={'latency_ms': round(elapsed * 1000, 1)})
+                finally:
+                    # Even if recording fails, the next update must not inherit this one's context
+                    current_call.reset(token)
+                    log_context.reset(log_token)
+
+        instrumented.instrumented = True
+        return instrumented
+
+    @staticmethod
+    def log_slow(labels: Dict[str, str], chat_type: str, chat, elapsed: float, call: Dict[str, float]):
+        other = max(0.0, elapsed - sum(call.values()))
+        breakdown = ', '.join(f"{name} {call.get(name, 0.0) * 1000:.0f}ms" for name in STAGES)
+        logger.warning(
+            f"🐢 Slow handler {labels['handler']} ({labels['command']}) in {chat_type} "
+            f"{chat.id if chat else '-'}: {elapsed * 1000:.0f}ms ({breakdown}, other {other * 1000:.0f}ms)",
+            extra={'latency_ms': round(elapsed * 1000, 1)}
+        )
+
+    @staticmethod
+    def summary() -> List[Dict[str, Any]]:
+        """Per-handler totals merged across chat types, slowest total time first"""
+        rows: Dict[str, Dict[str, Any]] = {}
+        buckets = HANDLER_DURATION.buckets
+        for (handler, command, _), series in HANDLER_DURATION.series.items():
+            row = rows.setdefault(handler, {
+                'handler': handler, 'command': command, 'calls': 0, 'errors': 0,
+                'seconds': 0.0, 'buckets': [0] * (len(buckets) + 1), 'stages': {}
+            })
+            row['calls'] += sum(series[:-1])
+            row['seconds'] += series[-1]
+            row['buckets'] = [a + b for a, b in zip(row['buckets'], series[:-1])]
+        for (handler, command, _), errors in HANDLER_ERRORS.values.items():
+            if handler in rows:
+                rows[handler]['errors'] += errors
+        for (handler, name), seconds in HANDLER_STAGE.values.items():
+            if handler in rows:
+                rows[handler]['stages'][name] = seconds
+
+        for row in rows.values():
+            row['p95'] = percentile_bound(buckets, row.pop('buckets'), 0.95)
+        return sorted(rows.values(), key=lambda row: row['seconds'], reverse=True)
+
+    async def perf_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Summarize handler latency for the bot owner"""
+        if not is_owner(update.effective_user.id):
+            await update.message.reply_text("❌ This command is only available for the bot owner.")
+            return
+
+        rows = self.summary()
+        if not rows:
+            await update.message.reply_text("📭 No handler calls recorded yet.")
+            return
+
+        message = "⏱️ <b>Handler Performance</b>\n\n"
+        for row in rows[:10]:
+            average = row['seconds'] / row['calls'] * 1000
+            p95 = '>10s' if row['p95'] is None else f"≤{row['p95'] * 1000:.0f}ms"
+            message += f"<b>{html.escape(row['command'])}</b> <code>{html.escape(row['handler'])}</code>\n"
+            message += f"   📞 {row['calls']} calls, ❌ {row['errors']} errors\n"
+            message += f"   ⏱️ avg {average:.0f}ms, p95 {p95}, total {row['seconds']:.1f}s\n"
+            if row['stages']:
+                stages = ', '.join(f"{name} {row['stages'][name]:.1f}s" for name in STAGES if name in row['stages'])
+                message += f"   🧩 {stages}\n"
+
+        await update.message.reply_text(message, parse_mode='HTML')
+
+def percentile_bound(buckets, counts: List[int], quantile: float) -> Optional[float]:
+    """Upper bucket bound containing the quantile; None if it falls in the +Inf bucket"""
+    total = sum(counts)
+    if not total:
+        return 0.0
+    cumulative = 0
+    for bound, count in zip(buckets, counts):
+        cumulative += count
+        if cumulative >= quantile * total:
+            return bound
+    return None
@@ -0,0 +1,92 @@
+from bisect import bisect_left, insort
+from datetime import date, timedelta
+from typing import Dict, List, Optional, Set, Tuple
+
+class Leaderboard:
+    """Counter that keeps keys grouped by count so top-k reads are O(k)"""
+
+    def __init__(self):
+        self.counts: Dict[int, int] = {}
+        self.buckets: Dict[int, Set[int]] = {}  # {count: {keys}}
+        self.levels: List[int] = []  # distinct counts, ascending
+
+    def __len__(self) -> int:
+        return len(self.counts)
+
+    def get(self, key: int) -> int:
+        return self.counts.get(key, 0)
+
+    def add(self, key: int, amount: int = 1):
+        self.set(key, self.counts.get(key, 0) + amount)
+
+    def set(self, key: int, value: int):
+        old = self.counts.get(key, 0)
+        if old == value:
+            return
+        if old:
+            self._discard(key, old)
+
+        if value > 0:
+            self.counts[key] = value
+            bucket = self.buckets.get(value)
+            if bucket is None:
+                bucket = self.buckets[value] = set()
+                insort(self.levels, value)
+            bucket.add(key)
+        else:
+            self.counts.pop(key, None)
+
+    def _discard(self, key: int, count: int):
+        bucket = self.buckets[count]
+        bucket.discard(key)
+        if not bucket:
+            del self.buckets[count]
+            del self.levels[bisect_left(self.levels, count)]
+
+    def top(self, k: int = 10) -> List[Tuple[int, int]]:
+        """Return up to k (key, count) pairs with the highest counts"""
+        result = []
+        for count in reversed(self.levels):
+            for key in self.buckets[count]:
+                result.append((key, count))
+                if len(result) >= k:
+                    return result
+        return result
+
+class WindowedLeaderboard:
+    """Leaderboard over the last N days, built from per-day counters"""
+
+    def __init__(self, days: int = 7):
+        self.days = days
+        self.daily: Dict[str, Dict[int, int]] = {}  # {'YYYY-MM-DD': {key: count}}
+        self.total = Leaderboard()
+        self.today: Optional[str] = None  # newest day seen; the window ends there
+
+    def add(self, day: str, key: int, amount: int = 1):
+        counts = self.daily.get(day)
+        if counts is None:
+            if self.today is None or day > self.today:
+                self.expire(day)
+            elif day < self.cutoff(self.today):
+                # Late count for a day already out of the window
+                return
+            counts = self.daily[day] = {}
+        counts[key] = counts.get(key, 0) + amount
+        self.total.add(key, amount)
+
+    def cutoff(self, today: str) -> str:
+        """Oldest day still inside the window ending at today"""
+        return (date.fromisoformat(today) - timedelta(days=self.days - 1)).isoformat()
+
+    def expire(self, today: str):
+        """Subtract days that have fallen out of the window"""
+        if self.today is None or today > self.today:
+            self.today = today
+        cutoff = self.cutoff(today)
+        for day in [d for d in self.daily if d < cutoff]:
+            for key, count in self.daily.pop(day).items():
+                self.total.add(key, -count)
+
+    def top(self, today: str, k: int = 10) -> List[Tuple[int, int]]:
+        self.expire(today)
+        return self.total.top(k)
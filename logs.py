@@ -0,0 +1,111 @@
+import atexit
+import contextvars
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional
+
+TEXT_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+# Record attributes copied into JSON lines when a handler or `extra=` set them
+CONTEXT_FIELDS = ('chat_id', 'user_id', 'update_id', 'handler', 'command', 'latency_ms')
+
+# Fields describing the handler call running in the current task, added to every record it logs
+log_context: contextvars.ContextVar[Optional[Dict[str, Any]]] = contextvars.ContextVar('log_context', default=None)
+
+listener: Optional[logging.handlers.QueueListener] = None
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line with the handler context fields, for log shippers"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'time': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        for field in CONTEXT_FIELDS:
+            value = getattr(record, field, None)
+            if value is not None:
+                entry[field] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry['exception'] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+class ContextFilter(logging.Filter):
+    """Copies the current handler call's log_context onto the record"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        context = log_context.get()
+        if context:
+            for field, value in context.items():
+                if not hasattr(record, field):
+                    setattr(record, field, value)
+        return True
+
+class LogQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that does only the cheap part of formatting on the calling thread.
+
+    The message is merged with its args and any traceback rendered to text (the
+    traceback objects must not cross threads); timestamps, layout and JSON
+    encoding happen on the listener thread.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = logging.makeLogRecord(record.__dict__)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+def setup_logging(level: str = 'INFO', path: str = '', max_bytes: int = 10 * 1024 * 1024,
+                  backups: int = 5, json_format: bool = False, worker: Optional[int] = None):
+    """Route all logging through a queue to stdout and a size-rotated file on a background thread.
+
+    Only the first call in a process configures anything. With `worker`, the
+    file becomes bot.worker<N>.log so sharding workers never rotate the
+    parent's file; main.py therefore only calls this when run as the program.
+    """
+    global listener
+    if listener is not None:
+        return listener
+
+    formatter = JsonFormatter() if json_format else logging.Formatter(TEXT_FORMAT)
+    handlers = [logging.StreamHandler(sys.stdout)]
+    if path:
+        if worker is not None:
+            base, extension = os.path.splitext(path)
+            path = f"{base}.worker{worker}{extension}"
+        handlers.append(logging.handlers.RotatingFileHandler(
+            path, maxBytes=max_bytes, backupCount=backups, encoding='utf-8'
+        ))
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    queue_handler = LogQueueHandler(queue.SimpleQueue())
+    queue_handler.addFilter(ContextFilter())
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    root.setLevel(level.upper())
+
+    listener = logging.handlers.QueueListener(queue_handler.queue, *handlers, respect_handler_level=True)
+    listener.start()
+    atexit.register(stop_logging)
+    return listener
+
+def stop_logging():
+    """Flush everything still queued and stop the listener thread"""
+    global listener
+    if listener is not None:
+        listener.stop()
+        listener = None
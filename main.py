@@ -1,74 +1,138 @@
+import asyncio
 import logging
 import os
+import signal
 import sys
-from telegram.ext import Application, ApplicationBuilder
-from keep_alive import keep_alive
-keep_alive()
+import time
 
-# Enable logging
-logging.basicConfig(
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    level=logging.INFO,
-    handlers=[
-        logging.StreamHandler(sys.stdout),
-        logging.FileHandler('/tmp/bot.log')
-    ]
-)
+import startup
+if __name__ == '__main__' and '--profile-startup' in sys.argv:
+    # Started before the heavy imports below so they show up in the profile
+    startup.start_profiler()
+
+from telegram import Update
+from telegram.ext import Application, ApplicationBuilder, CommandHandler, TypeHandler
+
+from config import config
+from logs import setup_logging
+
+# Enable logging. Only when run as the program: spawned sharding workers re-run this module
+# as __mp_main__ and set up their own bot.worker<N>.log in run_worker instead
+if __name__ == '__main__':
+    setup_logging(config.log_level, config.log_file, config.log_max_bytes, config.log_backups, config.log_json)
 logger = logging.getLogger(__name__)
 
 try:
-    from config import config
     from database import Database
     from handlers import CommandHandlers
+    from analytics import register_analytics_commands
+    from channel import register_channel_commands
+    from updates import ChatOrderedProcessor, UpdateRecorder
+    from errors import ErrorReporter
+    from webserver import ApplicationReceiver, monitoring_routes, start_server
+    from instrumentation import HandlerInstrumentation
+    from prefilter import UpdateFilter
+    from transport import build_requests
+    from settings_store import SettingsWatcher
 except ImportError as e:
     logger.error(f"❌ Import error: {e}")
     sys.exit(1)
+startup.record_phase('imports', startup.since_start())
+
+# Slow imports kept out of startup and loaded in the background once the bot is serving
+PRELOAD_MODULES = ('matplotlib.pyplot', 'matplotlib.dates', 'reports')
 
 class GroupMegBot:
-    def __init__(self):
+    def __init__(self, state_scope: str = 'main'):
         try:
             logger.info("🔧 Initializing bot components...")
-            self.db = Database(config.database_url)
-            self.handlers = CommandHandlers(self.db)
+            with startup.phase('database'):
+                self.db = Database(config.database_url, config.db_busy_timeout)
+            with startup.phase('handlers'):
+                self.handlers = CommandHandlers(self.db)
+            self.instrumentation = HandlerInstrumentation(config.slow_handler_ms / 1000)
+            self.errors = ErrorReporter(
+                config.admin_id, config.error_alert_burst, config.error_alerts_per_hour, config.error_reply_interval
+            )
             self.application = None
+            self.server = None
+            self.settings_watcher = None
+            self.recorder = None
+            self.owns = None
+            # Name under which this process saves its in-memory state on shutdown
+            self.state_scope = state_scope
             logger.info("✅ Bot components initialized successfully")
         except Exception as e:
             logger.error(f"❌ Failed to initialize bot: {e}")
             raise
     
     async def post_init(self, application):
-        """Perform post initialization tasks"""
+        """Perform post initialization tasks once the application is running"""
         try:
-            await application.bot.set_my_commands([
-                ("start", "Start the bot"),
-                ("help", "Show help"),
-                ("about", "About the bot"),
-                ("rules", "Show group rules"),
-                ("settings", "Group settings (admins only)"),
-            ])
-            logger.info("✅ Bot commands set successfully")
+            # Command menu registration is a round trip that answering updates does not need;
+            # failures reach the error handler
+            application.create_task(self.set_commands(application.bot))
             
             # Set webhook if enabled
             if config.use_webhook and config.webhook_url:
-                webhook_url = f"{config.webhook_url}/{config.token}"
-                logger.info(f"🌐 Setting webhook to: {webhook_url}")
-                
-                await application.bot.set_webhook(
-                    url=webhook_url,
-                    secret_token=config.secret_token,
-                    drop_pending_updates=True,
-                    allowed_updates=["message", "callback_query"]
-                )
-                logger.info("✅ Webhook set successfully")
+                await self.set_webhook(application.bot)
+            else:
+                # Polling needs no web server of its own; serve health checks and metrics
+                self.server = start_server(monitoring_routes(lambda: application.running), config.port)
                 
         except Exception as e:
             logger.error(f"❌ Error in post_init: {e}")
+        
+        if startup.profiler:
+            startup.stop_profiler(config.startup_profile)
+    
+    async def post_shutdown(self, application):
+        if self.server:
+            self.server.stop()
+            self.server = None
+    
+    @staticmethod
+    async def set_commands(bot):
+        await bot.set_my_commands([
+            ("start", "Start the bot"),
+            ("help", "Show help"),
+            ("about", "About the bot"),
+            ("rules", "Show group rules"),
+            ("settings", "Group settings (admins only)"),
+        ])
+        logger.info("✅ Bot commands set successfully")
+    
+    @staticmethod
+    async def set_webhook(bot):
+        webhook_url = f"{config.webhook_url}/{config.token}"
+        logger.info(f"🌐 Setting webhook to: {webhook_url}")
+        
+        await bot.set_webhook(
+            url=webhook_url,
+            secret_token=config.secret_token,
+            drop_pending_updates=True,
+            allowed_updates=["message", "callback_query"]
+        )
+        logger.info("✅ Webhook set successfully")
     
     def setup_handlers(self):
         """Set up all handlers"""
         try:
             for handler in self.handlers.get_handlers():
                 self.application.add_handler(handler)
+            register_analytics_commands(self.application, self.handlers.analytics)
+            register_channel_commands(self.application, self.handlers.channel)
+            self.application.add_handler(CommandHandler('perf', self.instrumentation.perf_command))
+            self.instrumentation.instrument(self.application)
+            if config.prefilter:
+                # Added after instrument() so dropped and stats-only updates skip handler timing too
+                update_filter = UpdateFilter(self.handlers.count_message)
+                self.application.add_handler(TypeHandler(Update, update_filter.handle), group=-1)
+            if config.record_updates:
+                # Group -2 runs before every other handler, the prefilter included, and does not stop them
+                self.recorder = UpdateRecorder(config.record_updates)
+                self.application.add_handler(TypeHandler(Update, self.recorder.record), group=-2)
+                logger.info(f"📼 Recording updates to {config.record_updates}")
             self.application.add_error_handler(self.error_handler)
             logger.info("✅ Handlers set up successfully")
         except Exception as e:
@@ -77,60 +141,214 @@ class GroupMegBot:
     
     async def error_handler(self, update, context):
         """Handle errors in the telegram bot"""
-        logger.error(f"❌ Exception: {context.error}")
+        await self.errors.report(update, context)
+    
+    def build_application(self, bot=None, owns=None) -> Application:
+        """Create the application with all handlers and background jobs.
         
-        try:
-            if update and hasattr(update, 'effective_message'):
-                await update.effective_message.reply_text(
-                    "❌ An error occurred. The developer has been notified."
-                )
-            
-            if config.admin_id:
-                error_msg = f"⚠️ Error: {context.error}"
-                await context.bot.send_message(chat_id=config.admin_id, text=error_msg)
-                
-        except Exception as e:
-            logger.error(f"❌ Error in error handler: {e}")
+        owns(chat_id) limits scheduled posts and broadcasts resumed on start to
+        the ones this process is responsible for when running as a shard.
+        """
+        build_started = time.perf_counter()
+        builder = ApplicationBuilder() \
+            .post_init(self.post_init) \
+            .post_shutdown(self.post_shutdown) \
+            .concurrent_updates(ChatOrderedProcessor(config.max_concurrent_updates, config.max_pending_updates))
+        if bot:
+            builder = builder.bot(bot)
+        else:
+            request, get_updates_request = build_requests(config.http_pools)
+            builder = builder.token(config.token).request(request).get_updates_request(get_updates_request)
+        self.application = builder.build()
+        self.owns = owns
+        
+        # Set up handlers
+        self.setup_handlers()
+        
+        # Persist in-memory analytics counters periodically
+        self.application.job_queue.run_repeating(
+            self.handlers.analytics.activity.flush_job,
+            interval=config.stats_flush_interval,
+            first=config.stats_flush_interval
+        )
+        self.application.job_queue.run_repeating(
+            self.handlers.analytics.activity.last_seen_job,
+            interval=config.last_seen_flush_interval,
+            first=config.last_seen_flush_interval
+        )
+        self.application.job_queue.run_repeating(
+            self.errors.digest_job,
+            interval=config.error_digest_interval,
+            first=config.error_digest_interval
+        )
+        
+        # Load pending scheduled posts and arm the scheduler timer
+        self.handlers.channel.scheduler.start(self.application.job_queue, owns)
+        self.handlers.channel.broadcasts.start(self.application.job_queue, owns)
+        
+        if config.preload_delay >= 0:
+            self.application.job_queue.run_once(self.preload_job, config.preload_delay)
+        if config.settings_watch:
+            self.application.job_queue.run_once(self.watch_settings_job, 0)
+        startup.record_phase('build', time.perf_counter() - build_started)
+        
+        with startup.phase('restore'):
+            self.restore_state()
+        return self.application
+    
+    async def preload_job(self, context):
+        """Import the chart and report libraries off the event loop, so the first
+        /stats or /ownerreport does not pay for them"""
+        started = time.perf_counter()
+        await asyncio.get_running_loop().run_in_executor(None, startup.preload, PRELOAD_MODULES)
+        logger.info(f"📦 Preloaded {', '.join(PRELOAD_MODULES)} in {time.perf_counter() - started:.2f}s")
+    
+    async def watch_settings_job(self, context):
+        """Start reloading settings whenever the settings files change (from the job queue so it runs on the loop)"""
+        store = config.settings_store
+        self.settings_watcher = SettingsWatcher(
+            [store.path, store.log_path], self.reload_settings, config.settings_poll_interval
+        )
+        self.settings_watcher.start()
+    
+    @staticmethod
+    def reload_settings():
+        changed = config.reload_settings()
+        if changed:
+            keys = sorted(set().union(*changed.values()))
+            logger.info(f"🔄 Reloaded settings for {len(changed)} chats ({', '.join(keys)})")
+    
+    def save_state(self):
+        """Persist in-memory state that would otherwise be lost on restart"""
+        now = int(time.time())
+        self.db.save_state(f"flood_data/{self.state_scope}", self.handlers.moderation.export_flood_data(), now)
+        self.db.save_state(f"captcha/{self.state_scope}", self.handlers.welcome.export_captchas(self.application), now)
+    
+    def restore_state(self):
+        """Warm restore of the state saved by the previous run(s), limited to chats this process owns.
+        
+        Restored chats are removed from the saved state, so a later restart, or a
+        scope that no longer exists after scaling down, cannot apply them again.
+        """
+        since = int(time.time()) - config.state_max_age
+        with self.db.take_states('flood_data/', since, self.owns) as states:
+            for data in states:
+                self.handlers.moderation.restore_flood_data(data, self.owns)
+        with self.db.take_states('captcha/', since, self.owns) as states:
+            for data in states:
+                self.handlers.welcome.restore_captchas(self.application, data, self.owns)
+    
+    async def stop_gracefully(self, application: Application):
+        """Ordered shutdown once no new updates can arrive.
+        
+        Finishes updates already accepted (cancelling whatever is still running
+        after SHUTDOWN_TIMEOUT), stops the application and its jobs, closes the
+        update recording, flushes buffered analytics writes and saves in-memory state. Connections are
+        closed afterwards by leaving `async with application` and db.close().
+        """
+        deadline = time.monotonic() + config.shutdown_timeout
+        # Updates accepted but not yet picked up by the application
+        while not application.update_queue.empty() and time.monotonic() < deadline:
+            await asyncio.sleep(0.05)
+        cancelled = await application.update_processor.drain(max(0.0, deadline - time.monotonic()))
+        if cancelled:
+            logger.warning(f"⏱️ Cancelled {cancelled} updates still running after {config.shutdown_timeout}s")
+        
+        await application.stop()
+        if self.settings_watcher:
+            self.settings_watcher.stop()
+        if self.recorder:
+            self.recorder.close()
+        written = self.handlers.analytics.activity.flush() + config.flush_settings()
+        self.save_state()
+        logger.info(f"💾 Flushed {written} buffered rows and saved runtime state")
     
     def run(self):
         """Run the bot"""
         try:
             logger.info("🚀 Starting GROUP MEG 🇵🇸 Bot...")
             
-            # Create application
-            self.application = ApplicationBuilder() \
-                .token(config.token) \
-                .post_init(self.post_init) \
-                .build()
-            
-            # Set up handlers
-            self.setup_handlers()
+            self.build_application()
             
             # Start the bot
             if config.use_webhook and config.webhook_url:
                 logger.info("🌐 Starting in webhook mode...")
-                self.application.run_webhook(
-                    listen="0.0.0.0",
-                    port=config.port,
-                    secret_token=config.secret_token,
-                    webhook_url=f"{config.webhook_url}/{config.token}",
-                    drop_pending_updates=True
-                )
+                asyncio.run(self.serve_webhook())
             else:
                 logger.info("📡 Starting in polling mode...")
-                self.application.run_polling(
-                    drop_pending_updates=True,
-                    allowed_updates=["message", "callback_query"]
-                )
+                asyncio.run(self.serve_polling())
                 
         except Exception as e:
             logger.error(f"❌ Fatal error in run(): {e}")
             raise
 
+    @staticmethod
+    def stop_signal() -> asyncio.Event:
+        """Event set on SIGINT or SIGTERM"""
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, stop.set)
+        return stop
+
+    async def serve_polling(self):
+        application = self.application
+        stop = self.stop_signal()
+        
+        started = time.perf_counter()
+        async with application:
+            startup.record_phase('initialize', time.perf_counter() - started)
+            with startup.phase('start'):
+                await application.start()
+                await application.updater.start_polling(
+                    drop_pending_updates=True,
+                    allowed_updates=["message", "callback_query"]
+                )
+            with startup.phase('post_init'):
+                await self.post_init(application)
+            
+            await stop.wait()
+            logger.info("🛑 Stopping...")
+            await application.updater.stop()
+            await self.stop_gracefully(application)
+        
+        await self.post_shutdown(application)
+        self.db.close()
+
+    async def serve_webhook(self):
+        """Webhook, health checks and metrics on one tornado server in the bot's event loop"""
+        application = self.application
+        stop = self.stop_signal()
+        
+        started = time.perf_counter()
+        async with application:
+            startup.record_phase('initialize', time.perf_counter() - started)
+            with startup.phase('start'):
+                await application.start()
+                routes = monitoring_routes(lambda: application.running)
+                routes.append((r"/(.*)", ApplicationReceiver, {'bot_application': application}))
+                server = start_server(routes, config.port)
+            # The receiver is listening before Telegram is told where to send updates
+            with startup.phase('post_init'):
+                await self.post_init(application)
+            
+            await stop.wait()
+            logger.info("🛑 Stopping...")
+            server.stop()
+            await self.stop_gracefully(application)
+        
+        self.db.close()
+
 if __name__ == '__main__':
     try:
-        bot = GroupMegBot()
-        bot.run()
+        if config.workers > 1 and config.use_webhook and config.webhook_url:
+            from sharding import run_sharded
+            run_sharded(config.workers)
+        else:
+            if config.workers > 1:
+                logger.warning("⚠️ WORKERS > 1 requires webhook mode; running a single process")
+            bot = GroupMegBot()
+            bot.run()
     except Exception as e:
         logger.error(f"💥 Failed to start bot: {e}")
         sys.exit(1)
@@ -0,0 +1,194 @@
+import abc
+import bisect
+import contextvars
+import math
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+def format_value(value: float) -> str:
+    if value == math.inf:
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+def escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+def format_labels(names: Sequence[str], values: Sequence) -> str:
+    if not names:
+        return ''
+    return '{' + ','.join(f'{name}="{escape(value)}"' for name, value in zip(names, values)) + '}'
+
+class Metric(abc.ABC):
+    kind = 'untyped'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+
+    def key(self, labels: Dict[str, object]) -> Tuple:
+        return tuple(labels.get(name, '') for name in self.labelnames)
+
+    @abc.abstractmethod
+    def samples(self) -> List[str]:
+        """Exposition lines for every label combination"""
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self.samples())
+        return '\n'.join(lines)
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self.values: Dict[Tuple, float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = self.key(labels)
+        self.values[key] = self.values.get(key, 0) + amount
+
+    def get(self, **labels) -> float:
+        return self.values.get(self.key(labels), 0)
+
+    def set(self, value: float, **labels):
+        """Mirror a total that is counted elsewhere (e.g. functools cache statistics)"""
+        self.values[self.key(labels)] = value
+
+    def samples(self) -> List[str]:
+        return [
+            f"{self.name}{format_labels(self.labelnames, key)} {format_value(value)}"
+            for key, value in sorted(self.values.items())
+        ]
+
+class Gauge(Metric):
+    """Gauge set directly or read from a function at scrape time"""
+    kind = 'gauge'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self.values: Dict[Tuple, float] = {}
+        self.function: Optional[Callable[[], object]] = None
+
+    def set(self, value: float, **labels):
+        self.values[self.key(labels)] = value
+
+    def set_function(self, function: Callable[[], object]):
+        """function returns a number, or {label value tuple: number} for labelled gauges"""
+        self.function = function
+
+    def samples(self) -> List[str]:
+        values = self.values
+        if self.function is not None:
+            result = self.function()
+            values = result if isinstance(result, dict) else {(): result}
+        return [
+            f"{self.name}{format_labels(self.labelnames, key)} {format_value(value)}"
+            for key, value in sorted(values.items())
+        ]
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self.series: Dict[Tuple, list] = {}  # {labels: [bucket counts..., +Inf count, sum]}
+
+    def observe(self, value: float, **labels):
+        key = self.key(labels)
+        series = self.series.get(key)
+        if series is None:
+            series = self.series[key] = [0] * (len(self.buckets) + 1) + [0.0]
+        # Counts are stored per bucket and made cumulative when rendered
+        series[bisect.bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    @contextmanager
+    def time(self, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def samples(self) -> List[str]:
+        lines = []
+        names = self.labelnames + ('le',)
+        for key, series in sorted(self.series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), series):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{format_labels(names, key + (format_value(bound),))} {cumulative}")
+            labels = format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {format_value(series[-1])}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+class Registry:
+    def __init__(self):
+        self.metrics: Dict[str, Metric] = {}
+        self.collectors: List[Callable[[], None]] = []
+
+    def register(self, metric: Metric) -> Metric:
+        if metric.name in self.metrics:
+            raise ValueError(f"Metric {metric.name} already registered")
+        self.metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def add_collector(self, collector: Callable[[], None]):
+        """Register a function that refreshes metric values just before each scrape"""
+        self.collectors.append(collector)
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format"""
+        for collector in self.collectors:
+            collector()
+        return '\n'.join(metric.render() for metric in self.metrics.values()) + '\n'
+
+registry = Registry()
+
+UPDATES = registry.counter('bot_updates_total', 'Updates processed', ['type'])
+UPDATE_DURATION = registry.histogram('bot_update_duration_seconds', 'Time spent running handlers for one update')
+UPDATE_WAIT = registry.histogram('bot_update_queue_wait_seconds', 'Time an update waited behind its chat and the concurrency cap')
+ERRORS = registry.counter('bot_errors_total', 'Exceptions raised by handlers', ['error'])
+UPDATES_IN_FLIGHT = registry.gauge('bot_updates_in_flight', 'Updates queued or running')
+ACTIVE_CHATS = registry.gauge('bot_active_chats', 'Chats with at least one queued or running update')
+CHAT_QUEUE_DEPTH = registry.gauge('bot_chat_queue_depth_max', 'Deepest per-chat update queue right now')
+DB_COMMIT = registry.histogram('bot_db_commit_seconds', 'SQLite commit latency')
+CACHE_HITS = registry.counter('bot_cache_hits_total', 'Cache lookups that found an entry', ['cache'])
+CACHE_MISSES = registry.counter('bot_cache_misses_total', 'Cache lookups that missed', ['cache'])
+
+# Stage timings (db, api, render) of the handler call running in the current task, if any
+current_call: contextvars.ContextVar[Optional[Dict[str, float]]] = contextvars.ContextVar('current_call', default=None)
+
+def record_stage(name: str, seconds: float):
+    """Attribute time to a stage of the handler call in progress; no-op outside handlers"""
+    call = current_call.get()
+    if call is not None:
+        call[name] = call.get(name, 0.0) + seconds
+
+@contextmanager
+def stage(name: str):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(name, time.perf_counter() - started)
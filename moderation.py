@@ -1,11 +1,12 @@
 import re
 from datetime import datetime, timedelta
-from typing import List, Dict, Any
+from typing import Any, Dict, List, Set, Tuple
 from telegram import Update, ChatPermissions
 from telegram.ext import ContextTypes
 
 from config import config
 from database import Database
+from activity import ActivityTracker
 from utilities import is_admin, parse_time, format_time, get_bengali_text
 
 # Bad words list (can be customized per group)
@@ -14,10 +15,32 @@ DEFAULT_BAD_WORDS = [
     "spam", "scam", "hate", "violence"
 ]
 
+EMOJI_PATTERN = re.compile(r'[\U0001F600-\U0001F64F\U0001F300-\U0001F5FF\U0001F680-\U0001F6FF\U0001F700-\U0001F77F\U0001F780-\U0001F7FF\U0001F800-\U0001F8FF\U0001F900-\U0001F9FF\U0001FA00-\U0001FA6F\U0001FA70-\U0001FAFF\U00002702-\U000027B0\U000024C2-\U0001F251]')
+LINK_PATTERN = re.compile(r'https?://\S+')
+
+# More than FLOOD_LIMIT messages within FLOOD_WINDOW counts as flooding
+FLOOD_WINDOW = timedelta(seconds=10)
+FLOOD_LIMIT = 5
+
 class Moderation:
-    def __init__(self, db: Database):
+    def __init__(self, db: Database, activity: ActivityTracker = None):
         self.db = db
+        self.activity = activity
         self.flood_data = {}  # {chat_id: {user_id: [message_times]}}
+        self.word_lists: Dict[int, List[Tuple[str, str]]] = {}  # {chat_id: [(word, lowercased word)]}
+        config.on_settings_change(self.settings_changed)
+    
+    def settings_changed(self, chat_id: int, keys: Set[str]):
+        if 'bad_words' in keys:
+            self.word_lists.pop(chat_id, None)
+    
+    def bad_words(self, chat_id: int, settings: Dict[str, Any]) -> List[Tuple[str, str]]:
+        """The chat's bad word list, lowercased once rather than on every message"""
+        words = self.word_lists.get(chat_id)
+        if words is None:
+            words = [(word, word.lower()) for word in settings.get('bad_words', DEFAULT_BAD_WORDS)]
+            self.word_lists[chat_id] = words
+        return words
     
     async def check_flood(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> bool:
         """Check if user is flooding the chat"""
@@ -44,17 +67,41 @@ class Moderation:
         # Keep only messages from last 10 seconds
         self.flood_data[chat_id][user_id] = [
             t for t in self.flood_data[chat_id][user_id] 
-            if current_time - t < timedelta(seconds=10)
+            if current_time - t < FLOOD_WINDOW
         ]
         
         # Check if user has sent more than 5 messages in 10 seconds
-        if len(self.flood_data[chat_id][user_id]) > 5:
+        if len(self.flood_data[chat_id][user_id]) > FLOOD_LIMIT:
             # Mute user for 5 minutes
             await self.mute_user(update, context, "300", "Flooding chat")
             return True
         
         return False
     
+    def export_flood_data(self) -> Dict[str, Dict[str, List[float]]]:
+        """Message times still inside the flood window, as JSON-friendly timestamps"""
+        cutoff = datetime.now() - FLOOD_WINDOW
+        data = {}
+        for chat_id, users in self.flood_data.items():
+            recent = {str(user_id): [t.timestamp() for t in times if t > cutoff] for user_id, times in users.items()}
+            recent = {user_id: times for user_id, times in recent.items() if times}
+            if recent:
+                data[str(chat_id)] = recent
+        return data
+    
+    def restore_flood_data(self, data: Dict[str, Dict[str, List[float]]], owns=None):
+        """Merge message times saved by export_flood_data, dropping ones already outside the window"""
+        cutoff = datetime.now() - FLOOD_WINDOW
+        for chat_id, users in data.items():
+            chat_id = int(chat_id)
+            if owns and not owns(chat_id):
+                continue
+            for user_id, times in users.items():
+                times = [datetime.fromtimestamp(t) for t in times if datetime.fromtimestamp(t) > cutoff]
+                if times:
+                    chat = self.flood_data.setdefault(chat_id, {})
+                    chat[int(user_id)] = sorted(chat.get(int(user_id), []) + times)
+    
     async def check_spam(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> bool:
         """Check if message contains spam"""
         chat_id = update.effective_chat.id
@@ -69,17 +116,15 @@ class Moderation:
         # Check for bad words
         if message.text:
             text = message.text.lower()
-            bad_words = settings.get('bad_words', DEFAULT_BAD_WORDS)
-            
-            for word in bad_words:
-                if word.lower() in text:
+            for word, lowered in self.bad_words(chat_id, settings):
+                if lowered in text:
                     # Delete message and warn user
                     await message.delete()
                     await self.warn_user(update, context, f"Using inappropriate word: {word}")
                     return True
         
         # Check for excessive emojis
-        if message.text and len(re.findall(r'[\U0001F600-\U0001F64F\U0001F300-\U0001F5FF\U0001F680-\U0001F6FF\U0001F700-\U0001F77F\U0001F780-\U0001F7FF\U0001F800-\U0001F8FF\U0001F900-\U0001F9FF\U0001FA00-\U0001FA6F\U0001FA70-\U0001FAFF\U00002702-\U000027B0\U000024C2-\U0001F251]', message.text)) > 10:
+        if message.text and len(EMOJI_PATTERN.findall(message.text)) > 10:
             await message.delete()
             await self.warn_user(update, context, "Excessive emoji usage")
             return True
@@ -94,11 +139,11 @@ class Moderation:
         
         # Get group settings
         settings = config.get_chat_settings(chat_id)
-        if not settings.get('antilink', False) or is_admin(update, context):
+        if not settings.get('antilink', False):
             return False
         
-        # Check for URLs
-        if message.text and re.search(r'https?://\S+', message.text):
+        # Check for URLs; admins may post links, asked only once a message has one
+        if message.text and LINK_PATTERN.search(message.text) and not await is_admin(update, context):
             # Delete message and warn user
             await message.delete()
             await self.warn_user(update, context, "Posting external links")
@@ -118,6 +163,8 @@ class Moderation:
         
         # Add warning to database
         self.db.add_warning(target_user.id, chat_id, reason, admin_user.id)
+        if self.activity:
+            self.activity.record_warning(chat_id, target_user.id)
         
         # Get user's warning count
         warnings = self.db.get_warnings(target_user.id, chat_id)
@@ -142,6 +189,8 @@ class Moderation:
             
             # Reset warnings
             self.db.clear_warnings(target_user.id, chat_id)
+            if self.activity:
+                self.activity.clear_warnings(chat_id, target_user.id)
             
             await update.message.reply_text(
                 f"⚠️ {target_user.mention_html()} has been {action}ed for reaching the warning limit!"
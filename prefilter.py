@@ -0,0 +1,77 @@
+import logging
+from typing import Callable, Dict, Set
+
+from telegram import MessageEntity, Update
+from telegram.ext import ApplicationHandlerStop, ContextTypes
+
+from config import config
+from metrics import registry
+
+logger = logging.getLogger(__name__)
+
+# What an update needs, decided before any handler filter runs
+DROP = 'drop'    # nothing reads it: channel traffic, service messages no handler matches
+STATS = 'stats'  # a plain message in a chat with every protection off; count it and stop
+FULL = 'full'    # commands, callbacks, joins/leaves, albums and moderated chats go through dispatch
+
+# Settings that make handle_message do more than count the message
+PROTECTIONS = ('antiflood', 'antispam', 'antilink')
+
+PREFILTER_UPDATES = registry.counter('bot_prefilter_updates_total', 'Updates by pre-dispatch route', ['route'])
+
+class UpdateFilter:
+    """Routes each update in a TypeHandler ahead of all handler groups.
+
+    Routing a plain message depends only on its chat's protections, so the
+    decision is cached per chat and dropped when one of those settings
+    changes for that chat. Dropped and stats-only updates stop
+    dispatch with ApplicationHandlerStop; the rest continue untouched.
+    """
+
+    def __init__(self, count_message: Callable[[Update], None]):
+        self.count_message = count_message
+        self.routes: Dict[int, str] = {}  # {chat_id: STATS or FULL for plain messages}
+        config.on_settings_change(self.settings_changed)
+
+    def settings_changed(self, chat_id: int, keys: Set[str]):
+        if not keys.isdisjoint(PROTECTIONS):
+            self.routes.pop(chat_id, None)
+
+    def chat_route(self, chat_id: int) -> str:
+        route = self.routes.get(chat_id)
+        if route is None:
+            # Chats without stored settings get the defaults when moderation first sees them
+            settings = config.group_settings.get(str(chat_id), config.default_settings)
+            # A missing key means the default, as moderation reads it (antiflood and antispam on)
+            protected = any(settings.get(name, config.default_settings[name]) for name in PROTECTIONS)
+            route = FULL if protected else STATS
+            self.routes[chat_id] = route
+        return route
+
+    def route(self, update: Update) -> str:
+        if update.channel_post or update.edited_channel_post:
+            return DROP
+        message = update.message
+        if message is None:
+            return FULL
+        if message.chat.type == 'channel':
+            return DROP
+        if message.new_chat_members or message.left_chat_member:
+            return FULL
+        if message.text is None and message.effective_attachment is None:
+            return DROP
+        entities = message.entities
+        if entities and entities[0].type == MessageEntity.BOT_COMMAND and entities[0].offset == 0:
+            return FULL
+        if message.media_group_id:
+            return FULL
+        return self.chat_route(message.chat.id)
+
+    async def handle(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        route = self.route(update)
+        PREFILTER_UPDATES.inc(route=route)
+        if route == FULL:
+            return
+        if route == STATS:
+            self.count_message(update)
+        raise ApplicationHandlerStop
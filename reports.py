@@ -0,0 +1,130 @@
+import html
+from datetime import datetime, timedelta
+from io import BytesIO
+from typing import Dict
+
+import pandas as pd
+from telegram import Update
+from telegram.ext import ContextTypes
+
+from database import Database
+from metrics import stage
+from utilities import is_owner
+
+class GroupReports:
+    """Owner-level reports computed for every group at once"""
+
+    def __init__(self, db: Database):
+        self.db = db
+
+    def load_frames(self, start_date: str) -> Dict[str, pd.DataFrame]:
+        """Load statistics and moderation data since start_date as wide date × group frames"""
+        stats = pd.DataFrame.from_records(
+            self.db.get_all_statistics(start_date),
+            columns=['group_id', 'date', 'messages', 'joins', 'leaves']
+        )
+        actions = pd.DataFrame.from_records(
+            self.db.get_all_moderation_counts(start_date),
+            columns=['group_id', 'date', 'actions']
+        )
+
+        index = pd.date_range(start_date, datetime.now().strftime('%Y-%m-%d'), freq='D')
+        groups = pd.Index(stats['group_id'].unique()).union(actions['group_id'].unique())
+
+        # Rows are unique per (group, date), so one unstack per source builds every frame
+        frames = {}
+        for source, names in ((stats, ['messages', 'joins', 'leaves']), (actions, ['actions'])):
+            wide = (
+                source.assign(date=pd.to_datetime(source['date'], format='%Y-%m-%d'))
+                .set_index(['date', 'group_id'])[names]
+                .unstack('group_id', fill_value=0)
+            )
+            for name in names:
+                frame = wide[name] if len(wide) else pd.DataFrame()
+                frames[name] = frame.reindex(index=index, columns=groups, fill_value=0)
+        return frames
+
+    def compute(self, frames: Dict[str, pd.DataFrame], window: int = 7) -> pd.DataFrame:
+        """Per-group growth, churn and moderation metrics, vectorized across all groups"""
+        messages, joins, leaves, actions = frames['messages'], frames['joins'], frames['leaves'], frames['actions']
+
+        rolling = messages.rolling(window, min_periods=1).sum()
+        recent = rolling.iloc[-1]
+        if len(rolling) > window:
+            previous = rolling.iloc[-1 - window]
+            change = (100 * (recent - previous) / previous.where(previous > 0)).fillna(0).round(1)
+        else:
+            change = 0.0
+
+        total_messages = messages.sum()
+        total_joins = joins.sum()
+        total_leaves = leaves.sum()
+
+        report = pd.DataFrame({
+            'messages': total_messages,
+            'joins': total_joins,
+            'leaves': total_leaves,
+            'net_growth': total_joins - total_leaves,
+            'churn': (total_leaves / total_joins.where(total_joins > 0)).fillna(0).round(3),
+            'actions': actions.sum(),
+            'actions_per_1k': (1000 * actions.sum() / total_messages.where(total_messages > 0)).fillna(0).round(2),
+            f'messages_{window}d': recent,
+            'activity_change_pct': change,
+            'peak_week_messages': messages.resample('W').sum().max(),
+        })
+        report.index.name = 'group_id'
+        return report
+
+    def build_report(self, days: int = 30) -> pd.DataFrame:
+        start_date = (datetime.now() - timedelta(days=days - 1)).strftime('%Y-%m-%d')
+        return self.compute(self.load_frames(start_date))
+
+    async def owner_report(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Send a cross-group report to the bot owner"""
+        if not is_owner(update.effective_user.id):
+            await update.message.reply_text("❌ This command is only available for the bot owner.")
+            return
+
+        days = 30
+        if context.args:
+            try:
+                days = int(context.args[0])
+                if days < 1 or days > 365:
+                    await update.message.reply_text("❌ Please specify days between 1 and 365.")
+                    return
+            except ValueError:
+                await update.message.reply_text("❌ Please specify a valid number of days.")
+                return
+
+        report = self.build_report(days)
+        if report.empty:
+            await update.message.reply_text("📊 No group statistics recorded yet.")
+            return
+
+        titles = self.db.get_group_titles()
+
+        def label(group_id) -> str:
+            return html.escape(titles.get(group_id) or str(group_id))
+
+        message = f"📊 <b>Owner Report (Last {days} Days)</b>\n\n"
+        message += f"👥 <b>Groups:</b> {len(report)}\n"
+        message += f"💬 <b>Messages:</b> {int(report['messages'].sum())}\n"
+        message += f"👤 <b>Net Growth:</b> {int(report['net_growth'].sum())}\n\n"
+
+        message += "📈 <b>Fastest Growing:</b>\n"
+        for group_id, row in report.nlargest(5, 'net_growth').iterrows():
+            message += f"• {label(group_id)}: {int(row['net_growth']):+d}\n"
+
+        message += "\n🛡️ <b>Most Moderated (per 1k messages):</b>\n"
+        for group_id, row in report.nlargest(5, 'actions_per_1k').iterrows():
+            message += f"• {label(group_id)}: {row['actions_per_1k']}\n"
+
+        with stage('render'):
+            csv = BytesIO(report.to_csv().encode())
+        
+        await update.message.reply_text(message, parse_mode='HTML')
+        await update.message.reply_document(
+            document=csv,
+            filename=f"owner_report_{datetime.now().strftime('%Y%m%d')}.csv",
+            caption="📊 Full per-group report"
+        )
@@ -0,0 +1,288 @@
+import heapq
+import logging
+import re
+import time
+from datetime import datetime, timedelta
+from functools import lru_cache
+from typing import Callable, List, Optional, Tuple
+
+import pytz
+from apscheduler.triggers.cron import CronTrigger
+from telegram.error import RetryAfter, TelegramError
+from telegram.ext import ContextTypes, Job, JobQueue
+
+from database import Database
+from metrics import CACHE_HITS, CACHE_MISSES, registry
+from utilities import retry_after_seconds
+
+logger = logging.getLogger(__name__)
+
+MAX_ATTEMPTS = 3
+RETRY_DELAY = 60
+
+DAY_NAMES = {
+    'day': '*', 'weekday': 'mon-fri', 'weekend': 'sat,sun',
+    'monday': 'mon', 'tuesday': 'tue', 'wednesday': 'wed', 'thursday': 'thu',
+    'friday': 'fri', 'saturday': 'sat', 'sunday': 'sun',
+}
+# Standard cron numbers days from Sunday (0 or 7); APScheduler's from_crontab numbers them from
+# Monday, so numeric day-of-week fields are rewritten to names before they reach it
+WEEKDAY_NAMES = ['sun', 'mon', 'tue', 'wed', 'thu', 'fri', 'sat']
+EVERY_PATTERN = re.compile(r'^every\s+(\w+?)s?\s+at\s+(\d{1,2}):(\d{2})(?:\s+(\S+))?$', re.IGNORECASE)
+
+def weekday_number(value: str) -> int:
+    value = value.lower()
+    if value in WEEKDAY_NAMES:
+        return WEEKDAY_NAMES.index(value)
+    if value.isdigit() and int(value) <= 7:
+        return int(value) % 7
+    raise ValueError(f"Invalid day of week '{value}'")
+
+def normalize_weekdays(field: str) -> str:
+    """Rewrite a standard cron day-of-week field (numbers, names, ranges, steps, lists)
+    as '*' or a list of day names, which APScheduler reads the same way cron does"""
+    days = set()
+    for part in field.split(','):
+        if '/' in part:
+            part, step_text = part.split('/', 1)
+            if not step_text.isdigit() or int(step_text) == 0:
+                raise ValueError(f"Invalid step in day of week '{field}'")
+            step = int(step_text)
+        else:
+            step = 1
+        if part == '*':
+            first, last = 0, 6
+        elif '-' in part:
+            start, end = part.split('-', 1)
+            first, last = weekday_number(start), weekday_number(end)
+            # 0-7 and 1-7 run through Sunday written as 7
+            if last == 0 and end.strip() == '7':
+                last = 7
+            if last < first:
+                raise ValueError(f"Invalid day range '{part}'")
+        else:
+            first = weekday_number(part)
+            last = 6 if step > 1 else first
+        days.update(day % 7 for day in range(first, last + 1, step))
+    if len(days) == 7:
+        return '*'
+    return ','.join(WEEKDAY_NAMES[day] for day in sorted(days))
+
+def normalize_cron(cron: str) -> str:
+    fields = cron.split()
+    if len(fields) != 5:
+        raise ValueError("Expected a 5-field cron expression")
+    fields[4] = normalize_weekdays(fields[4])
+    return ' '.join(fields)
+
+@lru_cache(maxsize=1024)
+def get_trigger(recurrence: str, timezone: str) -> CronTrigger:
+    # Posts stored before day-of-week normalization may still hold numeric days
+    return CronTrigger.from_crontab(normalize_cron(recurrence), timezone=pytz.timezone(timezone))
+
+def collect_trigger_cache():
+    info = get_trigger.cache_info()
+    CACHE_HITS.set(info.hits, cache='cron_trigger')
+    CACHE_MISSES.set(info.misses, cache='cron_trigger')
+
+registry.add_collector(collect_trigger_cache)
+
+def parse_recurrence(text: str, default_timezone: str = 'UTC') -> Tuple[str, str]:
+    """Parse 'every day at 09:00 Asia/Dhaka' or a 5-field cron expression (optionally
+    followed by a timezone) into (cron, timezone). Raises ValueError if invalid."""
+    text = ' '.join(text.split())
+    timezone = default_timezone
+
+    match = EVERY_PATTERN.match(text)
+    if match:
+        day, hour, minute, tz_name = match.groups()
+        if day.lower() not in DAY_NAMES:
+            raise ValueError(f"Unknown day '{day}'")
+        if int(hour) > 23 or int(minute) > 59:
+            raise ValueError("Invalid time of day")
+        # Stored in the same normalized form as cron input, so normalize_stored never rewrites it
+        cron = normalize_cron(f"{int(minute)} {int(hour)} * * {DAY_NAMES[day.lower()]}")
+    else:
+        fields = text.split(' ')
+        if len(fields) not in (5, 6):
+            raise ValueError("Expected 'every day at HH:MM [timezone]' or a 5-field cron expression")
+        cron = normalize_cron(' '.join(fields[:5]))
+        tz_name = fields[5] if len(fields) == 6 else None
+
+    if tz_name:
+        timezone = tz_name
+    try:
+        get_trigger(cron, timezone)
+    except pytz.UnknownTimeZoneError:
+        raise ValueError(f"Unknown timezone '{timezone}'")
+
+    return cron, timezone
+
+def next_fire_time(recurrence: str, timezone: str, after: float) -> int:
+    """Unix time of the first occurrence strictly after the given unix time"""
+    start = datetime.fromtimestamp(after, pytz.utc) + timedelta(seconds=1)
+    return int(get_trigger(recurrence, timezone).get_next_fire_time(None, start).timestamp())
+
+class PostScheduler:
+    """Persistent scheduled posts driven by a min-heap and a single timer job.
+
+    Only (due_at, post_id) pairs live in memory; the post itself stays in the
+    database until it is due. Delivery is at-least-once: a post is marked as
+    sending before the API call and only marked sent afterwards, so a crash in
+    between resends it on the next start.
+
+    Recurring posts store a cron expression and timezone. Only their next
+    occurrence is ever queued; the one after is computed when it fires.
+    """
+
+    def __init__(self, db: Database):
+        self.db = db
+        self.heap: List[Tuple[int, int]] = []  # [(due_at, post_id)]
+        self.job_queue: Optional[JobQueue] = None
+        self.timer: Optional[Job] = None
+        self.timer_due: Optional[int] = None
+
+    def start(self, job_queue: JobQueue, owns: Optional[Callable[[int], bool]] = None):
+        """Load undelivered posts from the database and arm the timer.
+
+        With owns(chat_id), only posts created in chats this process handles are loaded.
+        """
+        self.job_queue = job_queue
+        self.normalize_stored()
+        self.heap = [
+            (due_at, post_id) for due_at, post_id, chat_id in self.db.get_pending_posts()
+            if owns is None or owns(chat_id)
+        ]
+        heapq.heapify(self.heap)
+        logger.info(f"📅 Loaded {len(self.heap)} scheduled posts")
+        self._arm()
+
+    def normalize_stored(self):
+        """Rewrite numeric weekdays in recurring posts stored before they were normalized,
+        and move each one to the occurrence its expression really means"""
+        for post_id, recurrence, timezone in self.db.get_recurring_posts():
+            try:
+                normalized = normalize_cron(recurrence)
+            except ValueError as e:
+                logger.error(f"❌ Scheduled post {post_id} has an invalid recurrence '{recurrence}': {e}")
+                continue
+            if normalized != recurrence:
+                self.db.update_post_recurrence(post_id, normalized, next_fire_time(normalized, timezone, time.time()))
+                logger.info(f"📅 Scheduled post {post_id}: recurrence '{recurrence}' is now '{normalized}'")
+
+    def schedule(self, channel_id: str, message: str, due_at: int, chat_id: int, created_by: int, key: str) -> Tuple[int, bool]:
+        """Store a post and queue it; returns (post_id, created).
+
+        The idempotency key makes a redelivered /schedule update return the
+        existing post instead of creating a duplicate.
+        """
+        post_id, created = self.db.add_scheduled_post(channel_id, message, due_at, chat_id, created_by, key)
+        if created:
+            self.push(due_at, post_id)
+        return post_id, created
+
+    def schedule_recurring(self, channel_id: str, message: str, recurrence: str, timezone: str,
+                           chat_id: int, created_by: int, key: str) -> Tuple[int, bool, int]:
+        """Store a recurring post and queue its first occurrence; returns (post_id, created, due_at)"""
+        due_at = next_fire_time(recurrence, timezone, time.time())
+        post_id, created = self.db.add_scheduled_post(
+            channel_id, message, due_at, chat_id, created_by, key, recurrence=recurrence, timezone=timezone
+        )
+        if created:
+            self.push(due_at, post_id)
+        return post_id, created, due_at
+
+    def push(self, due_at: int, post_id: int):
+        heapq.heappush(self.heap, (due_at, post_id))
+        if self.timer_due is None or due_at < self.timer_due:
+            self._arm()
+
+    def cancel(self, post_id: int, chat_id: int) -> bool:
+        """Cancel a pending post; its heap entry is skipped when it comes due"""
+        return self.db.cancel_scheduled_post(post_id, chat_id)
+
+    def _arm(self):
+        """Point the single timer at the earliest due post"""
+        if self.job_queue is None:
+            return
+        if self.timer:
+            self.timer.schedule_removal()
+            self.timer = None
+            self.timer_due = None
+        if not self.heap:
+            return
+
+        due_at = self.heap[0][0]
+        self.timer = self.job_queue.run_once(self._fire, when=max(0, due_at - time.time()), name='scheduled_posts')
+        self.timer_due = due_at
+
+    async def _fire(self, context: ContextTypes.DEFAULT_TYPE):
+        """Send every post that is due, then re-arm for the next one"""
+        self.timer = None
+        self.timer_due = None
+
+        try:
+            now = time.time()
+            while self.heap and self.heap[0][0] <= now:
+                _, post_id = heapq.heappop(self.heap)
+                try:
+                    post = self.db.get_scheduled_post(post_id)
+                    if not post or post['status'] not in ('pending', 'sending'):
+                        continue
+                    await self.deliver(context, post)
+                except Exception as e:
+                    # A database or timezone error must not lose the popped post or stop the timer
+                    logger.error(f"❌ Error delivering scheduled post {post_id}: {e}")
+                    self.recover(post_id, e)
+        finally:
+            self._arm()
+
+    async def deliver(self, context: ContextTypes.DEFAULT_TYPE, post: dict):
+        post_id = post['id']
+        attempts = self.db.mark_scheduled_post(post_id, 'sending')
+
+        try:
+            await context.bot.send_message(chat_id=post['channel_id'], text=post['message'])
+        except RetryAfter as e:
+            self.retry(post_id, int(time.time() + retry_after_seconds(e)) + 1)
+            return
+        except TelegramError as e:
+            logger.error(f"❌ Error sending scheduled post {post_id}: {e}")
+            if attempts < MAX_ATTEMPTS:
+                self.retry(post_id, int(time.time()) + RETRY_DELAY * attempts)
+            elif post['recurrence']:
+                # Give up on this occurrence only
+                self.advance(post)
+            else:
+                self.db.mark_scheduled_post(post_id, 'failed', str(e))
+            return
+
+        if post['recurrence']:
+            self.advance(post)
+        else:
+            self.db.mark_scheduled_post(post_id, 'sent')
+
+    def advance(self, post: dict):
+        """Queue the next occurrence of a recurring post; missed occurrences are skipped"""
+        due_at = next_fire_time(post['recurrence'], post['timezone'], max(time.time(), post['due_at']))
+        self.db.reschedule_post(post['id'], due_at)
+        heapq.heappush(self.heap, (due_at, post['id']))
+
+    def retry(self, post_id: int, due_at: int):
+        self.db.mark_scheduled_post(post_id, 'pending', due_at=due_at)
+        heapq.heappush(self.heap, (due_at, post_id))
+
+    def recover(self, post_id: int, error: Exception):
+        """Retry a post whose delivery failed outside the API call, or fail it after MAX_ATTEMPTS"""
+        due_at = int(time.time()) + RETRY_DELAY
+        try:
+            post = self.db.get_scheduled_post(post_id)
+            if post and post['attempts'] >= MAX_ATTEMPTS:
+                self.db.mark_scheduled_post(post_id, 'failed', str(error))
+            else:
+                self.retry(post_id, due_at)
+        except Exception as e:
+            # The database itself is failing; keep the post queued in memory, it is still
+            # pending or sending in the database and reloaded on the next start
+            logger.error(f"❌ Could not reschedule post {post_id}: {e}")
+            heapq.heappush(self.heap, (due_at, post_id))
@@ -0,0 +1,277 @@
+import asyncio
+import atexit
+import ctypes
+import ctypes.util
+import fcntl
+import json
+import logging
+import os
+import struct
+import threading
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# inotify(7) event header and the masks that mean a watched file got new contents.
+# Not IN_CLOSE_WRITE: locking the log opens it for appending, which would wake the watcher itself.
+INOTIFY_EVENT = struct.Struct('iIII')
+IN_MODIFY = 0x2
+IN_MOVED_TO = 0x80
+IN_CREATE = 0x100
+
+class SettingsStore:
+    """Group settings as a JSON snapshot plus an append-only log of changed chats.
+
+    save() only encodes the chat's settings; a background timer appends
+    everything saved within `delay` seconds to the log in one write, so a
+    burst of toggles costs one small append instead of rewriting every
+    group. Once the log passes compact_bytes it is folded into the snapshot
+    through a temp file and rename, so a crash leaves either the old or the
+    new snapshot, and at worst a torn last log line that is skipped on load.
+
+    All file access holds an flock on the log, so worker processes sharing
+    the files never lose each other's changes during compaction.
+    """
+
+    def __init__(self, path: str, delay: float = 1.0, compact_bytes: int = 256 * 1024):
+        self.path = path
+        self.log_path = os.path.splitext(path)[0] + '.log'
+        self.delay = delay
+        self.compact_bytes = compact_bytes
+        self.pending: Dict[str, str] = {}  # {chat_id: encoded log line}
+        self.lock = threading.Lock()
+        self.flushing = threading.Lock()  # keeps two flushes from appending one chat's changes out of order
+        self.timer: Optional[threading.Timer] = None
+        # What the last read saw, so changes() can read only what was appended since
+        self.snapshot: Optional[Tuple[int, int, int]] = None
+        self.offset = 0
+        atexit.register(self.flush)
+
+    @contextmanager
+    def locked(self):
+        with open(self.log_path, 'a+', encoding='utf-8') as log:
+            fcntl.flock(log, fcntl.LOCK_EX)
+            try:
+                yield log
+            finally:
+                fcntl.flock(log, fcntl.LOCK_UN)
+
+    def stamp(self) -> Optional[Tuple[int, int, int]]:
+        """Identity of the snapshot file, to tell whether it was replaced since the last read"""
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+    def read_log(self, offset: int = 0) -> Dict[str, Dict[str, Any]]:
+        """Log entries from offset on, last one per chat winning; the caller holds the lock"""
+        entries = {}
+        with open(self.log_path, 'rb') as f:
+            f.seek(offset)
+            for line in f:
+                if not line.strip():
+                    continue
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    # Torn line from a crash mid-append
+                    continue
+                entries[entry['chat_id']] = entry['settings']
+        return entries
+
+    def read(self) -> Dict[str, Dict[str, Any]]:
+        """The snapshot with the log replayed over it; the caller holds the lock"""
+        settings = {}
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                settings = json.load(f)
+        except FileNotFoundError:
+            pass
+        except json.JSONDecodeError as e:
+            logger.error(f"❌ Settings snapshot {self.path} is unreadable, using the change log only: {e}")
+
+        settings.update(self.read_log())
+        return settings
+
+    def load(self) -> Dict[str, Dict[str, Any]]:
+        # Changes still queued here would otherwise be overwritten in memory by older ones on disk
+        self.flush()
+        with self.locked() as log:
+            self.snapshot, self.offset = self.stamp(), log.tell()
+            settings = self.read()
+            if log.tell() > self.compact_bytes:
+                self.compact(log, settings)
+                self.snapshot, self.offset = self.stamp(), 0
+        return settings
+
+    def changes(self) -> Tuple[Dict[str, Dict[str, Any]], bool]:
+        """Settings written since the last load() or changes(), as (settings by chat, complete).
+
+        Normally only the log lines appended since then are read. After the
+        snapshot was replaced (compaction, a manual edit) the whole state is
+        returned with complete=True, so callers can also notice removed chats.
+        """
+        self.flush()
+        with self.locked() as log:
+            stamp, end = self.stamp(), log.tell()
+            if stamp != self.snapshot or end < self.offset:
+                changed, complete = self.read(), True
+            else:
+                changed, complete = self.read_log(self.offset), False
+            self.snapshot, self.offset = stamp, end
+        return changed, complete
+
+    def save(self, chat_id: str, settings: Dict[str, Any]):
+        """Queue one chat's settings for the next background append"""
+        line = json.dumps({'chat_id': chat_id, 'settings': settings}, ensure_ascii=False)
+        with self.lock:
+            self.pending[chat_id] = line
+            if self.timer is None:
+                self.timer = threading.Timer(self.delay, self.flush)
+                self.timer.daemon = True
+                self.timer.start()
+
+    def flush(self) -> int:
+        """Append queued changes now; returns how many chats were written"""
+        with self.flushing:
+            with self.lock:
+                pending, self.pending = self.pending, {}
+                if self.timer is not None:
+                    self.timer.cancel()
+                    self.timer = None
+            if not pending:
+                return 0
+
+            try:
+                with self.locked() as log:
+                    end = log.tell()
+                    # Start on a fresh line if the last append was torn by a crash
+                    torn = end > 0 and os.pread(log.fileno(), 1, end - 1) != b'\n'
+                    log.write(('\n' if torn else '') + ''.join(line + '\n' for line in pending.values()))
+                    log.flush()
+                    os.fsync(log.fileno())
+                    if log.tell() > self.compact_bytes:
+                        self.compact(log, self.read())
+            except OSError as e:
+                logger.error(f"❌ Could not save settings for {len(pending)} chats: {e}")
+                with self.lock:
+                    for chat_id, line in pending.items():
+                        self.pending.setdefault(chat_id, line)
+                return 0
+            return len(pending)
+
+    def compact(self, log, settings: Dict[str, Dict[str, Any]]):
+        """Write settings as the new snapshot and empty the log; the caller holds the lock on log"""
+        temp = f"{self.path}.{os.getpid()}.tmp"
+        with open(temp, 'w', encoding='utf-8') as f:
+            json.dump(settings, f, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp, self.path)
+        log.truncate(0)
+        logger.info(f"🗜️ Compacted settings for {len(settings)} chats into {self.path}")
+
+class SettingsWatcher:
+    """Calls on_change shortly after any of the watched files changes.
+
+    Uses inotify on the files' directories when libc provides it and polls
+    the files' mtime and size every poll_interval seconds otherwise. Events
+    within `debounce` seconds of each other cause one call, so an append and
+    the compaction right behind it are handled together.
+    """
+
+    def __init__(self, paths: Iterable[str], on_change: Callable[[], None],
+                 poll_interval: float = 2.0, debounce: float = 0.2):
+        self.paths = [os.path.abspath(path) for path in paths]
+        self.on_change = on_change
+        self.poll_interval = poll_interval
+        self.debounce = debounce
+        self.fd: Optional[int] = None
+        self.poller: Optional[asyncio.Task] = None
+        self.pending: Optional[asyncio.TimerHandle] = None
+
+    def start(self):
+        """Start watching; must be called from the running event loop"""
+        loop = asyncio.get_running_loop()
+        try:
+            self.fd = self.inotify()
+            loop.add_reader(self.fd, self.readable)
+            logger.info(f"👀 Watching {', '.join(self.paths)} with inotify")
+        except OSError as e:
+            logger.info(f"👀 Polling {', '.join(self.paths)} every {self.poll_interval}s ({e})")
+            self.poller = loop.create_task(self.poll())
+
+    def stop(self):
+        if self.fd is not None:
+            asyncio.get_running_loop().remove_reader(self.fd)
+            os.close(self.fd)
+            self.fd = None
+        if self.poller is not None:
+            self.poller.cancel()
+            self.poller = None
+        if self.pending is not None:
+            self.pending.cancel()
+            self.pending = None
+
+    def inotify(self) -> int:
+        name = ctypes.util.find_library('c')
+        libc = ctypes.CDLL(name, use_errno=True) if name else None
+        if libc is None or not hasattr(libc, 'inotify_init1'):
+            raise OSError('inotify is not available')
+        fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1 failed')
+        mask = IN_MODIFY | IN_MOVED_TO | IN_CREATE
+        for directory in {os.path.dirname(path) for path in self.paths}:
+            if libc.inotify_add_watch(fd, directory.encode(), mask) < 0:
+                error = ctypes.get_errno()
+                os.close(fd)
+                raise OSError(error, f"cannot watch {directory}")
+        return fd
+
+    def readable(self):
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return
+        names = {os.path.basename(path) for path in self.paths}
+        offset = 0
+        while offset + INOTIFY_EVENT.size <= len(data):
+            _, _, _, length = INOTIFY_EVENT.unpack_from(data, offset)
+            name = data[offset + INOTIFY_EVENT.size:offset + INOTIFY_EVENT.size + length].rstrip(b'\0').decode()
+            offset += INOTIFY_EVENT.size + length
+            if name in names:
+                self.changed()
+                return
+
+    async def poll(self):
+        stamps = self.stamps()
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            current = self.stamps()
+            if current != stamps:
+                stamps = current
+                self.changed()
+
+    def stamps(self) -> Tuple:
+        result = []
+        for path in self.paths:
+            try:
+                stat = os.stat(path)
+                result.append((stat.st_ino, stat.st_mtime_ns, stat.st_size))
+            except FileNotFoundError:
+                result.append(None)
+        return tuple(result)
+
+    def changed(self):
+        if self.pending is None:
+            self.pending = asyncio.get_running_loop().call_later(self.debounce, self.fire)
+
+    def fire(self):
+        self.pending = None
+        try:
+            self.on_change()
+        except Exception as e:
+            logger.error(f"❌ Error reloading settings: {e}")
@@ -0,0 +1,179 @@
+import asyncio
+import bisect
+import hashlib
+import json
+import logging
+import multiprocessing
+import queue
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import tornado.ioloop
+from telegram import Bot, Update
+
+from config import config
+from logs import setup_logging
+from metrics import registry
+from webserver import UpdateReceiver, monitoring_routes, start_server
+
+logger = logging.getLogger(__name__)
+
+SHARD_QUEUE_DEPTH = registry.gauge('bot_shard_queue_depth', 'Updates waiting in each worker queue', ['worker'])
+SHARD_DISPATCHED = registry.counter('bot_shard_dispatched_total', 'Updates handed to each worker', ['worker'])
+SHARD_REJECTED = registry.counter('bot_shard_rejected_total', 'Updates refused because a worker queue was full', ['worker'])
+
+class HashRing:
+    """Consistent hash ring mapping chat IDs to worker indexes.
+
+    Each worker owns `replicas` points on the ring, so changing the worker
+    count only moves about 1/N of the chats to a different worker.
+    """
+
+    def __init__(self, workers: int, replicas: int = 160):
+        points = sorted(
+            (self.hash(f"worker-{worker}:{replica}"), worker)
+            for worker in range(workers)
+            for replica in range(replicas)
+        )
+        self.keys = [point for point, _ in points]
+        self.workers = [worker for _, worker in points]
+
+    @staticmethod
+    def hash(value) -> int:
+        return int.from_bytes(hashlib.blake2b(str(value).encode(), digest_size=8).digest(), 'big')
+
+    def worker_for(self, key) -> int:
+        index = bisect.bisect(self.keys, self.hash(key)) % len(self.keys)
+        return self.workers[index]
+
+def update_chat_id(data: Dict[str, Any]) -> Optional[int]:
+    """Chat ID of a raw update, falling back to the sender for chatless updates"""
+    for value in data.values():
+        if not isinstance(value, dict):
+            continue
+        if 'chat' in value:
+            return value['chat']['id']
+        if isinstance(value.get('message'), dict) and 'chat' in value['message']:
+            return value['message']['chat']['id']
+        if 'from' in value:
+            return value['from']['id']
+    return None
+
+class ShardRouter:
+    """Sends raw updates to per-worker queues by consistent hash of their chat"""
+
+    def __init__(self, queues: List[multiprocessing.Queue]):
+        self.queues = queues
+        self.ring = HashRing(len(queues))
+
+    def dispatch(self, body: bytes) -> bool:
+        """Queue an update for its worker; False if that worker is backed up"""
+        data = json.loads(body)
+        chat_id = update_chat_id(data)
+        key = chat_id if chat_id is not None else data.get('update_id', 0)
+        worker = self.ring.worker_for(key)
+        try:
+            self.queues[worker].put_nowait(body)
+        except queue.Full:
+            SHARD_REJECTED.inc(worker=worker)
+            return False
+        SHARD_DISPATCHED.inc(worker=worker)
+        return True
+
+    def queue_depths(self) -> Dict[tuple, int]:
+        return {(str(worker),): updates.qsize() for worker, updates in enumerate(self.queues)}
+
+class ShardReceiver(UpdateReceiver):
+    """Thin webhook endpoint that hands each verified update to its worker"""
+
+    def initialize(self, router: ShardRouter):
+        self.router = router
+
+    async def accept(self, body: bytes) -> bool:
+        return self.router.dispatch(body)
+
+def run_worker(index: int, workers: int, updates: multiprocessing.Queue, bot_factory: Callable[[], Bot] = None):
+    """Entry point of a worker process: the full handler stack fed from a queue"""
+    # Its own bot.worker<N>.log, so workers never rotate the parent's file or each other's
+    setup_logging(config.log_level, config.log_file, config.log_max_bytes, config.log_backups, config.log_json, worker=index)
+    asyncio.run(serve_worker(index, workers, updates, bot_factory))
+
+async def serve_worker(index: int, workers: int, updates: multiprocessing.Queue, bot_factory: Callable[[], Bot] = None):
+    from main import GroupMegBot
+
+    ring = HashRing(workers)
+    gm_bot = GroupMegBot(state_scope=f"worker-{index}")
+    application = gm_bot.build_application(
+        bot=bot_factory() if bot_factory else None,
+        owns=lambda chat_id: ring.worker_for(chat_id) == index
+    )
+
+    loop = asyncio.get_running_loop()
+    async with application:
+        if index == 0:
+            await gm_bot.set_commands(application.bot)
+        await application.start()
+        logger.info(f"👷 Worker {index} ready")
+
+        while True:
+            body = await loop.run_in_executor(None, updates.get)
+            if body is None:
+                break
+            await application.update_queue.put(Update.de_json(json.loads(body), application.bot))
+
+        await gm_bot.stop_gracefully(application)
+
+    gm_bot.db.close()
+    logger.info(f"👷 Worker {index} stopped")
+
+def start_workers(workers: int, bot_factory: Callable[[], Bot] = None) -> Tuple[List[multiprocessing.Process], List[multiprocessing.Queue]]:
+    context = multiprocessing.get_context('spawn')
+    queues = [context.Queue(maxsize=config.max_pending_updates) for _ in range(workers)]
+    processes = [
+        context.Process(target=run_worker, args=(index, workers, queues[index], bot_factory), name=f"worker-{index}")
+        for index in range(workers)
+    ]
+    for process in processes:
+        process.start()
+    return processes, queues
+
+def stop_workers(processes: List[multiprocessing.Process], queues: List[multiprocessing.Queue], timeout: float = 30):
+    for updates in queues:
+        updates.put(None)
+    for process in processes:
+        process.join(timeout)
+
+def run_sharded(workers: int):
+    """Run a webhook receiver in this process and the bot in `workers` child processes"""
+    logger.info(f"🚀 Starting GROUP MEG 🇵🇸 Bot with {workers} workers...")
+    processes, queues = start_workers(workers)
+    router = ShardRouter(queues)
+    SHARD_QUEUE_DEPTH.set_function(router.queue_depths)
+
+    def watch_workers():
+        # A dead worker would silently drop its shard; restart it on the same queue
+        context = multiprocessing.get_context('spawn')
+        for index, process in enumerate(processes):
+            if not process.is_alive():
+                logger.error(f"❌ Worker {index} exited with code {process.exitcode}; restarting")
+                processes[index] = context.Process(
+                    target=run_worker, args=(index, workers, queues[index]), name=f"worker-{index}"
+                )
+                processes[index].start()
+
+    async def serve():
+        from main import GroupMegBot
+
+        ready = lambda: all(process.is_alive() for process in processes)
+        start_server(monitoring_routes(ready) + [(r"/(.*)", ShardReceiver, {'router': router})], config.port)
+        tornado.ioloop.PeriodicCallback(watch_workers, 5000).start()
+
+        async with Bot(config.token) as bot:
+            await GroupMegBot.set_webhook(bot)
+        await asyncio.Event().wait()
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stop_workers(processes, queues)
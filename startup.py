@@ -0,0 +1,69 @@
+import cProfile
+import importlib
+import io
+import logging
+import pstats
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterable, Optional
+
+from metrics import registry
+
+logger = logging.getLogger(__name__)
+
+# Taken when this module is first imported, which main does before anything heavy
+STARTED = time.perf_counter()
+
+STARTUP_PHASE = registry.gauge('bot_startup_phase_seconds', 'Time spent in each startup phase', ['phase'])
+TIME_TO_FIRST_UPDATE = registry.gauge('bot_time_to_first_update_seconds', 'Process start to the first handled update')
+
+phases: Dict[str, float] = {}
+first_update: Optional[float] = None
+profiler: Optional[cProfile.Profile] = None
+
+@contextmanager
+def phase(name: str):
+    """Time one startup phase; the durations are logged and exported as metrics"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_phase(name, time.perf_counter() - started)
+
+def record_phase(name: str, seconds: float):
+    phases[name] = phases.get(name, 0.0) + seconds
+    STARTUP_PHASE.set(phases[name], phase=name)
+    logger.info(f"⏱️ Startup phase {name}: {seconds * 1000:.0f}ms")
+
+def since_start() -> float:
+    return time.perf_counter() - STARTED
+
+def update_handled():
+    """Called after every processed update; records the first one"""
+    global first_update
+    if first_update is None:
+        first_update = since_start()
+        TIME_TO_FIRST_UPDATE.set(first_update)
+        summary = ', '.join(f"{name} {seconds * 1000:.0f}ms" for name, seconds in phases.items())
+        logger.info(f"🚀 First update handled {first_update:.2f}s after start ({summary})")
+
+def start_profiler():
+    global profiler
+    profiler = cProfile.Profile()
+    profiler.enable()
+
+def stop_profiler(path: str, limit: int = 30):
+    """Dump the startup profile to path (for snakeviz/pstats) and log the top entries"""
+    global profiler
+    if profiler is None:
+        return
+    profiler.disable()
+    profiler.dump_stats(path)
+    output = io.StringIO()
+    pstats.Stats(profiler, stream=output).sort_stats('cumulative').print_stats(limit)
+    logger.info(f"🔬 Startup profile written to {path}\n{output.getvalue()}")
+    profiler = None
+
+def preload(modules: Iterable[str]):
+    for name in modules:
+        importlib.import_module(name)
@@ -0,0 +1,109 @@
+import logging
+from string import Formatter
+from typing import Any, Dict, FrozenSet, Optional, Set, Tuple
+
+from config import config
+from i18n import DEFAULT_LANGUAGE, message
+from metrics import CACHE_HITS, CACHE_MISSES, registry
+
+logger = logging.getLogger(__name__)
+
+# Placeholders each kind of template may use
+SLOTS: Dict[str, FrozenSet[str]] = {
+    'welcome': frozenset({'user_name', 'chat_title', 'user_id'}),
+    'goodbye': frozenset({'user_name', 'chat_title', 'user_id'}),
+}
+# Group setting holding each chat's own text; the catalog key has the same name as the kind
+SETTINGS = {'welcome': 'welcome_message', 'goodbye': 'goodbye_message', 'rules': 'rules'}
+
+class TemplateError(ValueError):
+    """A template that cannot be compiled; the message is meant for the admin who set it"""
+
+class Template:
+    """Validated template text, rebuilt with only known slots so filling it cannot raise"""
+    __slots__ = ('fill',)
+
+    def __init__(self, parts: Tuple[Tuple[str, Optional[str]], ...]):
+        text = ''.join(
+            literal.replace('{', '{{').replace('}', '}}') + (f"{{{slot}}}" if slot else '')
+            for literal, slot in parts
+        )
+        self.fill = text.format_map
+
+    def render(self, values: Dict[str, str]) -> str:
+        return self.fill(values)
+
+def compile_template(source: str, slots: FrozenSet[str]) -> Template:
+    """Parse str.format style text; raises TemplateError for unbalanced braces or unknown placeholders"""
+    try:
+        parsed = list(Formatter().parse(source))
+    except ValueError as e:
+        raise TemplateError(f"{e}; write {{{{ or }}}} for a literal brace")
+
+    parts = []
+    for literal, field, spec, conversion in parsed:
+        if field is None:
+            parts.append((literal, None))
+            continue
+        if field not in slots:
+            allowed = ', '.join(f"{{{slot}}}" for slot in sorted(slots))
+            raise TemplateError(f"unknown placeholder {{{field}}}; use {allowed}")
+        if spec or conversion:
+            raise TemplateError(f"placeholder {{{field}}} cannot have a format or conversion")
+        parts.append((literal, field))
+    return Template(tuple(parts))
+
+def chat_text(settings: Dict[str, Any], kind: str) -> str:
+    """The chat's own text for kind, or the catalog text in its language while it keeps the default"""
+    setting = SETTINGS[kind]
+    text = settings.get(setting)
+    if not text or text == config.default_settings[setting]:
+        return message(kind, settings.get('language') or DEFAULT_LANGUAGE)
+    return text
+
+class TemplateCache:
+    """Compiled welcome/goodbye templates per chat, kind and language.
+
+    Each entry keeps the text it was compiled from and is rebuilt when that
+    text changes; entries for a chat are also dropped when its messages or
+    language change in the settings. A stored template that does not compile
+    falls back to the catalog text, logged once instead of failing every join.
+    """
+
+    def __init__(self):
+        self.entries: Dict[int, Dict[Tuple[str, str], Tuple[Optional[str], Template]]] = {}
+        self.hits = 0
+        self.misses = 0
+        config.on_settings_change(self.settings_changed)
+        registry.add_collector(self.collect)
+
+    def collect(self):
+        CACHE_HITS.set(self.hits, cache='template')
+        CACHE_MISSES.set(self.misses, cache='template')
+
+    def settings_changed(self, chat_id: int, keys: Set[str]):
+        if 'language' in keys or 'welcome_message' in keys or 'goodbye_message' in keys:
+            self.entries.pop(chat_id, None)
+
+    def get(self, chat_id: int, kind: str, settings: Dict[str, Any]) -> Template:
+        # Keyed on the stored text rather than the resolved one: with the language
+        # in the key, the same stored text always resolves to the same template
+        stored = settings.get(SETTINGS[kind])
+        language = settings.get('language') or DEFAULT_LANGUAGE
+        chat = self.entries.get(chat_id)
+        entry = chat.get((kind, language)) if chat else None
+        if entry is not None and entry[0] == stored:
+            self.hits += 1
+            return entry[1]
+
+        self.misses += 1
+        try:
+            template = compile_template(chat_text(settings, kind), SLOTS[kind])
+        except TemplateError as e:
+            logger.warning(f"⚠️ Invalid {kind} template in chat {chat_id} ({e}); using the default")
+            template = compile_template(message(kind, language), SLOTS[kind])
+        self.entries.setdefault(chat_id, {})[(kind, language)] = (stored, template)
+        return template
+
+    def render(self, chat_id: int, kind: str, settings: Dict[str, Any], **values: str) -> str:
+        return self.get(chat_id, kind, settings).render(values)
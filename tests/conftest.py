@@ -0,0 +1,10 @@
+import os
+import sys
+import tempfile
+
+# config.py reads these at import time; keep tests off the real settings and log files
+os.environ.setdefault('BOT_TOKEN', '123456:test')
+os.environ['LOG_FILE'] = ''
+os.environ['SETTINGS_PATH'] = os.path.join(tempfile.mkdtemp(prefix='bot-tests-'), 'group_settings.json')
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
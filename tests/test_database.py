@@ -0,0 +1,57 @@
+import multiprocessing
+
+from database import Database
+
+def write_statistics(path: str, worker: int):
+    db = Database(path)
+    for index in range(200):
+        db.update_statistics(-100 - worker, f"2026-01-{index % 28 + 1:02d}", messages=1)
+        db.add_warning(index, -100 - worker, 'test', 1)
+    db.close()
+
+def test_file_database_uses_wal(tmp_path):
+    db = Database(str(tmp_path / 'bot.db'))
+    assert db.conn.execute('PRAGMA journal_mode').fetchone()[0] == 'wal'
+    db.close()
+
+def test_worker_processes_write_the_same_file(tmp_path):
+    path = str(tmp_path / 'bot.db')
+    Database(path).close()
+    context = multiprocessing.get_context('fork')
+    workers = [context.Process(target=write_statistics, args=(path, worker)) for worker in range(4)]
+    for process in workers:
+        process.start()
+    for process in workers:
+        process.join(60)
+        assert process.exitcode == 0
+
+    db = Database(path)
+    total = db.conn.execute('SELECT SUM(messages) FROM statistics').fetchone()[0]
+    assert total == 800
+
+def test_restored_state_is_not_restored_again():
+    db = Database(':memory:')
+    # Saved by four workers before scaling down to two; one scope is too old to restore
+    db.save_state('captcha/worker-2', {'-10': {'1': 'a'}, '-11': {'2': 'b'}}, 1000)
+    db.save_state('captcha/worker-3', {'-12': {'3': 'c'}}, 1000)
+    db.save_state('captcha/worker-1', {'-13': {'4': 'd'}}, 10)
+
+    even = lambda chat_id: chat_id % 2 == 0
+    with db.take_states('captcha/', 500, even) as states:
+        assert sorted(chat_id for data in states for chat_id in data) == ['-10', '-12']
+    with db.take_states('captcha/', 500, lambda chat_id: not even(chat_id)) as states:
+        assert sorted(chat_id for data in states for chat_id in data) == ['-11']
+    with db.take_states('captcha/', 500) as states:
+        assert states == []
+    assert db.conn.execute('SELECT COUNT(*) FROM runtime_state').fetchone()[0] == 0
+
+def test_failed_restore_keeps_the_state():
+    db = Database(':memory:')
+    db.save_state('flood_data/main', {'-10': {'1': [1.0]}}, 1000)
+    try:
+        with db.take_states('flood_data/', 500):
+            raise RuntimeError('restore failed')
+    except RuntimeError:
+        pass
+    with db.take_states('flood_data/', 500) as states:
+        assert states == [{'-10': {'1': [1.0]}}]
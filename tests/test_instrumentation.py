@@ -0,0 +1,35 @@
+import asyncio
+
+import instrumentation
+from instrumentation import HandlerInstrumentation
+from logs import log_context
+from metrics import current_call
+
+LABELS = {'handler': 'test', 'command': 'TypeHandler'}
+
+async def handler(update, context):
+    return 'done'
+
+def test_contexts_reset_when_recording_fails(monkeypatch):
+    def broken(*args, **kwargs):
+        raise RuntimeError('metrics broke')
+    monkeypatch.setattr(instrumentation.HANDLER_CALLS, 'inc', broken)
+    wrapped = HandlerInstrumentation().wrap(handler, LABELS)
+
+    async def run():
+        try:
+            await wrapped(object(), None)
+        except RuntimeError:
+            pass
+        return current_call.get(), log_context.get()
+
+    assert asyncio.run(run()) == (None, None)
+
+def test_contexts_reset_after_call():
+    wrapped = HandlerInstrumentation().wrap(handler, LABELS)
+
+    async def run():
+        result = await wrapped(object(), None)
+        return result, current_call.get(), log_context.get()
+
+    assert asyncio.run(run()) == ('done', None, None)
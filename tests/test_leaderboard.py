@@ -0,0 +1,17 @@
+from leaderboard import WindowedLeaderboard
+
+def test_late_count_for_expired_day_is_ignored():
+    board = WindowedLeaderboard(days=7)
+    board.add('2024-03-10', 1)
+    board.add('2024-03-01', 2)  # before the window ending on the 10th
+    board.add('2024-03-05', 3)  # still inside it
+    assert '2024-03-01' not in board.daily
+    assert sorted(board.top('2024-03-10')) == [(1, 1), (3, 1)]
+
+def test_window_moves_with_newest_day():
+    board = WindowedLeaderboard(days=2)
+    board.add('2024-03-01', 1, 5)
+    board.add('2024-03-02', 2, 3)
+    board.add('2024-03-03', 2)
+    assert board.top('2024-03-03') == [(2, 4)]
+    assert board.today == '2024-03-03'
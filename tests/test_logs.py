@@ -0,0 +1,28 @@
+import multiprocessing
+import os
+import runpy
+
+MAIN = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'main.py')
+
+def worker_log_files(results):
+    # What a spawned worker of `python main.py` does: re-run main.py as __mp_main__, then run_worker
+    runpy.run_path(MAIN, run_name='__mp_main__')
+    import logs
+    import sharding
+
+    async def serve(*args):
+        pass
+    sharding.serve_worker = serve
+    sharding.run_worker(2, 4, None)
+    results.put([handler.baseFilename for handler in logs.listener.handlers if hasattr(handler, 'baseFilename')])
+
+def test_spawned_worker_logs_to_its_own_file(tmp_path, monkeypatch):
+    # The spawned process inherits the environment config.py reads
+    monkeypatch.setenv('LOG_FILE', str(tmp_path / 'bot.log'))
+    context = multiprocessing.get_context('spawn')
+    results = context.Queue()
+    process = context.Process(target=worker_log_files, args=(results,))
+    process.start()
+    files = results.get(timeout=60)
+    process.join(timeout=10)
+    assert files == [str(tmp_path / 'bot.worker2.log')]
@@ -0,0 +1,21 @@
+from config import config
+from prefilter import FULL, STATS, UpdateFilter
+
+CHAT_ID = -1001
+
+def route_for(settings):
+    config.group_settings[str(CHAT_ID)] = settings
+    try:
+        return UpdateFilter(lambda update: None).chat_route(CHAT_ID)
+    finally:
+        del config.group_settings[str(CHAT_ID)]
+
+def test_settings_without_protection_keys_get_moderated():
+    # Stored before antiflood/antispam existed, or edited by hand
+    assert route_for({'welcome_message': 'hi', 'antilink': False}) == FULL
+
+def test_all_protections_off_only_counts():
+    assert route_for({'antiflood': False, 'antispam': False, 'antilink': False}) == STATS
+
+def test_one_protection_on_is_moderated():
+    assert route_for({'antiflood': False, 'antispam': False, 'antilink': True}) == FULL
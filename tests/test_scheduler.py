@@ -0,0 +1,102 @@
+from datetime import datetime
+
+import pytz
+
+from scheduler import next_fire_time, normalize_weekdays, parse_recurrence
+
+# Monday 2026-10-19 00:00 UTC
+MONDAY = datetime(2026, 10, 19, tzinfo=pytz.utc).timestamp()
+
+def fire_weekday(cron: str) -> str:
+    fired = datetime.fromtimestamp(next_fire_time(cron, 'UTC', MONDAY), pytz.utc)
+    return fired.strftime('%A %H:%M')
+
+def test_numeric_weekdays_follow_standard_cron():
+    assert fire_weekday('0 9 * * 1') == 'Monday 09:00'
+    assert fire_weekday('0 9 * * 0') == 'Sunday 09:00'
+    assert fire_weekday('0 9 * * 7') == 'Sunday 09:00'
+
+def test_parse_recurrence_stores_day_names():
+    assert parse_recurrence('0 9 * * 1') == ('0 9 * * mon', 'UTC')
+    assert parse_recurrence('30 8 * * 1-5 Asia/Dhaka') == ('30 8 * * mon,tue,wed,thu,fri', 'Asia/Dhaka')
+    assert parse_recurrence('every monday at 09:00')[0] == '0 9 * * mon'
+
+def test_normalize_weekdays_ranges_steps_and_lists():
+    assert normalize_weekdays('0-6') == '*'
+    assert normalize_weekdays('*/2') == 'sun,tue,thu,sat'
+    assert normalize_weekdays('5-7') == 'sun,fri,sat'
+    assert normalize_weekdays('1,3,5') == 'mon,wed,fri'
+
+def test_stored_numeric_recurrence_is_normalized_on_start():
+    from database import Database
+    from scheduler import PostScheduler
+
+    db = Database(':memory:')
+    post_id, _ = db.add_scheduled_post('@channel', 'hi', 0, -100, 1, 'key', recurrence='0 9 * * 1', timezone='UTC')
+    PostScheduler(db).normalize_stored()
+    post = db.get_scheduled_post(post_id)
+    assert post['recurrence'] == '0 9 * * mon'
+    assert datetime.fromtimestamp(post['due_at'], pytz.utc).strftime('%A %H:%M') == 'Monday 09:00'
+
+class FakeBot:
+    def __init__(self):
+        self.sent = []
+
+    async def send_message(self, chat_id, text, **kwargs):
+        self.sent.append((chat_id, text))
+
+class FakeJobQueue:
+    def __init__(self):
+        self.armed = []
+
+    def run_once(self, callback, when, name=None):
+        self.armed.append(when)
+
+def test_non_telegram_error_keeps_the_queue_running(monkeypatch):
+    import asyncio
+    import sqlite3
+    from types import SimpleNamespace
+
+    from database import Database
+    from scheduler import RETRY_DELAY, PostScheduler
+
+    db = Database(':memory:')
+    scheduler = PostScheduler(db)
+    scheduler.job_queue = FakeJobQueue()
+    broken, _ = scheduler.schedule('@channel', 'broken', 1, -100, 1, 'a')
+    working, _ = scheduler.schedule('@channel', 'working', 2, -100, 1, 'b')
+
+    deliver = scheduler.deliver
+    async def flaky(context, post):
+        if post['id'] == broken:
+            raise sqlite3.OperationalError('database is locked')
+        await deliver(context, post)
+    monkeypatch.setattr(scheduler, 'deliver', flaky)
+
+    bot = FakeBot()
+    asyncio.run(scheduler._fire(SimpleNamespace(bot=bot)))
+
+    assert bot.sent == [('@channel', 'working')]
+    assert db.get_scheduled_post(working)['status'] == 'sent'
+    retried = db.get_scheduled_post(broken)
+    assert retried['status'] == 'pending' and retried['due_at'] > 2
+    assert scheduler.heap == [(retried['due_at'], broken)]
+    # Re-armed for the retry
+    assert 0 < scheduler.job_queue.armed[-1] <= RETRY_DELAY
+
+def test_new_recurring_posts_are_left_alone_on_start():
+    from database import Database
+    from scheduler import PostScheduler
+
+    db = Database(':memory:')
+    scheduler = PostScheduler(db)
+    posts = []
+    for index, text in enumerate(['every weekday at 09:00', 'every weekend at 10:30', 'every day at 08:00', '0 9 * * 1-5']):
+        cron, timezone = parse_recurrence(text)
+        post_id, _, due_at = scheduler.schedule_recurring('@channel', 'hi', cron, timezone, -100, 1, f"key{index}")
+        posts.append((post_id, cron, due_at))
+
+    scheduler.normalize_stored()
+    for post_id, cron, due_at in posts:
+        post = db.get_scheduled_post(post_id)
+        assert (post['recurrence'], post['due_at']) == (cron, due_at)
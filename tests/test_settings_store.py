@@ -0,0 +1,38 @@
+import multiprocessing
+
+from settings_store import SettingsStore
+
+def save_chats(path: str, worker: int, count: int):
+    store = SettingsStore(path, delay=0.01, compact_bytes=2000)
+    for index in range(count):
+        store.save(f"{worker}-{index}", {'antiflood': index % 2 == 0})
+        if index % 10 == 0:
+            store.flush()
+    store.flush()
+
+def test_workers_saving_different_chats_keep_each_others_changes(tmp_path):
+    # A small compact_bytes makes the workers compact while others append
+    path = str(tmp_path / 'group_settings.json')
+    context = multiprocessing.get_context('fork')
+    workers = [context.Process(target=save_chats, args=(path, worker, 100)) for worker in range(4)]
+    for process in workers:
+        process.start()
+    for process in workers:
+        process.join(30)
+        assert process.exitcode == 0
+
+    settings = SettingsStore(path).load()
+    assert len(settings) == 400
+
+def test_torn_last_line_is_skipped_and_next_append_survives(tmp_path):
+    path = str(tmp_path / 'group_settings.json')
+    store = SettingsStore(path)
+    store.save('1', {'antiflood': False})
+    store.flush()
+    with open(store.log_path, 'a') as log:
+        log.write('{"chat_id": "2", "sett')
+    store.save('3', {'antiflood': True})
+    store.flush()
+
+    settings = SettingsStore(path).load()
+    assert settings == {'1': {'antiflood': False}, '3': {'antiflood': True}}
@@ -0,0 +1,19 @@
+import asyncio
+import json
+
+from telegram import Update
+
+from updates import UpdateRecorder
+
+def test_close_keeps_every_recorded_line(tmp_path):
+    path = tmp_path / 'updates.jsonl'
+    recorder = UpdateRecorder(str(path))
+    for update_id in range(3):
+        asyncio.run(recorder.record(Update(update_id), None))
+    recorder.close()
+    # Late updates during shutdown are skipped rather than raising on the closed file
+    asyncio.run(recorder.record(Update(3), None))
+    recorder.close()
+
+    lines = path.read_text(encoding='utf-8').splitlines()
+    assert [json.loads(line)['update_id'] for line in lines] == [0, 1, 2]
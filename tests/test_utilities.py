@@ -0,0 +1,45 @@
+import asyncio
+from types import SimpleNamespace
+
+from config import config
+from utilities import is_admin
+
+CHAT_ID = -1002
+
+class FakeBot:
+    def __init__(self, status):
+        self.status = status
+
+    async def get_chat_member(self, chat_id, user_id):
+        return SimpleNamespace(status=self.status, user=SimpleNamespace(id=user_id))
+
+class FakeMessage:
+    def __init__(self):
+        self.replies = []
+
+    async def reply_text(self, text, **kwargs):
+        self.replies.append(text)
+
+def command(status, chat_type='supergroup', args=()):
+    update = SimpleNamespace(
+        effective_chat=SimpleNamespace(id=CHAT_ID, type=chat_type),
+        effective_user=SimpleNamespace(id=7),
+        message=FakeMessage(),
+    )
+    context = SimpleNamespace(bot=FakeBot(status), args=list(args))
+    return update, context
+
+def test_is_admin_awaits_the_chat_member():
+    assert asyncio.run(is_admin(*command('administrator')))
+    assert asyncio.run(is_admin(*command('creator')))
+    assert not asyncio.run(is_admin(*command('member')))
+    assert not asyncio.run(is_admin(*command('administrator', chat_type='private')))
+
+def test_admin_can_set_timezone():
+    from database import Database
+    from handlers import CommandHandlers
+
+    update, context = command('administrator', args=['Asia/Dhaka'])
+    asyncio.run(CommandHandlers(Database(':memory:')).set_timezone(update, context))
+    assert update.message.replies == ['✅ Timezone set to Asia/Dhaka!']
+    assert config.get_chat_settings(CHAT_ID)['timezone'] == 'Asia/Dhaka'
@@ -0,0 +1,115 @@
+import asyncio
+import importlib.util
+import logging
+import time
+from typing import Any, Dict, Optional, Tuple
+
+from telegram.error import TimedOut
+from telegram.request import BaseRequest, RequestData
+
+from instrumentation import TimedRequest
+from metrics import record_stage, registry
+
+logger = logging.getLogger(__name__)
+
+HTTP_POOL_WAIT = registry.histogram(
+    'bot_http_pool_wait_seconds', 'Time API calls waited for a free connection', ['pool'],
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+)
+HTTP_POOL_TIMEOUTS = registry.counter('bot_http_pool_timeouts_total', 'API calls that gave up waiting for a connection', ['pool'])
+HTTP_POOL_IN_USE = registry.gauge('bot_http_pool_in_use', 'Connections in use per pool', ['pool'])
+HTTP_POOL_WAITING = registry.gauge('bot_http_pool_waiting', 'API calls waiting for a connection per pool', ['pool'])
+
+pools: Dict[str, 'PooledRequest'] = {}
+
+HTTP_POOL_IN_USE.set_function(lambda: {(name,): pool.in_use for name, pool in pools.items()})
+HTTP_POOL_WAITING.set_function(lambda: {(name,): pool.waiting for name, pool in pools.items()})
+
+class PooledRequest(TimedRequest):
+    """One named connection pool that measures how long calls queue for a connection.
+
+    A semaphore the size of the httpx pool admits requests, so the wait for a
+    free connection happens (and is timed) here rather than invisibly inside
+    httpx. It counts as the `pool` stage of the handler making the call.
+    """
+
+    def __init__(self, name: str, size: int, read_timeout: float, write_timeout: float,
+                 connect_timeout: float, pool_timeout: float, http_version: str = '1.1'):
+        if http_version != '1.1' and importlib.util.find_spec('h2') is None:
+            logger.warning(f"⚠️ HTTP/2 for the {name} pool needs the h2 package; using HTTP/1.1")
+            http_version = '1.1'
+        super().__init__(
+            connection_pool_size=size,
+            read_timeout=read_timeout,
+            write_timeout=write_timeout,
+            media_write_timeout=write_timeout,
+            connect_timeout=connect_timeout,
+            pool_timeout=pool_timeout,
+            http_version=http_version,
+        )
+        self.name = name
+        self.default_pool_timeout = pool_timeout
+        self.slots = asyncio.Semaphore(size)
+        self.in_use = 0
+        self.waiting = 0
+        pools[name] = self
+
+    async def do_request(self, url: str, method: str, request_data: Optional[RequestData] = None,
+                         read_timeout=BaseRequest.DEFAULT_NONE, write_timeout=BaseRequest.DEFAULT_NONE,
+                         connect_timeout=BaseRequest.DEFAULT_NONE, pool_timeout=BaseRequest.DEFAULT_NONE) -> Tuple[int, bytes]:
+        timeout = pool_timeout if isinstance(pool_timeout, (int, float)) else self.default_pool_timeout
+        started = time.perf_counter()
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(self.slots.acquire(), timeout)
+        except asyncio.TimeoutError:
+            HTTP_POOL_TIMEOUTS.inc(pool=self.name)
+            raise TimedOut(f"Pool timeout: all {self.name} connections are busy; the request was not sent")
+        finally:
+            self.waiting -= 1
+            waited = time.perf_counter() - started
+            HTTP_POOL_WAIT.observe(waited, pool=self.name)
+            record_stage('pool', waited)
+
+        self.in_use += 1
+        try:
+            return await super().do_request(
+                url, method, request_data,
+                read_timeout=read_timeout, write_timeout=write_timeout,
+                connect_timeout=connect_timeout, pool_timeout=pool_timeout,
+            )
+        finally:
+            self.in_use -= 1
+            self.slots.release()
+
+class RoutedRequest(BaseRequest):
+    """Sends calls that upload files through the media pool and everything else through the api pool,
+    so a burst of chart uploads cannot take the connections moderation calls need"""
+
+    def __init__(self, api: BaseRequest, media: BaseRequest):
+        self.api = api
+        self.media = media
+
+    @property
+    def read_timeout(self) -> Optional[float]:
+        return self.api.read_timeout
+
+    async def initialize(self):
+        await self.api.initialize()
+        await self.media.initialize()
+
+    async def shutdown(self):
+        await self.api.shutdown()
+        await self.media.shutdown()
+
+    async def do_request(self, url: str, method: str, request_data: Optional[RequestData] = None,
+                         **timeouts: Any) -> Tuple[int, bytes]:
+        target = self.media if request_data is not None and request_data.contains_files else self.api
+        return await target.do_request(url, method, request_data, **timeouts)
+
+def build_requests(settings: Dict[str, Dict[str, Any]]) -> Tuple[BaseRequest, BaseRequest]:
+    """(bot request, get_updates request) for ApplicationBuilder from config.http_pools"""
+    api = PooledRequest('api', **settings['api'])
+    media = PooledRequest('media', **settings['media'])
+    polling = PooledRequest('polling', **settings['polling'])
+    return RoutedRequest(api, media), polling
@@ -0,0 +1,165 @@
+import asyncio
+import json
+import logging
+import os
+import time
+from typing import Any, Awaitable, Dict, Optional, Set
+from telegram import Update
+from telegram.ext import BaseUpdateProcessor, ContextTypes
+
+import startup
+from metrics import ACTIVE_CHATS, CHAT_QUEUE_DEPTH, UPDATE_DURATION, UPDATE_WAIT, UPDATES, UPDATES_IN_FLIGHT
+
+logger = logging.getLogger(__name__)
+
+UPDATE_TYPES = ('message', 'edited_message', 'callback_query', 'chat_member', 'my_chat_member', 'channel_post')
+
+def update_type(update: object) -> str:
+    if isinstance(update, Update):
+        for name in UPDATE_TYPES:
+            if getattr(update, name) is not None:
+                return name
+    return 'other'
+
+class ChatOrderedProcessor(BaseUpdateProcessor):
+    """Process updates concurrently across chats but one at a time within a chat.
+
+    Every chat gets its own FIFO lock, so moderation still sees a chat's
+    messages in the order they were sent while a slow handler in one chat no
+    longer holds up the others. At most `concurrency` handlers run at once;
+    `max_pending` bounds how many updates may be queued or running in total
+    before the application stops taking new ones.
+    """
+
+    def __init__(self, concurrency: int = 32, max_pending: int = 10000, depth_warning: int = 50):
+        super().__init__(max_pending)
+        self.concurrency = concurrency
+        self.depth_warning = depth_warning
+        self.running: Optional[asyncio.Semaphore] = None
+        self.locks: Dict[Any, asyncio.Lock] = {}
+        self.depths: Dict[Any, int] = {}  # {chat_id: updates queued or running}
+        self.peak_depth = 0
+        self.processed = 0
+        self.tasks: Set[asyncio.Task] = set()  # tasks with an update queued or running, for drain()
+
+    async def initialize(self):
+        self.running = asyncio.Semaphore(self.concurrency)
+        UPDATES_IN_FLIGHT.set_function(lambda: self.current_concurrent_updates)
+        ACTIVE_CHATS.set_function(lambda: len(self.depths))
+        CHAT_QUEUE_DEPTH.set_function(lambda: max(self.depths.values(), default=0))
+
+    async def shutdown(self):
+        self.locks.clear()
+        self.depths.clear()
+
+    @staticmethod
+    def chat_key(update: object):
+        if isinstance(update, Update) and update.effective_chat:
+            return update.effective_chat.id
+        return None
+
+    async def do_process_update(self, update: object, coroutine: Awaitable[Any]):
+        task = asyncio.current_task()
+        self.tasks.add(task)
+        try:
+            await self.process_in_order(update, coroutine)
+        except asyncio.CancelledError:
+            # Cancelled while still waiting for its turn: the handler coroutine never started
+            coroutine.close()
+            raise
+        finally:
+            self.tasks.discard(task)
+
+    async def process_in_order(self, update: object, coroutine: Awaitable[Any]):
+        key = self.chat_key(update)
+        queued = time.perf_counter()
+        if key is None:
+            async with self.running:
+                await self.run(update, coroutine, queued)
+            return
+
+        depth = self.depths.get(key, 0) + 1
+        self.depths[key] = depth
+        if depth > self.peak_depth:
+            self.peak_depth = depth
+        if depth == self.depth_warning:
+            logger.warning(f"⚠️ {depth} updates queued for chat {key}")
+
+        lock = self.locks.get(key)
+        if lock is None:
+            lock = self.locks[key] = asyncio.Lock()
+
+        try:
+            # asyncio.Lock wakes waiters in FIFO order, which keeps the chat's update order
+            async with lock:
+                async with self.running:
+                    await self.run(update, coroutine, queued)
+        finally:
+            remaining = self.depths[key] - 1
+            if remaining:
+                self.depths[key] = remaining
+            else:
+                del self.depths[key]
+                del self.locks[key]
+
+    async def run(self, update: object, coroutine: Awaitable[Any], queued: float):
+        started = time.perf_counter()
+        UPDATE_WAIT.observe(started - queued)
+        try:
+            await coroutine
+        finally:
+            UPDATE_DURATION.observe(time.perf_counter() - started)
+            UPDATES.inc(type=update_type(update))
+            self.processed += 1
+            if self.processed == 1:
+                startup.update_handled()
+
+    async def drain(self, timeout: float) -> int:
+        """Wait up to timeout seconds for queued and running updates, then cancel the rest.
+
+        Call once no new updates can arrive. Returns how many were cancelled.
+        """
+        deadline = time.monotonic() + timeout
+        while self.tasks and time.monotonic() < deadline:
+            await asyncio.wait(set(self.tasks), timeout=deadline - time.monotonic())
+
+        leftover = list(self.tasks)
+        for task in leftover:
+            task.cancel()
+        if leftover:
+            await asyncio.gather(*leftover, return_exceptions=True)
+        return len(leftover)
+
+    def stats(self, top: int = 5) -> Dict[str, Any]:
+        """Snapshot of queue depths for monitoring"""
+        busiest = sorted(self.depths.items(), key=lambda item: item[1], reverse=True)[:top]
+        return {
+            'in_flight': self.current_concurrent_updates,
+            'active_chats': len(self.depths),
+            'pending': sum(self.depths.values()),
+            'peak_depth': self.peak_depth,
+            'processed': self.processed,
+            'busiest': busiest,
+        }
+
+class UpdateRecorder:
+    """Appends every incoming update as one JSON line so traffic can be replayed
+    by benchmarks/bench_replay.py. The file contains message text; enable it only
+    where that is acceptable."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.file = open(path, 'a', encoding='utf-8', buffering=1)
+
+    async def record(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        if self.file.closed:
+            return
+        self.file.write(json.dumps(update.to_dict(), ensure_ascii=False) + '\n')
+
+    def close(self):
+        """Flush the recording to disk and close it; updates arriving afterwards are not recorded"""
+        if self.file.closed:
+            return
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.file.close()
@@ -4,27 +4,14 @@ from typing import List, Optional
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import ContextTypes
 
-# Bengali language support
-BENGALI_RESPONSES = {
-    "welcome": "👋 স্বাগতম {user_name} {chat_title} এ! 🇵🇸\n\nদয়া করে /rules দিয়ে নিয়মগুলি পড়ুন",
-    "goodbye": "👋 বিদায় {user_name}! আমরা আপনাকে মিস করব! ❤️",
-    "rules": "📝 দয়া করে সকল সদস্যের প্রতি শ্রদ্ধাশীল হন। স্প্যাম না, NSFW কন্টেন্ট না।",
-    "warned": "⚠️ সতর্কতা: {reason}\nসর্বমোট সতর্কতা: {count}/3",
-    "kicked": "🚫 আপনি গ্রুপ থেকে বের করে দেওয়া হয়েছে। কারণ: {reason}",
-    "banned": "🔒 আপনি গ্রুপ থেকে স্থায়ীভাবে নিষিদ্ধ করা হয়েছে। কারণ: {reason}",
-    "muted": "🔇 আপনি {duration} সেকেন্ডের জন্য মিউট করা হয়েছে। কারণ: {reason}",
-    "unmuted": "🔊 আপনার মিউট সরানো হয়েছে।",
-    "admin_only": "❌ এই কমান্ডটি শুধুমাত্র অ্যাডমিনদের জন্য।",
-    "reply_needed": "❌ দয়া করে এই কমান্ডটি ব্যবহার করার জন্য একটি ব্যবহারকারীর রিপ্লাই করুন।",
-}
+from i18n import translate
 
+# Bengali language support (the texts live in the i18n catalog)
 def get_bengali_text(key: str, **kwargs) -> str:
     """Get Bengali text for the given key with formatting"""
-    if key in BENGALI_RESPONSES:
-        return BENGALI_RESPONSES[key].format(**kwargs)
-    return key
+    return translate(key, 'bn', **kwargs)
 
-def is_admin(update: Update, context: ContextTypes.DEFAULT_TYPE) -> bool:
+async def is_admin(update: Update, context: ContextTypes.DEFAULT_TYPE) -> bool:
     """Check if user is admin in the group"""
     if update.effective_chat.type == 'private':
         return False
@@ -33,7 +20,7 @@ def is_admin(update: Update, context: ContextTypes.DEFAULT_TYPE) -> bool:
     chat_id = update.effective_chat.id
     
     # Check if user is admin
-    member = context.bot.get_chat_member(chat_id, user_id)
+    member = await context.bot.get_chat_member(chat_id, user_id)
     return member.status in ['administrator', 'creator']
 
 def is_owner(user_id: int) -> bool:
@@ -60,6 +47,13 @@ def parse_time(time_str: str) -> Optional[int]:
     
     return None
 
+def retry_after_seconds(error) -> float:
+    """Seconds to wait from a RetryAfter error (int or timedelta depending on library version)"""
+    retry_after = error.retry_after
+    if hasattr(retry_after, 'total_seconds'):
+        return retry_after.total_seconds()
+    return float(retry_after)
+
 def format_time(seconds: int) -> str:
     """Format seconds into human readable time"""
     if seconds < 60:
@@ -0,0 +1,93 @@
+import abc
+import json
+import logging
+from typing import Callable, List
+
+import tornado.web
+from telegram import Update
+from telegram.ext import Application
+
+from config import config
+from metrics import registry
+
+logger = logging.getLogger(__name__)
+
+SECRET_HEADER = 'X-Telegram-Bot-Api-Secret-Token'
+
+class IndexHandler(tornado.web.RequestHandler):
+    def get(self):
+        self.write("The bot is active✅")
+
+class HealthHandler(tornado.web.RequestHandler):
+    """Liveness: the event loop is answering"""
+
+    def get(self):
+        self.write("ok")
+
+class ReadyHandler(tornado.web.RequestHandler):
+    """Readiness: the bot is able to process updates"""
+
+    def initialize(self, ready: Callable[[], bool]):
+        self.ready = ready
+
+    def get(self):
+        if self.ready():
+            self.write("ready")
+        else:
+            self.set_status(503)
+            self.write("starting")
+
+class MetricsHandler(tornado.web.RequestHandler):
+    def get(self):
+        self.set_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.write(registry.render())
+
+class UpdateReceiver(tornado.web.RequestHandler, abc.ABC):
+    """Webhook endpoint; subclasses decide what happens to a verified update.
+
+    Route it last with a catch-all pattern; the path is ignored because the
+    secret token header already identifies Telegram.
+    """
+
+    async def post(self, path):
+        if self.request.headers.get(SECRET_HEADER) != config.secret_token:
+            self.set_status(403)
+            return
+        try:
+            accepted = await self.accept(self.request.body)
+        except (ValueError, KeyError, TypeError):
+            self.set_status(400)
+            return
+        if not accepted:
+            # Telegram redelivers the update later
+            self.set_status(503)
+
+    @abc.abstractmethod
+    async def accept(self, body: bytes) -> bool:
+        """Take the raw update body; False asks Telegram to redeliver it later"""
+
+class ApplicationReceiver(UpdateReceiver):
+    """Feeds webhook updates straight into the application's update queue"""
+
+    def initialize(self, bot_application: Application):
+        # self.application is tornado's own Application
+        self.bot_application = bot_application
+
+    async def accept(self, body: bytes) -> bool:
+        update = Update.de_json(json.loads(body), self.bot_application.bot)
+        await self.bot_application.update_queue.put(update)
+        return True
+
+def monitoring_routes(ready: Callable[[], bool]) -> List[tuple]:
+    return [
+        (r"/", IndexHandler),
+        (r"/healthz", HealthHandler),
+        (r"/readyz", ReadyHandler, {'ready': ready}),
+        (r"/metrics", MetricsHandler),
+    ]
+
+def start_server(routes: List[tuple], port: int):
+    """Listen on the running asyncio loop; returns the tornado HTTPServer"""
+    server = tornado.web.Application(routes).listen(port, address='0.0.0.0')
+    logger.info(f"🌐 HTTP server listening on port {port}")
+    return server
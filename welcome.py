@@ -1,14 +1,19 @@
+import html
 from telegram import Update
-from telegram.ext import ContextTypes
+from telegram.ext import Application, ContextTypes
 from datetime import datetime
 
 from config import config
 from database import Database
-from utilities import get_bengali_text
+from activity import ActivityTracker
+from i18n import message
+from templates import TemplateCache
 
 class WelcomeHandler:
-    def __init__(self, db: Database):
+    def __init__(self, db: Database, activity: ActivityTracker = None):
         self.db = db
+        self.activity = activity
+        self.templates = TemplateCache()
     
     async def send_welcome(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Send welcome message to new members"""
@@ -20,13 +25,12 @@ class WelcomeHandler:
         # Update statistics
         self.db.update_statistics(chat_id, datetime.now().strftime('%Y-%m-%d'), joins=1)
         
+        chat_title = html.escape(update.effective_chat.title or '', quote=False)
         for new_member in update.message.new_chat_members:
             # Skip if the new member is the bot itself
             if new_member.id == context.bot.id:
-                await update.message.reply_text(
-                    "🙏 Thanks for adding me to this group! "
-                    "Use /help to see what I can do. 🇵🇸"
-                )
+                self.db.add_group(chat_id, update.effective_chat.title)
+                await update.message.reply_text(message('bot_added', settings.get('language')))
                 continue
             
             # Add user to database
@@ -37,15 +41,16 @@ class WelcomeHandler:
                 new_member.last_name
             )
             
-            # Get welcome message
-            welcome_message = settings.get('welcome_message', 
-                "👋 Welcome {user_name} to {chat_title}! 🇵🇸\n\nPlease read the rules with /rules")
+            # Joining counts as being seen, so silent members still show up in /inactive
+            if self.activity:
+                self.activity.touch(chat_id, new_member.id, int(update.message.date.timestamp()))
             
-            # Format welcome message
-            formatted_message = welcome_message.format(
+            # Fill the chat's compiled welcome template
+            formatted_message = self.templates.render(
+                chat_id, 'welcome', settings,
                 user_name=new_member.mention_html(),
-                chat_title=update.effective_chat.title,
-                user_id=new_member.id
+                chat_title=chat_title,
+                user_id=str(new_member.id)
             )
             
             # Send welcome message
@@ -69,15 +74,15 @@ class WelcomeHandler:
         self.db.update_statistics(chat_id, datetime.now().strftime('%Y-%m-%d'), leaves=1)
         
         left_member = update.message.left_chat_member
+        if self.activity:
+            self.activity.forget(chat_id, left_member.id)
         
-        # Get goodbye message
-        goodbye_message = settings.get('goodbye_message', 
-            "👋 Goodbye {user_name}! We'll miss you! ❤️")
-        
-        # Format goodbye message
-        formatted_message = goodbye_message.format(
+        # Fill the chat's compiled goodbye template
+        formatted_message = self.templates.render(
+            chat_id, 'goodbye', settings,
             user_name=left_member.mention_html(),
-            chat_title=update.effective_chat.title
+            chat_title=html.escape(update.effective_chat.title or '', quote=False),
+            user_id=str(left_member.id)
         )
         
         # Send goodbye message
@@ -108,3 +113,22 @@ class WelcomeHandler:
                  f"{num1} + {num2} = ?",
             parse_mode='HTML'
         )
+    
+    @staticmethod
+    def export_captchas(application: Application) -> dict:
+        """Unanswered captcha answers from every chat's chat_data"""
+        return {
+            str(chat_id): {str(user_id): answer for user_id, answer in data['captcha'].items()}
+            for chat_id, data in application.chat_data.items()
+            if data.get('captcha')
+        }
+    
+    @staticmethod
+    def restore_captchas(application: Application, data: dict, owns=None):
+        for chat_id, answers in data.items():
+            chat_id = int(chat_id)
+            if owns and not owns(chat_id):
+                continue
+            # chat_data creates the chat's dict on first access
+            captcha = application.chat_data[chat_id].setdefault('captcha', {})
+            captcha.update({int(user_id): answer for user_id, answer in answers.items()})